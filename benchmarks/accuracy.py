@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Точность, задержка и стоимость пайплайна на размеченном корпусе при разных настройках:
+чтобы ускорять проверку, не теряя незаметно качество вердиктов.
+
+    python benchmarks/accuracy.py                                   # все пресеты на всем корпусе
+    python benchmarks/accuracy.py --configs baseline,fast,mini --details
+    python benchmarks/accuracy.py --config "tight:STAGE2_INITIAL_DOMAIN_LIMIT=4,MAX_SOURCE_DOMAINS=8"
+    python benchmarks/accuracy.py --max-accuracy-drop 0.05          # код 1, если пресет хуже первого
+    python benchmarks/accuracy.py --fake --time-scale 0.01          # смоук на fake_openai.py
+
+С OPENAI_CASSETTE_MODE=record прогон записывается, с replay — повторяется без сети;
+у каждой конфигурации свои промпты, поэтому и свои записи в кассете.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import sys
+import os
+import time
+from typing import Any, Dict, Iterator, List
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Кэши делятся между конфигурациями и подменили бы результат
+for _name in ('VERDICT_CACHE_ENABLED', 'TRANSLATION_MEMORY_ENABLED', 'SPAM_FILTER_ENABLED',
+              'STAGE1_LOG_ENABLED', 'USAGE_LEDGER_ENABLED'):
+    os.environ.setdefault(_name, 'false')
+
+from config import Config
+from usage import CheckUsage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'accuracy_corpus.json')
+
+# Категории пайплайна (этап 2 отдает английские, итог без этапа 2 — русские)
+CATEGORY_ALIASES = {
+    "news": "news", "новости": "news",
+    "entertainment": "entertainment", "развлечения": "entertainment",
+    "other": "other", "другое": "other",
+    "spam": "spam", "скрыто": "spam",
+}
+STATUSES = {"confirmed", "partially_confirmed", "contradictory", "unconfirmed"}
+
+PRESETS: Dict[str, Dict[str, str]] = {
+    "baseline": {},
+    "fast": {"STAGE2_INITIAL_DOMAIN_LIMIT": "5", "STAGE2_RETRY_DOMAIN_LIMIT": "3", "MAX_SOURCE_DOMAINS": "10"},
+    "wide": {"STAGE2_INITIAL_DOMAIN_LIMIT": "12", "STAGE2_RETRY_DOMAIN_LIMIT": "8", "MAX_SOURCE_DOMAINS": "30"},
+    "mini": {"FACT_CHECK_MODEL": "gpt-4o-mini"},
+    "no_translation": {"TRANSLATE_TO_RUSSIAN": "false"},
+}
+
+
+def load_corpus(path: str = DEFAULT_CORPUS) -> List[Dict[str, Any]]:
+    """Читает корпус и проверяет разметку"""
+    with open(path, encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+
+    seen = set()
+    for case in cases:
+        if not case.get("id") or not case.get("text"):
+            raise ValueError(f"У случая нет id или text: {case}")
+        if case["id"] in seen:
+            raise ValueError(f"Повторяется id {case['id']}")
+        seen.add(case["id"])
+        categories = _as_list(case.get("expected_category"))
+        if not categories or any(category not in CATEGORY_ALIASES.values() for category in categories):
+            raise ValueError(f"{case['id']}: неизвестная категория {case.get('expected_category')}")
+        statuses = case.get("expected_status")
+        if statuses is not None and (not statuses or set(statuses) - STATUSES):
+            raise ValueError(f"{case['id']}: неизвестный статус {statuses}")
+    return cases
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def score_case(case: Dict[str, Any], category: str, debug: Any) -> Dict[str, Any]:
+    """Сверяет итог с разметкой: категория и полоса статуса/доверия"""
+    actual_category = CATEGORY_ALIASES.get(str(category).lower(), str(category).lower())
+    category_ok = actual_category in _as_list(case["expected_category"])
+
+    status = getattr(debug, "verification_status", "") or ""
+    confidence = getattr(debug, "confidence_score", 0) or 0
+    expected_status = case.get("expected_status")
+    if expected_status is None:
+        status_ok = True
+    else:
+        status_ok = (
+            status in expected_status
+            and confidence >= case.get("min_confidence", 0)
+            and confidence <= case.get("max_confidence", 100)
+        )
+    return {
+        "category": actual_category,
+        "status": status,
+        "confidence": confidence,
+        "category_ok": category_ok,
+        "status_ok": status_ok,
+        "ok": category_ok and status_ok,
+    }
+
+
+def parse_config(raw: str) -> Dict[str, Any]:
+    """"name:KEY=V,KEY=V" или имя пресета"""
+    name, _, assignments = raw.partition(":")
+    if not assignments:
+        if name not in PRESETS:
+            raise ValueError(f"Неизвестный пресет {name}, есть: {', '.join(PRESETS)}")
+        return {"name": name, "overrides": dict(PRESETS[name])}
+    overrides = {}
+    for item in assignments.split(","):
+        key, _, value = item.partition("=")
+        key = key.strip().upper()
+        if not hasattr(Config, key):
+            raise ValueError(f"В Config нет настройки {key}")
+        overrides[key] = value.strip()
+    return {"name": name, "overrides": overrides}
+
+
+def _coerce(key: str, value: str) -> Any:
+    current = getattr(Config, key)
+    if isinstance(current, bool):
+        return value.lower() == "true"
+    if isinstance(current, int):
+        return int(value)
+    if isinstance(current, float):
+        return float(value)
+    return value
+
+
+@contextlib.contextmanager
+def applied(overrides: Dict[str, str]) -> Iterator[None]:
+    """Временно меняет атрибуты Config (они читаются при каждом вызове)"""
+    saved = {key: getattr(Config, key) for key in overrides}
+    try:
+        for key, value in overrides.items():
+            setattr(Config, key, _coerce(key, value))
+        yield
+    finally:
+        for key, value in saved.items():
+            setattr(Config, key, value)
+
+
+def percentile(values: List[float], share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+async def run_config(config: Dict[str, Any], cases: List[Dict[str, Any]], concurrency: int = 4) -> Dict[str, Any]:
+    """Прогоняет корпус на одной конфигурации свежим TwoStageFilter"""
+    from two_stage_filter import TwoStageFilter
+
+    with applied(config["overrides"]):
+        filter_system = TwoStageFilter()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def check(case: Dict[str, Any]) -> Dict[str, Any]:
+            usage = CheckUsage()
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    category, _, debug = await filter_system.analyze_message(case["text"], "Benchmark", usage=usage)
+                    error = ""
+                except Exception as e:
+                    category, debug, error = "", None, str(e)
+                elapsed = time.perf_counter() - started
+            result = score_case(case, category, debug)
+            result.update(
+                id=case["id"], seconds=round(elapsed, 3), cost_usd=usage.cost_usd, tokens=usage.total_tokens,
+                fallback=bool(debug and debug.fallback_used), error=error
+            )
+            if error:
+                result["ok"] = False
+            return result
+
+        results = await asyncio.gather(*(check(case) for case in cases))
+
+    latencies = [result["seconds"] for result in results]
+    total = len(results) or 1
+    return {
+        "config": config["name"],
+        "overrides": config["overrides"],
+        "cases": len(results),
+        "accuracy": round(sum(result["ok"] for result in results) / total, 3),
+        "category_accuracy": round(sum(result["category_ok"] for result in results) / total, 3),
+        "status_accuracy": round(sum(result["status_ok"] for result in results) / total, 3),
+        "p50_s": round(percentile(latencies, 0.50), 2),
+        "p95_s": round(percentile(latencies, 0.95), 2),
+        "cost_per_check_usd": round(sum(result["cost_usd"] for result in results) / total, 5),
+        "tokens_per_check": round(sum(result["tokens"] for result in results) / total),
+        "fallbacks": sum(result["fallback"] for result in results),
+        "errors": sum(bool(result["error"]) for result in results),
+        "results": results,
+    }
+
+
+def regressions(rows: List[Dict[str, Any]], max_drop: float) -> List[str]:
+    """Конфигурации, точность которых ниже первой больше чем на max_drop"""
+    if not rows:
+        return []
+    baseline = rows[0]["accuracy"]
+    return [row["config"] for row in rows[1:] if baseline - row["accuracy"] > max_drop + 1e-9]
+
+
+def print_table(rows: List[Dict[str, Any]], details: bool) -> None:
+    print(f"{'конфигурация':<18} {'точность':>9} {'категория':>10} {'статус':>7} {'p50, с':>7} {'p95, с':>7} "
+          f"{'$/проверка':>11} {'токенов':>8} {'fallback':>9}")
+    for row in rows:
+        print(f"{row['config'][:18]:<18} {row['accuracy']:>9.0%} {row['category_accuracy']:>10.0%} "
+              f"{row['status_accuracy']:>7.0%} {row['p50_s']:>7} {row['p95_s']:>7} "
+              f"{row['cost_per_check_usd']:>11.4f} {row['tokens_per_check']:>8} {row['fallbacks']:>9}")
+    if not details:
+        return
+    for row in rows:
+        misses = [result for result in row["results"] if not result["ok"]]
+        if misses:
+            print(f"\n❌ {row['config']}:")
+        for result in misses:
+            reason = result["error"] or f"{result['category']}, {result['status'] or '—'} {result['confidence']}%"
+            print(f"  {result['id']:<26} {reason}")
+
+
+async def run_all(configs: List[Dict[str, Any]], cases: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+    rows = []
+    for config in configs:
+        logger.info(f"🏁 Конфигурация {config['name']}: {config['overrides'] or 'как в .env'}")
+        rows.append(await run_config(config, cases, concurrency))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Точность, задержка и стоимость на размеченном корпусе")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="файл корпуса")
+    parser.add_argument("--configs", default=",".join(PRESETS), help="пресеты через запятую")
+    parser.add_argument("--config", action="append", default=[], help='своя конфигурация "имя:KEY=V,KEY=V"')
+    parser.add_argument("--cases", help="id случаев через запятую")
+    parser.add_argument("--concurrency", type=int, default=4, help="проверок одновременно")
+    parser.add_argument("--max-accuracy-drop", type=float, help="допустимое падение точности относительно первой")
+    parser.add_argument("--details", action="store_true", help="показать промахи по случаям")
+    parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    parser.add_argument("--fake", action="store_true", help="прогон на встроенном fake_openai.py")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="множитель задержек fake_openai.py")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    cases = load_corpus(args.corpus)
+    if args.cases:
+        wanted = set(args.cases.split(","))
+        cases = [case for case in cases if case["id"] in wanted]
+    configs = [parse_config(name) for name in args.configs.split(",") if name] + \
+        [parse_config(raw) for raw in args.config]
+
+    server = None
+    if args.fake:
+        from fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+        server = FakeOpenAIServer(FakeOpenAIConfig(time_scale=args.time_scale))
+        server.start_in_thread()
+        Config.OPENAI_BASE_URL = server.base_url
+        Config.OPENAI_API_KEY = Config.OPENAI_API_KEY or "sk-fake"
+    try:
+        rows = asyncio.run(run_all(configs, cases, args.concurrency))
+    finally:
+        if server:
+            server.stop_thread()
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows, args.details)
+
+    if args.max_accuracy_drop is not None:
+        worse = regressions(rows, args.max_accuracy_drop)
+        if worse:
+            print(f"\n⚠️ Точность упала больше чем на {args.max_accuracy_drop:.0%}: {', '.join(worse)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
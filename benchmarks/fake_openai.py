@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Локальная замена OpenAI API для бенчмарков и офлайн-тестов: Chat Completions и
+Responses API (обычный ответ, поток SSE, фоновый режим с опросом queued → in_progress →
+completed, отмена) с настраиваемой задержкой, долей ошибок 500 и ответов 429.
+
+    python benchmarks/fake_openai.py --port 8099 --responses-latency 4 --rate-limit-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 python main.py
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGE1_DOMAINS = ["reuters.com", "apnews.com", "bbc.com", "techcrunch.com", "theverge.com", "wired.com"]
+
+REASONS = {
+    200: "OK", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error",
+}
+
+
+@dataclass
+class Latency:
+    """Логнормальная задержка: медиана и разброс (sigma логарифма), секунды"""
+    median: float
+    sigma: float = 0.5
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(rng.gauss(0, self.sigma)) if self.sigma else self.median
+
+    @classmethod
+    def parse(cls, raw: str) -> "Latency":
+        """"0.4" или "0.4:0.6" — медиана и sigma"""
+        median, _, sigma = raw.partition(":")
+        return cls(float(median), float(sigma) if sigma else 0.5)
+
+
+@dataclass
+class FakeOpenAIConfig:
+    chat_latency: Latency = field(default_factory=lambda: Latency(0.4))
+    responses_latency: Latency = field(default_factory=lambda: Latency(4.0))
+    # Доли запросов (создание ответа), получающих 500 и 429
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    # Все задержки умножаются на time_scale — чтобы гонять бенчмарк быстрее реального API
+    time_scale: float = 1.0
+    seed: Optional[int] = None
+
+
+class FakeOpenAIServer:
+    """
+    HTTP/1.1 сервер на asyncio с keep-alive. Ответы собираются по тексту запроса так,
+    чтобы пайплайн проходил целиком: этап 1 получает источники, этап 2 и один проход —
+    вердикт, перевод — те же ключи JSON. Счетчик запросов — в stats().
+    """
+
+    def __init__(self, config: Optional[FakeOpenAIConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeOpenAIConfig()
+        self.host = host
+        self.port = port
+        self.requests: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self._rng = random.Random(self.config.seed)
+        # Принудительные ответы для следующих запросов на создание: [(статус, сколько)]
+        self._forced: List[List[int]] = []
+        # Фоновые ответы: id → (тело запроса, время создания, длительность, отменен)
+        self._responses: Dict[str, Dict[str, Any]] = {}
+        self._ids = 0
+        self._connections: set = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"🧪 Фейковый OpenAI API: {self.base_url}")
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            # Соединения keep-alive ждут следующий запрос — закрываем их сами
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+
+    def start_in_thread(self) -> None:
+        """Запускает сервер в своем потоке с отдельным event loop — не мешает измеряемому коду"""
+        started = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="fake-openai", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop_thread(self) -> None:
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def inject(self, status: int, count: int = 1) -> None:
+        """Следующие count запросов на создание получат статус status (429 или 500)"""
+        self._forced.append([status, count])
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": dict(self.requests), "statuses": dict(self.statuses)}
+
+    def reset_stats(self) -> None:
+        self.requests.clear()
+        self.statuses.clear()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if length else b""
+
+                method, path = request_line.decode("latin-1").split()[:2]
+                keep_alive = headers.get("connection", "").lower() != "close"
+                keep_alive = await self._dispatch(writer, method, path.split("?", 1)[0], body) and keep_alive
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _dispatch(self, writer: asyncio.StreamWriter, method: str, path: str, body: bytes) -> bool:
+        """Обрабатывает запрос; False — соединение надо закрыть (после потока SSE)"""
+        payload = json.loads(body) if body else {}
+        path = path.removeprefix("/v1")
+
+        if method == "POST" and path == "/chat/completions":
+            self.requests["chat.completions.create"] += 1
+            if await self._maybe_fail(writer):
+                return True
+            await asyncio.sleep(self._delay(self.config.chat_latency))
+            await self._send_json(writer, 200, self._chat_completion(payload))
+            return True
+
+        if method == "POST" and path == "/responses":
+            self.requests["responses.create"] += 1
+            if await self._maybe_fail(writer):
+                return True
+            return await self._create_response(writer, payload)
+
+        match = re.fullmatch(r"/responses/([\w-]+)(/cancel)?", path)
+        if match and match.group(1) in self._responses:
+            state = self._responses[match.group(1)]
+            if match.group(2) and method == "POST":
+                self.requests["responses.cancel"] += 1
+                state["cancelled"] = True
+            else:
+                self.requests["responses.retrieve"] += 1
+            await self._send_json(writer, 200, self._response_object(state))
+            return True
+
+        await self._send_json(writer, 404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}})
+        return True
+
+    async def _maybe_fail(self, writer: asyncio.StreamWriter) -> bool:
+        status = None
+        if self._forced:
+            status = self._forced[0][0]
+            self._forced[0][1] -= 1
+            if self._forced[0][1] <= 0:
+                self._forced.pop(0)
+        elif self._rng.random() < self.config.rate_limit_rate:
+            status = 429
+        elif self._rng.random() < self.config.error_rate:
+            status = 500
+        if status is None:
+            return False
+
+        if status == 429:
+            retry_after = self.config.retry_after * self.config.time_scale
+            await self._send_json(writer, 429, {"error": {
+                "message": "Rate limit reached for requests", "type": "requests", "code": "rate_limit_exceeded"
+            }}, {"retry-after-ms": str(int(retry_after * 1000)), "retry-after": str(max(1, math.ceil(retry_after)))})
+        else:
+            await self._send_json(writer, status, {"error": {"message": "The server had an error", "type": "server_error"}})
+        return True
+
+    def _delay(self, latency: Latency) -> float:
+        return latency.sample(self._rng) * self.config.time_scale
+
+    async def _create_response(self, writer: asyncio.StreamWriter, payload: Dict[str, Any]) -> bool:
+        self._ids += 1
+        state = {
+            "id": f"resp_fake{self._ids}",
+            "request": payload,
+            "created": time.monotonic(),
+            "duration": self._delay(self.config.responses_latency),
+            "cancelled": False,
+        }
+
+        if payload.get("background"):
+            self._responses[state["id"]] = state
+        if payload.get("stream"):
+            return await self._stream(writer, state)
+        if not payload.get("background"):
+            await asyncio.sleep(state["duration"])
+        await self._send_json(writer, 200, self._response_object(state))
+        return True
+
+    async def _stream(self, writer: asyncio.StreamWriter, state: Dict[str, Any]) -> bool:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        sequence = 0
+
+        def event(kind: str, response: Dict[str, Any]) -> bytes:
+            nonlocal sequence
+            data = json.dumps({"type": kind, "sequence_number": sequence, "response": response})
+            sequence += 1
+            return f"event: {kind}\ndata: {data}\n\n".encode("utf-8")
+
+        in_progress = dict(self._response_object(state, status="in_progress"), output=[], usage=None)
+        writer.write(event("response.created", in_progress))
+        writer.write(event("response.in_progress", in_progress))
+        await writer.drain()
+        await asyncio.sleep(state["duration"])
+        writer.write(event("response.completed", self._response_object(state, status="completed")))
+        await writer.drain()
+        self.statuses[200] += 1
+        return False
+
+    def _response_object(self, state: Dict[str, Any], status: Optional[str] = None) -> Dict[str, Any]:
+        request = state["request"]
+        if status is None:
+            elapsed = time.monotonic() - state["created"]
+            if state["cancelled"]:
+                status = "cancelled"
+            elif elapsed >= state["duration"]:
+                status = "completed"
+            else:
+                status = "queued" if elapsed < state["duration"] * 0.1 else "in_progress"
+
+        response = {
+            "id": state["id"],
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": status,
+            "model": request.get("model", "gpt-4o"),
+            "background": bool(request.get("background")),
+            "output": [],
+            "usage": None,
+            "parallel_tool_calls": True,
+            "tool_choice": request.get("tool_choice", "auto"),
+            "tools": request.get("tools", []),
+        }
+        if status == "completed":
+            prompt = str(request.get("input", ""))
+            text = json.dumps(self._verdict(prompt), ensure_ascii=False)
+            response["output"] = [
+                {"type": "web_search_call", "id": f"ws_{state['id']}", "status": "completed",
+                 "action": {"type": "search", "query": prompt[:80]}},
+                {"type": "message", "id": f"msg_{state['id']}", "role": "assistant", "status": "completed",
+                 "content": [{"type": "output_text", "text": text, "annotations": []}]},
+            ]
+            response["usage"] = self._usage(prompt, text, "input_tokens", "output_tokens")
+        return response
+
+    def _chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = "\n".join(str(message.get("content", "")) for message in payload.get("messages", []))
+        content = self._chat_answer(prompt)
+        self._ids += 1
+        return {
+            "id": f"chatcmpl-fake{self._ids}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": self._usage(prompt, content, "prompt_tokens", "completion_tokens"),
+        }
+
+    def _chat_answer(self, prompt: str) -> str:
+        """Ответ в формате, которого ждет соответствующий промпт пайплайна"""
+        if "Исходные поля (JSON):" in prompt:
+            fields_json = prompt.split("Исходные поля (JSON):", 1)[1]
+            fields_json = fields_json[:fields_json.rfind("}") + 1]
+            try:
+                fields = json.loads(fields_json)
+            except json.JSONDecodeError:
+                fields = {}
+            return json.dumps({key: f"[перевод] {value}" for key, value in fields.items()}, ensure_ascii=False)
+        if '"claims"' in prompt:
+            text = _quoted_message(prompt)
+            claims = [part.strip() for part in re.split(r"(?<=[.!?])\s+", text) if len(part.strip()) > 10]
+            return json.dumps({"claims": [
+                {"claim": claim, "domains": STAGE1_DOMAINS[:2], "search_query": claim[:60]} for claim in claims
+            ]}, ensure_ascii=False)
+        if '"source_candidates"' in prompt:
+            return json.dumps({
+                "needs_fact_check": True,
+                "classification": "news",
+                "reasoning": "Проверяемое утверждение",
+                "source_candidates": [
+                    {"name": domain, "url": f"https://{domain}", "domain": domain, "why": "новости", "priority": idx}
+                    for idx, domain in enumerate(STAGE1_DOMAINS, start=1)
+                ],
+                "recommended_queries": [_quoted_message(prompt)[:60]],
+            }, ensure_ascii=False)
+        if "спам/реклама/мусор" in prompt:
+            return "нет"
+        if "категория | комментарий" in prompt:
+            return "новости | требуется ручная проверка"
+        return "Переведенный текст"
+
+    def _verdict(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "needs_fact_check": True,
+            "classification": "news",
+            "reasoning": "Проверяемое утверждение",
+            "verification_status": "confirmed",
+            "confidence_score": 92,
+            "category": "news",
+            "detailed_findings": "Official sources confirm the statement",
+            "contradictions": "",
+            "direct_quotes": [],
+            "sources_checked": STAGE1_DOMAINS[:3],
+            "missing_evidence": "",
+            "special_notes": "",
+        }
+
+    def _usage(self, prompt: str, completion: str, prompt_key: str, completion_key: str) -> Dict[str, int]:
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(completion) // 4)
+        return {prompt_key: prompt_tokens, completion_key: completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                         headers: Optional[Dict[str, str]] = None) -> None:
+        self.statuses[status] += 1
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n{extra}\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+
+def _quoted_message(prompt: str) -> str:
+    match = re.search(r'Сообщение: "(.*?)"\s*$', prompt, re.MULTILINE | re.DOTALL) or \
+        re.search(r'"(.*?)"', prompt, re.DOTALL)
+    return match.group(1) if match else prompt[:200]
+
+
+def config_from_args(args: argparse.Namespace) -> FakeOpenAIConfig:
+    return FakeOpenAIConfig(
+        chat_latency=Latency.parse(args.chat_latency),
+        responses_latency=Latency.parse(args.responses_latency),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        time_scale=args.time_scale,
+        seed=args.seed,
+    )
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--chat-latency", default="0.4:0.5", help="задержка Chat Completions: медиана[:sigma], с")
+    parser.add_argument("--responses-latency", default="4:0.5", help="задержка Responses API: медиана[:sigma], с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After для 429, с")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="множитель всех задержек")
+    parser.add_argument("--seed", type=int, default=None, help="seed генератора задержек и ошибок")
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = FakeOpenAIServer(config_from_args(args), args.host, args.port)
+    await server.start()
+    print(f"OPENAI_BASE_URL={server.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная замена OpenAI API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    add_server_arguments(parser)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
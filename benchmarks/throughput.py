@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности пайплайна на локальной замене OpenAI API:
+N сообщений через analyze_message при разной конкурентности, без сети и расходов.
+
+    python benchmarks/throughput.py --messages 200 --concurrency 1,4,16,64
+    python benchmarks/throughput.py --time-scale 0.05 --rate-limit-rate 0.1 --json
+    python benchmarks/throughput.py --base-url http://127.0.0.1:8099/v1   # внешний fake_openai.py
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from fake_openai import FakeOpenAIServer, add_server_arguments, config_from_args
+
+TEMPLATES = [
+    "Компания {n} объявила о выпуске нового смартфона с батареей на {m} мАч",
+    "ВОЗ сообщила о {m} новых случаях заболевания в регионе {n}",
+    "Центробанк страны {n} повысил ключевую ставку до {m}%",
+    "Учёные из университета {n} открыли экзопланету в {m} световых годах от Земли",
+]
+
+
+def make_messages(count: int, seed: int = 0) -> List[str]:
+    """Разные тексты: иначе single-flight склеит одинаковые проверки в одну"""
+    return [
+        TEMPLATES[idx % len(TEMPLATES)].format(n=f"N{seed}-{idx}", m=1000 + idx)
+        for idx in range(count)
+    ]
+
+
+def percentile(values: List[float], share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+def configure_environment(args: argparse.Namespace, base_url: str) -> None:
+    """Настройки пайплайна задаются до импорта config"""
+    os.environ.update({
+        'OPENAI_BASE_URL': base_url,
+        'OPENAI_API_KEY': os.getenv('OPENAI_API_KEY') or 'sk-fake',
+        'OPENAI_RPM_LIMIT': str(args.rpm_limit),
+        'OPENAI_TPM_LIMIT': '0',
+        'PIPELINE_MODE': args.pipeline_mode,
+        'STAGE2_STREAMING': 'true' if args.transport == 'stream' else 'false',
+        'STAGE2_HEDGE_MODE': args.hedge,
+        'VERDICT_CACHE_ENABLED': 'false',
+        'TRANSLATION_MEMORY_ENABLED': 'false',
+        'SPAM_FILTER_ENABLED': 'false',
+        'STAGE1_LOG_ENABLED': 'false',
+        'USAGE_LEDGER_ENABLED': 'false',
+    })
+
+
+async def run_level(messages: List[str], concurrency: int,
+                    server: Optional[FakeOpenAIServer]) -> Dict[str, Any]:
+    """Прогоняет сообщения через свежий TwoStageFilter не больше чем по concurrency сразу"""
+    from two_stage_filter import TwoStageFilter
+
+    filter_system = TwoStageFilter()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+    fallbacks = 0
+    if server:
+        server.reset_stats()
+
+    async def check(text: str) -> None:
+        nonlocal errors, fallbacks
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                _, _, debug = await filter_system.analyze_message(text, "Benchmark")
+                fallbacks += bool(debug and debug.fallback_used)
+            except Exception as e:
+                errors += 1
+                logging.getLogger(__name__).debug("Проверка упала: %s", e)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(check(text) for text in messages))
+    elapsed = time.perf_counter() - started
+
+    row = {
+        "concurrency": concurrency,
+        "messages": len(messages),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(messages) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "errors": errors,
+        "fallbacks": fallbacks,
+    }
+    if server:
+        stats = server.stats()
+        row["openai_calls_per_message"] = round(sum(stats["requests"].values()) / len(messages), 2)
+        row["requests"] = stats["requests"]
+        row["statuses"] = {str(code): count for code, count in stats["statuses"].items()}
+    return row
+
+
+async def run_benchmark(messages_count: int, levels: List[int],
+                        server: Optional[FakeOpenAIServer]) -> List[Dict[str, Any]]:
+    rows = []
+    for level in levels:
+        rows.append(await run_level(make_messages(messages_count, seed=level), level, server))
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'конк.':>6} {'сообщ/с':>9} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} "
+          f"{'ошибки':>7} {'fallback':>9} {'вызовов/сообщ':>14}")
+    for row in rows:
+        print(f"{row['concurrency']:>6} {row['throughput']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+              f"{row['p99_ms']:>9} {row['errors']:>7} {row['fallbacks']:>9} "
+              f"{row.get('openai_calls_per_message', '—'):>14}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Пропускная способность пайплайна на фейковом OpenAI API")
+    parser.add_argument("--messages", type=int, default=100, help="сообщений на каждый уровень конкурентности")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="уровни конкурентности через запятую")
+    parser.add_argument("--pipeline-mode", default="two_stage", choices=["two_stage", "single_pass", "auto"])
+    parser.add_argument("--transport", default="stream", choices=["stream", "poll"],
+                        help="чтение ответов Responses API: поток событий или опрос статуса")
+    parser.add_argument("--hedge", default="off", choices=["off", "hedged"])
+    parser.add_argument("--rpm-limit", type=int, default=0, help="OPENAI_RPM_LIMIT (0 — без ограничения)")
+    parser.add_argument("--base-url", help="адрес уже запущенного fake_openai.py вместо встроенного")
+    parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    logging.basicConfig(level=logging.WARNING)
+    server = None
+    if not args.base_url:
+        server = FakeOpenAIServer(config_from_args(args))
+        server.start_in_thread()
+    configure_environment(args, args.base_url or server.base_url)
+
+    try:
+        rows = asyncio.run(run_benchmark(args.messages, levels, server))
+    finally:
+        if server:
+            server.stop_thread()
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
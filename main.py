@@ -15,6 +15,10 @@ from pyrogram.types import Message
 sys.path.append('src')
 from config import Config
 from command_handler import CommandHandler
+from admission import AdmissionController, AdmissionRejected
+from metrics import ADMISSION_REJECTED, IN_FLIGHT, QUEUE_DEPTH, MetricsServer
+from sources_config import sources_config
+import tracing
 
 # Настройка логирования
 os.makedirs('logs', exist_ok=True)
@@ -38,7 +42,56 @@ class FactCheckingBot:
             bot_token=Config.TELEGRAM_BOT_TOKEN
         )
         self.command_handler = CommandHandler()
+        self.admission = AdmissionController()
+        self._checks = set()
         self.running = False
+        self.metrics_server = MetricsServer(ready=self.is_ready) if Config.METRICS_ENABLED else None
+        QUEUE_DEPTH.set_function(lambda: self.admission.queued)
+        IN_FLIGHT.set_function(lambda: self.admission.in_flight)
+        ADMISSION_REJECTED.set_function(lambda: self.admission.rejected)
+
+    def is_ready(self) -> bool:
+        """Готовность для /healthz: бот запущен и подключен к Telegram"""
+        return self.running and bool(self.bot.is_connected)
+
+    async def admit_fact_check(self, client, message: Message):
+        """
+        Ставит проверку в очередь допуска и запускает ее в фоне, не занимая
+        обработчик pyrogram. Сверх лимитов проверка сразу отклоняется.
+        """
+        try:
+            ticket = self.admission.submit(message.from_user.id if message.from_user else message.chat.id)
+        except AdmissionRejected as e:
+            await self.command_handler.outbox.send_message(
+                client,
+                chat_id=message.chat.id,
+                text=f"🚦 **Запрос не принят**\n\n{e}",
+                reply_to_message_id=message.id
+            )
+            return
+        # Число фоновых задач ограничено очередью и лимитом одновременных проверок
+        self._spawn_check(self.command_handler.handle_fact_check(client, message, ticket))
+
+    async def resume_jobs(self):
+        """Возобновляет проверки, прерванные прошлым перезапуском"""
+        jobs = self.command_handler.jobs
+        if not jobs:
+            return
+        purged = await jobs.purge()
+        if purged:
+            logger.info(f"🧹 Удалено старых задач: {purged}")
+        unfinished = await jobs.unfinished()
+        if unfinished:
+            logger.info(f"♻️ Незавершенных проверок после перезапуска: {len(unfinished)}")
+        for job in unfinished:
+            # Задачи уже были приняты — лимиты частоты и очереди к ним не применяются
+            ticket = self.admission.submit(job.user_id if job.user_id is not None else job.chat_id, force=True)
+            self._spawn_check(self.command_handler.resume_job(self.bot, job, ticket))
+
+    def _spawn_check(self, coro):
+        task = asyncio.create_task(coro)
+        self._checks.add(task)
+        task.add_done_callback(self._checks.discard)
 
     async def start(self):
         """Запуск бота"""
@@ -48,6 +101,16 @@ class FactCheckingBot:
             
             await self.bot.start()
             
+            if self.metrics_server:
+                await self.metrics_server.start()
+            
+            # sources.json перечитывается при изменении без перезапуска
+            sources_config.start_watching()
+            
+            if self.command_handler.remote:
+                logger.info("🛰️ Режим frontend: проверки выполняют воркеры (worker.py)")
+            await self.resume_jobs()
+            
             # Обработчик команды /help и /start
             @self.bot.on_message(filters.command(["help", "start"]) & filters.private)  
             async def handle_help_command(client, message: Message):
@@ -56,12 +119,12 @@ class FactCheckingBot:
             # Обработчик любого текстового сообщения (кроме команд)
             @self.bot.on_message(filters.text & filters.private & ~filters.command(["help", "start"]))
             async def handle_text_message(client, message: Message):
-                await self.command_handler.handle_fact_check(client, message)
+                await self.admit_fact_check(client, message)
             
             # Обработчик медиа сообщений с caption (фото, видео, документы с подписью)
             @self.bot.on_message((filters.photo | filters.video | filters.document) & filters.private & filters.caption)
             async def handle_media_message(client, message: Message):
-                await self.command_handler.handle_fact_check(client, message)
+                await self.admit_fact_check(client, message)
             
             self.running = True
             logger.info("🤖 Fact-checking bot v3.0 запущен. Отправьте любое сообщение для проверки фактов!")
@@ -81,6 +144,15 @@ class FactCheckingBot:
             
         logger.info("🔄 Останавливаем бота...")
         self.running = False
+        for task in list(self._checks):
+            task.cancel()
+        sources_config.stop_watching()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        if self.command_handler.remote:
+            await self.command_handler.remote.close()
+        
+        tracing.shutdown()
         
         try:
             await self.bot.stop()
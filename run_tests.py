@@ -35,7 +35,25 @@ def main():
     tests = [
         'test_config',
         'test_two_stage',
-        'test_translation_formatting'
+        'test_translation_formatting',
+        'test_verdict_cache',
+        'test_concurrency',
+        'test_responses_transport',
+        'test_admission',
+        'test_openai_limiter',
+        'test_telegram_outbox',
+        'test_sources_config',
+        'test_spam_filter',
+        'test_pipeline_modes',
+        'test_claims',
+        'test_job_queue',
+        'test_broker',
+        'test_metrics',
+        'test_tracing',
+        'test_usage',
+        'test_fake_openai',
+        'test_cassette',
+        'test_accuracy_benchmark'
     ]
     
     results = {}
@@ -0,0 +1,214 @@
+"""
+Допуск проверок в работу: ограниченная очередь, лимиты параллельности и частоты,
+справедливая (по кругу между пользователями) очередность
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Как часто (в запросах) чистить данные о давно неактивных пользователях
+PRUNE_EVERY = 256
+
+
+class AdmissionRejected(Exception):
+    """Проверка не принята; текст исключения можно показывать пользователю"""
+
+
+class AdmissionTicket:
+    """Место в очереди одной проверки"""
+
+    def __init__(self, controller: "AdmissionController", user_id: Any):
+        self.controller = controller
+        self.user_id = user_id
+        self.admitted = asyncio.get_running_loop().create_future()
+        self.released = False
+
+    def position(self) -> int:
+        """Позиция в очереди начиная с 1, 0 — проверка уже выполняется"""
+        return self.controller.position(self)
+
+    async def wait(self, on_position: Optional[Callable[[int], Awaitable[None]]] = None, refresh: float = 2.0) -> None:
+        """Ждет допуска, сообщая on_position об изменении позиции в очереди"""
+        reported = self.position()
+        try:
+            while not self.admitted.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(self.admitted), timeout=refresh)
+                except asyncio.TimeoutError:
+                    current = self.position()
+                    if on_position and current and current != reported:
+                        reported = current
+                        await on_position(current)
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self) -> None:
+        """Освобождает место — в очереди или среди выполняющихся проверок"""
+        self.controller.release(self)
+
+    async def __aenter__(self) -> "AdmissionTicket":
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """
+    Очередь проверок с лимитами:
+    - общая длина очереди (сверх нее — отказ);
+    - глобальное число одновременных проверок;
+    - одновременные проверки и частота запросов одного пользователя (скользящее окно).
+    Очереди ведутся по пользователям и обслуживаются по кругу: следующим допускается
+    пользователь, которого дольше всех не обслуживали, — один пользователь не может
+    занять всю очередь.
+    """
+
+    def __init__(
+        self,
+        max_queue: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        user_concurrency: Optional[int] = None,
+        user_rate: Optional[int] = None,
+        user_rate_window: Optional[float] = None
+    ):
+        self.max_queue = max_queue if max_queue is not None else Config.ADMISSION_MAX_QUEUE
+        self.max_in_flight = max_in_flight if max_in_flight is not None else Config.ADMISSION_MAX_IN_FLIGHT
+        self.user_concurrency = user_concurrency if user_concurrency is not None else Config.ADMISSION_USER_CONCURRENCY
+        self.user_rate = user_rate if user_rate is not None else Config.ADMISSION_USER_RATE
+        self.user_rate_window = user_rate_window if user_rate_window is not None else Config.ADMISSION_USER_RATE_WINDOW
+
+        self._queues: Dict[Any, Deque[AdmissionTicket]] = {}
+        self._active: Dict[Any, int] = {}
+        self._recent: Dict[Any, Deque[float]] = {}
+        # Номер последнего обслуживания пользователя — основа обхода по кругу
+        self._served: Dict[Any, int] = {}
+        self._serve_seq = 0
+        self._submits = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def submit(self, user_id: Any, force: bool = False) -> AdmissionTicket:
+        """
+        Ставит проверку в очередь или отклоняет ее с AdmissionRejected.
+        force — без проверки частоты и длины очереди (проверка уже была принята раньше,
+        например до перезапуска бота); лимиты параллельности действуют как обычно
+        """
+        now = time.monotonic()
+        self._submits += 1
+        if self._submits % PRUNE_EVERY == 0:
+            self._prune(now)
+        recent = self._recent.setdefault(user_id, deque())
+        while recent and now - recent[0] >= self.user_rate_window:
+            recent.popleft()
+        if not force:
+            self._check_limits(user_id, recent, now)
+
+        recent.append(now)
+        ticket = AdmissionTicket(self, user_id)
+        self._queues.setdefault(user_id, deque()).append(ticket)
+        self.queued += 1
+        self._dispatch()
+        return ticket
+
+    def _check_limits(self, user_id: Any, recent: Deque[float], now: float) -> None:
+        if self.user_rate and len(recent) >= self.user_rate:
+            self.rejected += 1
+            retry_in = int(self.user_rate_window - (now - recent[0])) + 1
+            raise AdmissionRejected(
+                f"Слишком много запросов: не больше {self.user_rate} за {int(self.user_rate_window)} с. "
+                f"Попробуйте через {retry_in} с."
+            )
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            logger.warning("🚦 Очередь заполнена (%s), запрос пользователя %s отклонен", self.queued, user_id)
+            raise AdmissionRejected("Бот сейчас перегружен. Попробуйте немного позже.")
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.admitted.done() and not ticket.admitted.cancelled():
+            self.in_flight -= 1
+            self._active[ticket.user_id] -= 1
+            if not self._active[ticket.user_id]:
+                del self._active[ticket.user_id]
+        else:
+            queue = self._queues.get(ticket.user_id)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                self.queued -= 1
+                if not queue:
+                    del self._queues[ticket.user_id]
+            if not ticket.admitted.done():
+                ticket.admitted.cancel()
+        self._dispatch()
+
+    def position(self, ticket: AdmissionTicket) -> int:
+        if ticket.admitted.done():
+            return 0
+        for index, queued in enumerate(self._fair_order(), start=1):
+            if queued is ticket:
+                return index
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "users_waiting": len(self._queues),
+            "rejected": self.rejected,
+        }
+
+    def _fair_order(self) -> List[AdmissionTicket]:
+        """Очередь в порядке обслуживания: по одному запросу каждого пользователя по кругу"""
+        users = sorted(self._queues, key=self._turn)
+        queues = [list(self._queues[user_id]) for user_id in users]
+        order: List[AdmissionTicket] = []
+        depth = 0
+        while any(depth < len(queue) for queue in queues):
+            order.extend(queue[depth] for queue in queues if depth < len(queue))
+            depth += 1
+        return order
+
+    def _turn(self, user_id: Any) -> Tuple[int, int]:
+        """Очередность пользователя: сначала без выполняющихся проверок, потом давно не обслуженные"""
+        return self._active.get(user_id, 0), self._served.get(user_id, 0)
+
+    def _dispatch(self) -> None:
+        """Допускает проверки, пока есть свободные места, обходя пользователей по кругу"""
+        while self.in_flight < self.max_in_flight:
+            eligible = [user_id for user_id in self._queues if self._active.get(user_id, 0) < self.user_concurrency]
+            if not eligible:
+                return
+            user_id = min(eligible, key=self._turn)
+            queue = self._queues[user_id]
+            ticket = queue.popleft()
+            if not queue:
+                del self._queues[user_id]
+            self.queued -= 1
+            self.in_flight += 1
+            self._active[user_id] = self._active.get(user_id, 0) + 1
+            self._serve_seq += 1
+            self._served[user_id] = self._serve_seq
+            ticket.admitted.set_result(True)
+
+    def _prune(self, now: float) -> None:
+        """Забывает пользователей без запросов в очереди, в работе и в окне частоты"""
+        for user_id in list(self._recent):
+            recent = self._recent[user_id]
+            if user_id in self._queues or user_id in self._active:
+                continue
+            if not recent or now - recent[-1] >= self.user_rate_window:
+                del self._recent[user_id]
+                self._served.pop(user_id, None)
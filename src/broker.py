@@ -0,0 +1,271 @@
+"""
+Брокер между ботом и воркерами: бот отдает проверки, воркеры возвращают прогресс и ответы.
+SQLite-файл для воркеров на том же хосте или Redis для воркеров на других узлах.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from job_queue import Job, JobQueue
+from tracing import current_trace_context, span
+
+logger = logging.getLogger(__name__)
+
+# Сообщения воркера по задаче:
+# accepted  — воркер взял задачу, с этого момента действует аренда WORKER_LEASE_SECONDS;
+# heartbeat — воркер жив, аренда продлевается;
+# progress  — строка прогресса для сообщения «Проверяю факты»;
+# result    — готовый ответ пользователю;
+# error     — проверка завершилась ошибкой
+ACCEPTED = "accepted"
+HEARTBEAT = "heartbeat"
+PROGRESS = "progress"
+RESULT = "result"
+ERROR = "error"
+
+# (id задачи, тип сообщения, содержимое)
+Update = Tuple[int, str, str]
+
+REDIS_PREFIXES = ("redis://", "rediss://", "unix://")
+UPDATES_BATCH = 100
+
+
+def job_payload(job: Job) -> Dict[str, Any]:
+    """
+    Что воркеру нужно для проверки; user_id — для учета расхода и бюджета,
+    enqueued_at — чтобы не брать устаревшие задачи, trace — чтобы спаны воркера попали в трассу сообщения
+    """
+    return {
+        "id": job.id,
+        "text": job.text,
+        "user_name": job.user_name,
+        "user_id": job.user_id if job.user_id is not None else job.chat_id,
+        "enqueued_at": time.time(),
+        "trace": current_trace_context(),
+    }
+
+
+class SQLiteBroker:
+    """
+    Брокер в файле SQLite: бот и воркеры открывают один файл (WAL), задачи забираются
+    атомарным DELETE ... RETURNING — каждую задачу получает ровно один воркер.
+    """
+
+    def __init__(self, db_path: str, poll_interval: Optional[float] = None):
+        self.db_path = db_path
+        self.poll_interval = poll_interval if poll_interval is not None else Config.BROKER_POLL_INTERVAL
+        self._db_lock = threading.Lock()
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Файл открыт из нескольких процессов: ждем блокировку, а не падаем
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS broker_jobs (seq INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS broker_updates (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL
+            )
+            """
+        )
+        conn.commit()
+        return conn
+
+    async def put_job(self, payload: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._execute, "INSERT INTO broker_jobs (payload) VALUES (?)", (json.dumps(payload),))
+
+    async def get_job(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Забирает самую старую задачу; None, если за timeout секунд задач не появилось"""
+        deadline = time.monotonic() + timeout
+        while True:
+            row = await asyncio.to_thread(self._pop_job)
+            if row is not None:
+                return json.loads(row)
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    async def put_update(self, job_id: int, kind: str, payload: str = "") -> None:
+        await asyncio.to_thread(
+            self._execute, "INSERT INTO broker_updates (job_id, kind, payload) VALUES (?, ?, ?)", (job_id, kind, payload)
+        )
+
+    async def get_updates(self, timeout: float) -> List[Update]:
+        """Забирает накопившиеся сообщения воркеров в порядке поступления"""
+        deadline = time.monotonic() + timeout
+        while True:
+            updates = await asyncio.to_thread(self._pop_updates)
+            if updates or time.monotonic() >= deadline:
+                return updates
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self) -> None:
+        self._conn.close()
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        with self._db_lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    def _pop_job(self) -> Optional[str]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "DELETE FROM broker_jobs WHERE seq = (SELECT MIN(seq) FROM broker_jobs) RETURNING payload"
+            ).fetchone()
+            self._conn.commit()
+        return row[0] if row else None
+
+    def _pop_updates(self) -> List[Update]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "DELETE FROM broker_updates WHERE seq IN (SELECT seq FROM broker_updates ORDER BY seq LIMIT ?) "
+                "RETURNING seq, job_id, kind, payload",
+                (UPDATES_BATCH,)
+            ).fetchall()
+            self._conn.commit()
+        # Порядок строк RETURNING не гарантирован
+        return [(job_id, kind, payload) for _, job_id, kind, payload in sorted(rows)]
+
+
+class RedisBroker:
+    """Брокер на списках Redis (или совместимого сервера) — для воркеров на других узлах"""
+
+    def __init__(self, url: str, prefix: str = "factcheck"):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("Для BROKER_URL вида redis:// нужен пакет redis>=5: pip install redis") from e
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._jobs_key = f"{prefix}:jobs"
+        self._updates_key = f"{prefix}:updates"
+
+    async def put_job(self, payload: Dict[str, Any]) -> None:
+        await self._redis.lpush(self._jobs_key, json.dumps(payload))
+
+    async def get_job(self, timeout: float) -> Optional[Dict[str, Any]]:
+        item = await self._redis.brpop([self._jobs_key], timeout=timeout)
+        return json.loads(item[1]) if item else None
+
+    async def put_update(self, job_id: int, kind: str, payload: str = "") -> None:
+        await self._redis.lpush(self._updates_key, json.dumps([job_id, kind, payload]))
+
+    async def get_updates(self, timeout: float) -> List[Update]:
+        item = await self._redis.brpop([self._updates_key], timeout=timeout)
+        if not item:
+            return []
+        rest = await self._redis.rpop(self._updates_key, UPDATES_BATCH - 1) or []
+        return [tuple(json.loads(raw)) for raw in [item[1], *rest]]
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_broker(url: Optional[str] = None):
+    """BROKER_URL: redis://, rediss:// или unix:// — Redis, иначе путь к файлу SQLite"""
+    url = url or Config.BROKER_URL
+    if url.startswith(REDIS_PREFIXES):
+        return RedisBroker(url)
+    return SQLiteBroker(url.removeprefix("sqlite:///"))
+
+
+class RemoteChecks:
+    """
+    Сторона бота: отдает задачу воркерам и ждет ответ, показывая их прогресс.
+    Пока задачу не взял ни один воркер, ждем до WORKER_QUEUE_TIMEOUT; взятая задача,
+    по которой воркер молчит дольше WORKER_LEASE_SECONDS, отдается снова
+    (не больше JOB_MAX_ATTEMPTS попыток на задачу).
+    """
+
+    def __init__(self, broker, jobs: JobQueue, lease: Optional[float] = None, queue_timeout: Optional[float] = None):
+        self.broker = broker
+        self.jobs = jobs
+        self.lease = lease if lease is not None else Config.WORKER_LEASE_SECONDS
+        self.queue_timeout = queue_timeout if queue_timeout is not None else Config.WORKER_QUEUE_TIMEOUT
+        self._waiters: Dict[int, asyncio.Queue] = {}
+        self._router: Optional[asyncio.Task] = None
+
+    async def run(self, job: Job, on_step: Callable[[str], Awaitable[None]]) -> str:
+        """Ответ воркера для задачи; ошибка воркера или таймаут — исключение"""
+        self._start_router()
+        updates: asyncio.Queue = asyncio.Queue()
+        self._waiters[job.id] = updates
+        # Попытка, начатая перед вызовом, уже учтена в журнале
+        attempts = job.attempts + 1
+        try:
+            with span("remote_check", job_id=job.id) as remote_span:
+                await self.broker.put_job(job_payload(job))
+                accepted = False
+                while True:
+                    try:
+                        kind, payload = await asyncio.wait_for(
+                            updates.get(), timeout=self.lease if accepted else self.queue_timeout
+                        )
+                    except asyncio.TimeoutError:
+                        if not accepted:
+                            raise RuntimeError("нет свободных воркеров, попробуйте позже")
+                        if attempts >= self.jobs.max_attempts:
+                            raise RuntimeError("воркер перестал отвечать")
+                        logger.warning(f"⏰ Воркер не отвечает по задаче {job.id}, отдаем ее снова")
+                        await self.jobs.start(job.id)
+                        attempts += 1
+                        accepted = False
+                        remote_span.set_attribute("redeliveries", attempts - job.attempts - 1)
+                        await self.broker.put_job(job_payload(job))
+                        continue
+
+                    if kind == ACCEPTED:
+                        accepted = True
+                        remote_span.set_attribute("worker", payload)
+                    elif kind == PROGRESS:
+                        await on_step(payload)
+                    elif kind == RESULT:
+                        return payload
+                    elif kind == ERROR:
+                        raise RuntimeError(payload)
+        finally:
+            self._waiters.pop(job.id, None)
+
+    def _start_router(self) -> None:
+        if self._router is None or self._router.done():
+            self._router = asyncio.create_task(self._route())
+
+    async def _route(self) -> None:
+        """Раздает сообщения воркеров ждущим задачам; сообщения по чужим задачам отбрасываются"""
+        while True:
+            try:
+                updates = await self.broker.get_updates(timeout=1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка чтения брокера: {e}")
+                await asyncio.sleep(1)
+                continue
+            for job_id, kind, payload in updates:
+                waiter = self._waiters.get(job_id)
+                if waiter:
+                    waiter.put_nowait((kind, payload))
+                else:
+                    logger.debug(f"Сообщение воркера по задаче {job_id} без ожидающей проверки")
+
+    async def close(self) -> None:
+        if self._router:
+            self._router.cancel()
+            await asyncio.gather(self._router, return_exceptions=True)
+            self._router = None
+        await self.broker.close()
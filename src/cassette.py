@@ -0,0 +1,268 @@
+"""
+Кассета OpenAI: запись обменов с API и детерминированное воспроизведение без сети
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from openai._models import construct_type
+from openai.types.chat import ChatCompletion
+from openai.types.responses import Response, ResponseStreamEvent
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Параметры запроса, не влияющие на ответ: в ключ записи не входят
+VOLATILE_KWARGS = {"timeout", "extra_headers"}
+
+_RESPONSE_TYPES = {
+    "chat.completions.create": ChatCompletion,
+    "responses.create": Response,
+    "responses.retrieve": Response,
+    "responses.cancel": Response,
+}
+
+
+class CassetteMiss(RuntimeError):
+    """В режиме replay для запроса нет записи"""
+
+
+def request_key(endpoint: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+    """Ключ записи — хеш эндпоинта и содержимого запроса"""
+    payload = {
+        "endpoint": endpoint,
+        "args": list(args),
+        "kwargs": {key: value for key, value in kwargs.items() if key not in VOLATILE_KWARGS},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _dump(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json", warnings=False)
+    if isinstance(obj, SimpleNamespace):
+        return {key: _dump(value) for key, value in vars(obj).items()}
+    if isinstance(obj, dict):
+        return {key: _dump(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_dump(value) for value in obj]
+    return obj
+
+
+def _namespace(data: Any) -> Any:
+    if isinstance(data, dict):
+        return SimpleNamespace(**{key: _namespace(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return [_namespace(value) for value in data]
+    return data
+
+
+def _load_response(endpoint: str, data: Any) -> Any:
+    """
+    Восстанавливает объект SDK так же, как его строит сам клиент — без строгой валидации;
+    ответ эндпоинта без известной схемы отдается как SimpleNamespace
+    """
+    model = _RESPONSE_TYPES.get(endpoint)
+    if model is None or not isinstance(data, dict):
+        return _namespace(data)
+    return construct_type(type_=model, value=data)
+
+
+def _load_event(data: Any) -> Any:
+    return construct_type(type_=ResponseStreamEvent, value=data)
+
+
+class Cassette:
+    """
+    Записи в JSONL: одна строка — один обмен (ключ, эндпоинт, запрос, ответ или события
+    потока, время ответа). Одинаковые запросы воспроизводятся в порядке записи, последний
+    ответ повторяется — так опрос фонового ответа снова проходит queued → completed.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", time_scale: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self._records: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursors: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._load()
+
+    def _load(self) -> None:
+        if self.mode == "record" or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._records[record["key"]].append(record)
+        logger.info(f"📼 Кассета {self.path}: {sum(map(len, self._records.values()))} записей")
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        records = self._records.get(key)
+        if not records:
+            self.misses += 1
+            return None
+        self.hits += 1
+        index = min(self._cursors[key], len(records) - 1)
+        self._cursors[key] += 1
+        return records[index]
+
+    def append(self, record: Dict[str, Any]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._records[record["key"]].append(record)
+        self.recorded += 1
+
+    async def wait(self, seconds: float) -> None:
+        if seconds > 0 and self.time_scale > 0:
+            await asyncio.sleep(seconds * self.time_scale)
+
+
+class CassetteOpenAI:
+    """
+    Обертка над AsyncOpenAI: chat.completions.create и responses.create/retrieve/cancel
+    записываются или воспроизводятся по кассете. Ошибки API не записываются — повтор
+    после них записывается как обычный ответ. Остальные атрибуты клиента доступны как есть.
+    """
+
+    def __init__(self, client: Any, cassette: Cassette):
+        self._client = client
+        self.cassette = cassette
+        self.chat = SimpleNamespace(completions=_CassetteEndpoint(
+            self, getattr(getattr(client, "chat", None), "completions", None), "chat.completions"
+        ))
+        self.responses = _CassetteEndpoint(self, getattr(client, "responses", None), "responses")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    async def call(self, endpoint: str, method: Any, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        cassette = self.cassette
+        key = request_key(endpoint, args, kwargs)
+
+        if cassette.mode in ("replay", "passthrough"):
+            record = cassette.lookup(key)
+            if record is not None:
+                return await self._replay(record)
+            if cassette.mode == "replay":
+                raise CassetteMiss(f"Нет записи {endpoint} ({key}) в кассете {cassette.path}")
+            return await method(*args, **kwargs)
+
+        started = time.monotonic()
+        response = await method(*args, **kwargs)
+        record = {"key": key, "endpoint": endpoint, "request": _dump({"args": list(args), **kwargs}),
+                  "elapsed": round(time.monotonic() - started, 4)}
+        if kwargs.get("stream") and hasattr(response, "__aiter__"):
+            return _RecordingStream(response, cassette, record, started)
+        record["response"] = _dump(response)
+        cassette.append(record)
+        return response
+
+    async def _replay(self, record: Dict[str, Any]) -> Any:
+        await self.cassette.wait(record.get("elapsed", 0))
+        if "events" in record:
+            return _ReplayStream(self.cassette, record)
+        return _load_response(record["endpoint"], record["response"])
+
+
+class _CassetteEndpoint:
+    def __init__(self, owner: CassetteOpenAI, endpoint: Any, name: str):
+        self._owner = owner
+        self._endpoint = endpoint
+        self._name = name
+
+    async def create(self, **kwargs) -> Any:
+        return await self._owner.call(f"{self._name}.create", getattr(self._endpoint, "create", None), (), kwargs)
+
+    async def retrieve(self, response_id: str, **kwargs) -> Any:
+        method = getattr(self._endpoint, "retrieve", None) or getattr(self._endpoint, "get", None)
+        return await self._owner.call(f"{self._name}.retrieve", method, (response_id,), kwargs)
+
+    async def cancel(self, response_id: str, **kwargs) -> Any:
+        return await self._owner.call(
+            f"{self._name}.cancel", getattr(self._endpoint, "cancel", None), (response_id,), kwargs
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._endpoint, name)
+
+
+class _RecordingStream:
+    """Пропускает события потока и записывает их со смещением от начала запроса"""
+
+    def __init__(self, stream: Any, cassette: Cassette, record: Dict[str, Any], started: float):
+        self._stream = stream
+        self._cassette = cassette
+        self._record = dict(record, events=[], offsets=[])
+        self._started = started
+        self._saved = False
+
+    async def __aiter__(self):
+        try:
+            async for event in self._stream:
+                self._record["events"].append(_dump(event))
+                self._record["offsets"].append(round(time.monotonic() - self._started, 4))
+                yield event
+        finally:
+            self._save()
+
+    async def close(self) -> None:
+        self._save()
+        close = getattr(self._stream, "close", None)
+        if close:
+            await close()
+
+    def _save(self) -> None:
+        if not self._saved and self._record["events"]:
+            self._saved = True
+            self._cassette.append(self._record)
+
+
+class _ReplayStream:
+    """Отдает записанные события с исходными (или масштабированными) интервалами"""
+
+    def __init__(self, cassette: Cassette, record: Dict[str, Any]):
+        self._cassette = cassette
+        self._record = record
+
+    async def __aiter__(self):
+        previous = self._record.get("elapsed", 0)
+        for data, offset in zip(self._record["events"], self._record["offsets"]):
+            await self._cassette.wait(offset - previous)
+            previous = offset
+            yield _load_event(data)
+
+    async def close(self) -> None:
+        pass
+
+
+def wrap_client(client: Any, mode: Optional[str] = None, path: Optional[str] = None,
+                time_scale: Optional[float] = None) -> Any:
+    """Оборачивает клиент кассетой по OPENAI_CASSETTE_*; в режиме off возвращает его как есть"""
+    mode = mode or Config.OPENAI_CASSETTE_MODE
+    if mode == "off":
+        return client
+    cassette = Cassette(
+        path or Config.OPENAI_CASSETTE_PATH,
+        mode,
+        Config.OPENAI_CASSETTE_TIME_SCALE if time_scale is None else time_scale
+    )
+    logger.info(f"📼 Кассета OpenAI: режим {mode}, {cassette.path}")
+    return CassetteOpenAI(client, cassette)
@@ -0,0 +1,100 @@
+"""
+Воркер фактчекинга: забирает задачи из брокера, прогоняет TwoStageFilter и возвращает ответ боту
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Any, Dict, Optional, Set
+
+from broker import ACCEPTED, ERROR, HEARTBEAT, PROGRESS, RESULT
+from command_handler import CommandHandler
+from config import Config
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class FactCheckWorker:
+    """
+    До WORKER_CONCURRENCY проверок одновременно. Пока идет проверка, раз в
+    WORKER_HEARTBEAT_INTERVAL боту уходит heartbeat — иначе бот сочтет воркер
+    упавшим и отдаст задачу другому.
+    """
+
+    def __init__(self, broker, handler: CommandHandler, concurrency: Optional[int] = None):
+        self.broker = broker
+        self.handler = handler
+        self.concurrency = concurrency if concurrency is not None else Config.WORKER_CONCURRENCY
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def run(self) -> None:
+        """Цикл до stop(); начатые проверки доводятся до конца"""
+        self.running = True
+        slots = asyncio.Semaphore(self.concurrency)
+        logger.info(f"🛠️ Воркер {self.name} запущен, одновременных проверок: {self.concurrency}")
+        while self.running:
+            await slots.acquire()
+            try:
+                job = await self.broker.get_job(timeout=1)
+            except Exception as e:
+                slots.release()
+                logger.error(f"❌ Ошибка чтения брокера: {e}")
+                await asyncio.sleep(1)
+                continue
+            if job is None:
+                slots.release()
+                continue
+            task = asyncio.create_task(self._process(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+        if self._tasks:
+            logger.info(f"⏳ Дожидаемся проверок в работе: {len(self._tasks)}")
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info(f"✅ Воркер {self.name} остановлен")
+
+    def stop(self) -> None:
+        self.running = False
+
+    @property
+    def in_progress(self) -> int:
+        return len(self._tasks)
+
+    async def _process(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        if time.time() - job.get("enqueued_at", time.time()) > Config.WORKER_QUEUE_TIMEOUT:
+            # Бот уже ответил пользователю, что свободных воркеров нет
+            logger.info(f"⌛ Задача {job_id} устарела в очереди, пропускаем")
+            return
+
+        await self.broker.put_update(job_id, ACCEPTED, self.name)
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+
+        async def report_step(step: str) -> None:
+            await self.broker.put_update(job_id, PROGRESS, step)
+
+        try:
+            # Спаны воркера продолжают трассу сообщения из процесса бота
+            with span("worker.check", parent=job.get("trace"), job_id=job_id, worker=self.name):
+                result_message = await self.handler.run_check(
+                    job["text"], job["user_name"], on_step=report_step, user_id=job.get("user_id")
+                )
+            await self.broker.put_update(job_id, RESULT, result_message)
+        except Exception as e:
+            logger.error(f"❌ Задача {job_id}: ошибка проверки: {e}")
+            await self.broker.put_update(job_id, ERROR, str(e))
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(Config.WORKER_HEARTBEAT_INTERVAL)
+            try:
+                await self.broker.put_update(job_id, HEARTBEAT, self.name)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось отправить heartbeat по задаче {job_id}: {e}")
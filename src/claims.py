@@ -0,0 +1,119 @@
+"""
+Разбиение сообщения на отдельные утверждения: ключи кэша, выбор доменов и сведение вердиктов
+"""
+
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from verdict_cache import text_key
+
+# Порядок «тяжести» статусов: итог не может быть лучше худшего утверждения
+STATUS_SEVERITY = {
+    "confirmed": 0,
+    "partially_confirmed": 1,
+    "unconfirmed": 2,
+    "contradictory": 3,
+}
+
+# Поля вердикта этапа 2, которые хранятся по каждому утверждению
+CLAIM_VERDICT_FIELDS = (
+    "verification_status",
+    "confidence_score",
+    "category",
+    "detailed_findings",
+    "contradictions",
+    "missing_evidence",
+    "special_notes",
+)
+
+
+def claim_key(claim: str) -> str:
+    """Ключ кэша утверждения — отдельное пространство ключей в кэше вердиктов"""
+    return "claim:" + text_key(claim)
+
+
+def parse_claims(payload: Any, allowed_domains: List[str], max_claims: int) -> List[Dict[str, Any]]:
+    """
+    Проверяет ответ модели-декомпозитора: непустые утверждения без повторов,
+    домены только из разрешенного списка, не больше max_claims штук
+    """
+    raw_claims = payload.get("claims") if isinstance(payload, dict) else None
+    if not isinstance(raw_claims, list):
+        return []
+
+    allowed = set(allowed_domains)
+    claims: List[Dict[str, Any]] = []
+    seen = set()
+    for item in raw_claims:
+        if not isinstance(item, dict):
+            continue
+        text = str(item.get("claim") or "").strip()
+        if not text or text_key(text) in seen:
+            continue
+        seen.add(text_key(text))
+        domains = item.get("domains")
+        domains = [d for d in domains if isinstance(d, str) and d in allowed] if isinstance(domains, list) else []
+        query = item.get("search_query")
+        claims.append({
+            "claim": text,
+            "domains": list(dict.fromkeys(domains)),
+            "search_query": query.strip() if isinstance(query, str) else "",
+        })
+        if len(claims) >= max_claims:
+            break
+    return claims
+
+
+def claim_verdict(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Оставляет от ответа этапа 2 только поля вердикта утверждения"""
+    return {name: result.get(name, "" if name != "confidence_score" else 0) for name in CLAIM_VERDICT_FIELDS}
+
+
+def aggregate_claims(results: Iterable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Сводит вердикты утверждений в один вердикт в формате этапа 2:
+    - все подтверждены — «confirmed», иначе статус худшего утверждения,
+      а смесь подтвержденных и неподтвержденных — «partially_confirmed»;
+    - уверенность — минимум по утверждениям для confirmed/contradictory и среднее для смеси;
+    - текстовые поля собираются по утверждениям с их номерами в сообщении.
+    Утверждения без ответа модели (status "failed") не учитываются.
+    """
+    results = list(results)
+    verified = [r for r in results if r.get("verification_status") in STATUS_SEVERITY]
+    if not verified:
+        return None
+
+    statuses = [r["verification_status"] for r in verified]
+    scores = [int(r.get("confidence_score") or 0) for r in verified]
+    worst = max(statuses, key=STATUS_SEVERITY.__getitem__)
+
+    if worst == "confirmed":
+        status, score = "confirmed", min(scores)
+    elif worst == "contradictory":
+        status = "contradictory"
+        score = min(score for score, s in zip(scores, statuses) if s == "contradictory")
+    elif all(s == "unconfirmed" for s in statuses):
+        status, score = "unconfirmed", min(scores)
+    else:
+        status, score = "partially_confirmed", round(sum(scores) / len(scores))
+
+    def numbered(field: str) -> str:
+        lines = []
+        for idx, result in enumerate(results, start=1):
+            if result.get("verification_status") not in STATUS_SEVERITY:
+                continue
+            value = result.get(field)
+            if isinstance(value, str) and value.strip():
+                lines.append(f"({idx}) {value.strip()}")
+        return " ".join(lines)
+
+    categories = Counter(r.get("category") for r in verified if r.get("category") and r.get("category") != "spam")
+    return {
+        "verification_status": status,
+        "confidence_score": score,
+        "category": categories.most_common(1)[0][0] if categories else "news",
+        "detailed_findings": numbered("detailed_findings"),
+        "contradictions": numbered("contradictions"),
+        "missing_evidence": numbered("missing_evidence"),
+        "special_notes": numbered("special_notes"),
+    }
@@ -4,17 +4,46 @@
 
 import logging
 import asyncio
-from typing import Optional
+import time
+from typing import Any, Awaitable, Callable, List, Optional
 from pyrogram.types import Message
 from two_stage_filter import TwoStageFilter, DebugInfo
+from pipeline_events import (
+    ClaimVerified, ClaimsExtracted, FinalVerdict, PartialVerdict, PipelineEvent, SinglePassStarted,
+    SourcesChosen, Stage1Completed, Stage2AttemptFailed, Stage2AttemptStarted
+)
+from admission import AdmissionTicket
+from broker import RemoteChecks, create_broker
+from job_queue import DONE, Job, JobQueue
+from metrics import CHECK_ERRORS
+from telegram_outbox import TelegramOutbox
+from tracing import span
+from usage import CheckUsage, UsageLedger
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Сколько последних шагов показывать в сообщении о ходе проверки
+PROGRESS_MAX_STEPS = 6
+STAGE1_STEP = "⏳ Этап 1: анализ сообщения и выбор источников..."
+RESUMED_STEP = "♻️ Проверка возобновлена после перезапуска бота"
+ECONOMY_NOTE = "\n\n💸 Дневной лимит исчерпан: проверка упрощенная — меньше источников, без перевода."
+
 class CommandHandler:
-    def __init__(self):
-        # Используем двухэтапную систему фактчекинга
-        self.two_stage_filter = TwoStageFilter()
+    def __init__(self, worker: bool = False):
+        """worker — обработчик внутри воркера: только проверка, без журнала и брокера"""
+        # Все исходящие вызовы Telegram — через общую очередь с учетом FloodWait
+        self.outbox = TelegramOutbox()
+        # Принятые проверки сохраняются на диск и возобновляются после перезапуска
+        self.jobs = JobQueue() if Config.JOB_QUEUE_ENABLED and not worker else None
+        # В режиме frontend проверки выполняют отдельные процессы-воркеры (worker.py)
+        self.remote = RemoteChecks(create_broker(), self.jobs) \
+            if Config.BOT_MODE == "frontend" and self.jobs and not worker else None
+        # Двухэтапная система фактчекинга — только там, где проверка выполняется: фронтенду
+        # не нужны клиент OpenAI, спам-модель и кэши на диске, которые пишут воркеры
+        self.two_stage_filter = TwoStageFilter() if not self.remote else None
+        # Расход OpenAI по пользователям пишет тот, кто выполняет проверку (бот или воркер)
+        self.usage_ledger = UsageLedger() if Config.USAGE_LEDGER_ENABLED and not self.remote else None
         
     def _extract_text_from_message(self, message: Message) -> str:
         """Извлекает текст из сообщения (text или caption)"""
@@ -25,9 +54,41 @@ class CommandHandler:
         else:
             return ""
     
-    async def handle_fact_check(self, bot, message: Message):
-        """Обработка любого текстового сообщения для проверки фактов"""
-        
+    async def handle_fact_check(self, bot, message: Message, ticket: Optional[AdmissionTicket] = None):
+        """
+        Обработка любого текстового сообщения для проверки фактов.
+        С ticket проверка сначала ждет допуска в очереди, показывая позицию.
+        """
+        try:
+            # Корневой спан: одна трасса на входящее сообщение
+            with span("telegram.message", chat_id=message.chat.id, message_id=message.id):
+                await self._run_fact_check(bot, message, ticket)
+        finally:
+            if ticket:
+                ticket.release()
+
+    async def resume_job(self, bot, job: Job, ticket: Optional[AdmissionTicket] = None):
+        """Возобновляет проверку, прерванную перезапуском бота"""
+        try:
+            with span("job.resume", job_id=job.id, chat_id=job.chat_id, message_id=job.message_id, attempts=job.attempts):
+                if job.status == DONE:
+                    # Вердикт уже получен, не успели только показать его
+                    await self._deliver_result(bot, job.chat_id, job.progress_message_id, job.result, job)
+                elif job.attempts >= self.jobs.max_attempts:
+                    logger.warning(f"⚠️ Задача {job.id} не завершилась за {job.attempts} попыток, отменяем")
+                    await self.jobs.fail(job.id, "Превышено число попыток")
+                    await self._show_error(bot, job.chat_id, job.message_id, job.progress_message_id,
+                                           "проверка несколько раз прерывалась перезапуском бота")
+                else:
+                    logger.info(f"♻️ Возобновляем задачу {job.id} (попытка {job.attempts + 1})")
+                    await self._check_and_reply(bot, job.chat_id, job.message_id, job.text, job.user_name,
+                                                ticket, job, progress_message_id=job.progress_message_id,
+                                                user_id=job.user_id if job.user_id is not None else job.chat_id)
+        finally:
+            if ticket:
+                ticket.release()
+
+    async def _run_fact_check(self, bot, message: Message, ticket: Optional[AdmissionTicket]):
         text_to_check = self._extract_text_from_message(message)
         
         if len(text_to_check) < 10:
@@ -41,56 +102,225 @@ class CommandHandler:
                            "Отправьте текст длиной минимум 10 символов для проверки фактов.\n\n" \
                            "💡 Используйте `/help` для получения справки."
             
-            await bot.send_message(
+            await self.outbox.send_message(
+                bot,
                 chat_id=message.chat.id,
                 text=error_text
             )
             return
         
-        # Показываем что начали обработку
-        processing_msg = await bot.send_message(
-            chat_id=message.chat.id,
-            text="🔄 **Проверяю факты...**\n\n"
-                 f"📝 {text_to_check[:100]}{'...' if len(text_to_check) > 100 else ''}\n\n"
-                 "⏳ Двухэтапная проверка в процессе..."
-        )
+        user_name = f"Пользователь {message.from_user.username or message.from_user.first_name}"
+        user_id = message.from_user.id if message.from_user else message.chat.id
+        job = None
+        if self.jobs:
+            # Задача записывается до начала проверки — после перезапуска она будет возобновлена
+            job = await self.jobs.enqueue(message.chat.id, message.id, user_id, user_name, text_to_check)
+            if job is None:
+                logger.info(f"♻️ Сообщение {message.id} уже принято в работу, повтор пропускаем")
+                return
         
-        try:
-            # Используем двухэтапную систему
-            category, comment, debug_info = await self.two_stage_filter.analyze_message(
-                text_to_check, f"Пользователь {message.from_user.username or message.from_user.first_name}"
-            )
-            
-            # Формируем результат
-            result_message = await self._format_fact_check_result(
-                category, comment, debug_info
-            )
-            
-            # Отправляем reply на оригинальное сообщение
-            await bot.send_message(
-                chat_id=message.chat.id,
-                text=result_message,
-                reply_to_message_id=message.id
+        await self._check_and_reply(bot, message.chat.id, message.id, text_to_check, user_name, ticket, job,
+                                    user_id=user_id)
+
+    async def _check_and_reply(
+        self,
+        bot,
+        chat_id: int,
+        reply_to_id: int,
+        text_to_check: str,
+        user_name: str,
+        ticket: Optional[AdmissionTicket],
+        job: Optional[Job],
+        progress_message_id: Optional[int] = None,
+        user_id: Any = None
+    ):
+        """Проверка с сообщением о ходе работы, которое в конце заменяется ответом"""
+        queue_position = ticket.position() if ticket else 0
+        progress_steps = [self._queue_step(queue_position) if queue_position else STAGE1_STEP]
+        if progress_message_id is None:
+            # Показываем что начали обработку — это же сообщение потом станет ответом
+            processing_msg = await self.outbox.send_message(
+                bot,
+                chat_id=chat_id,
+                text=self._format_progress(text_to_check, progress_steps),
+                reply_to_message_id=reply_to_id
             )
+            progress_message_id = processing_msg.id
+            if job:
+                await self.jobs.set_progress_message(job.id, progress_message_id)
+        else:
+            progress_steps.insert(0, RESUMED_STEP)
+            await self._edit_progress(bot, chat_id, progress_message_id,
+                                      self._format_progress(text_to_check, progress_steps))
+        
+        try:
+            if ticket:
+                async def show_position(position: int) -> None:
+                    await self._edit_progress(bot, chat_id, progress_message_id,
+                                              self._format_progress(text_to_check, [self._queue_step(position)]))
+
+                with span("admission.wait", queue_position=queue_position):
+                    await ticket.wait(on_position=show_position, refresh=max(Config.PROGRESS_EDIT_INTERVAL, 1))
+                if queue_position:
+                    progress_steps = [STAGE1_STEP]
+                    await self._edit_progress(bot, chat_id, progress_message_id,
+                                              self._format_progress(text_to_check, progress_steps))
+            if job:
+                await self.jobs.start(job.id)
             
-            # Удаляем сообщение "обрабатываю"
-            await bot.delete_messages(
-                chat_id=message.chat.id,
-                message_ids=processing_msg.id
-            )
+            last_edit = time.monotonic()
+
+            async def show_step(step: str) -> None:
+                nonlocal last_edit
+                progress_steps.append(step)
+                # Правки не чаще PROGRESS_EDIT_INTERVAL, пропущенные шаги покажет следующая правка
+                if time.monotonic() - last_edit >= Config.PROGRESS_EDIT_INTERVAL:
+                    await self._edit_progress(bot, chat_id, progress_message_id,
+                                              self._format_progress(text_to_check, progress_steps))
+                    last_edit = time.monotonic()
+
+            if self.remote and job:
+                result_message = await self.remote.run(job, on_step=show_step)
+            else:
+                result_message = await self.run_check(text_to_check, user_name, on_step=show_step, user_id=user_id)
             
-            logger.info(f"✅ Проверен факт: {category} | {comment}")
+            # Заменяем сообщение "обрабатываю" итоговым ответом
+            await self._deliver_result(bot, chat_id, progress_message_id, result_message, job)
             
         except Exception as e:
             logger.error(f"❌ Ошибка проверки факта: {e}")
-            
-            await bot.edit_message_text(
-                chat_id=message.chat.id,
-                message_id=processing_msg.id,
-                text="❌ **Ошибка анализа**\n\n"
-                     f"Произошла ошибка при обработке: {str(e)}\n\n"
-                     "Попробуйте еще раз или отправьте другой текст."
-            )
+            CHECK_ERRORS.inc()
+            if job:
+                await self.jobs.fail(job.id, str(e))
+            await self._show_error(bot, chat_id, reply_to_id, progress_message_id, str(e))
+
+    async def run_check(
+        self,
+        text_to_check: str,
+        user_name: str,
+        on_step: Callable[[str], Awaitable[None]],
+        user_id: Any = None
+    ) -> str:
+        """
+        Прогоняет двухэтапную проверку, сообщая шаги прогресса, и возвращает текст ответа.
+        Расход OpenAI записывается на user_id; сверх дневного бюджета проверка идет экономно
+        """
+        if self.two_stage_filter is None:
+            raise RuntimeError("В режиме frontend проверку выполняют воркеры")
+        
+        usage = None
+        if self.usage_ledger and user_id is not None:
+            usage = CheckUsage(economy=await self._over_budget(user_id))
+        
+        final: Optional[FinalVerdict] = None
+        try:
+            async for event in self.two_stage_filter.analyze_message_events(text_to_check, user_name, usage):
+                if isinstance(event, FinalVerdict):
+                    final = event
+                    continue
+                step = self._describe_progress_event(event)
+                if step:
+                    await on_step(step)
+        finally:
+            if usage and usage.stages:
+                await self._record_usage(user_id, usage)
+        
+        logger.info(f"✅ Проверен факт: {final.category} | {final.comment}")
+        result_message = await self._format_fact_check_result(final.category, final.comment, final.debug)
+        if usage and usage.economy:
+            result_message += ECONOMY_NOTE
+        return result_message
+
+    async def _over_budget(self, user_id: Any) -> bool:
+        try:
+            over = await self.usage_ledger.over_budget(user_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось проверить бюджет пользователя {user_id}: {e}")
+            return False
+        if over:
+            logger.info(f"💸 Пользователь {user_id} исчерпал дневной бюджет, проверка в экономном режиме")
+        return over
+
+    async def _record_usage(self, user_id: Any, usage: CheckUsage) -> None:
+        try:
+            await self.usage_ledger.record(user_id, usage)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось записать расход пользователя {user_id}: {e}")
+
+    async def _deliver_result(self, bot, chat_id: int, progress_message_id: int, result_message: str, job: Optional[Job]):
+        """
+        Показывает вердикт. Для задачи вердикт сначала сохраняется: при повторной проверке
+        той же задачи показывается первый сохраненный вердикт, а не новый
+        """
+        if job:
+            result_message = await self.jobs.complete(job.id, result_message) or result_message
+        await self.outbox.edit_message_text(
+            bot,
+            chat_id=chat_id,
+            message_id=progress_message_id,
+            text=result_message
+        )
+        if job:
+            await self.jobs.mark_delivered(job.id)
+
+    async def _show_error(self, bot, chat_id: int, reply_to_id: int, progress_message_id: Optional[int], error: str):
+        text = "❌ **Ошибка анализа**\n\n" \
+               f"Произошла ошибка при обработке: {error}\n\n" \
+               "Попробуйте еще раз или отправьте другой текст."
+        if progress_message_id is None:
+            await self.outbox.send_message(bot, chat_id=chat_id, text=text, reply_to_message_id=reply_to_id)
+        else:
+            await self.outbox.edit_message_text(bot, chat_id=chat_id, message_id=progress_message_id, text=text)
+
+    def _format_progress(self, text: str, steps: List[str]) -> str:
+        """Текст сообщения о ходе проверки"""
+        preview = f"{text[:100]}{'...' if len(text) > 100 else ''}"
+        return "🔄 **Проверяю факты...**\n\n" \
+               f"📝 {preview}\n\n" + "\n".join(steps[-PROGRESS_MAX_STEPS:])
+
+    def _queue_step(self, position: int) -> str:
+        return f"🕒 В очереди: перед вами {position - 1}" if position > 1 else "🕒 В очереди: вы следующий"
+
+    def _describe_progress_event(self, event: PipelineEvent) -> Optional[str]:
+        """Строка прогресса для события пайплайна"""
+        if isinstance(event, Stage1Completed):
+            if not event.requires_fact_check:
+                return f"✅ Этап 1 ({event.elapsed:.0f}с): глубокая проверка не требуется"
+            return f"✅ Этап 1 ({event.elapsed:.0f}с): тема — {event.classification}"
+        if isinstance(event, SourcesChosen):
+            shown = ", ".join(event.domains[:5])
+            more = f" и еще {len(event.domains) - 5}" if len(event.domains) > 5 else ""
+            return f"🌐 Источники: {shown}{more}"
+        if isinstance(event, SinglePassStarted):
+            return f"⚡ Короткое утверждение: проверяю одним запросом по {len(event.domains)} источникам..."
+        if isinstance(event, Stage2AttemptStarted):
+            if event.speculative:
+                return "🔎 Этап 2: проверка по заранее подобранным источникам..."
+            hedge = " (параллельно)" if event.hedge else ""
+            return f"🔎 Этап 2: попытка {event.attempt} из {event.total}{hedge}..."
+        if isinstance(event, ClaimsExtracted):
+            return f"🧩 Утверждений в сообщении: {len(event.claims)}, проверяю параллельно..."
+        if isinstance(event, ClaimVerified):
+            if event.verification_status == "failed":
+                return f"⚠️ Утверждение {event.index} из {event.total}: проверить не удалось"
+            emoji = self._get_confidence_emoji(event.confidence_score)
+            cached = " (из кэша)" if event.cached else ""
+            return f"{emoji} Утверждение {event.index} из {event.total}: доверие {event.confidence_score}%{cached}"
+        if isinstance(event, Stage2AttemptFailed):
+            if event.timed_out:
+                return f"⏰ Попытка {event.attempt}: источники не ответили вовремя"
+            return f"⚠️ Попытка {event.attempt} не удалась"
+        if isinstance(event, PartialVerdict):
+            emoji = self._get_confidence_emoji(event.confidence_score)
+            return f"{emoji} Предварительно: доверие {event.confidence_score}%, оформляю ответ..."
+        return None
+
+    async def _edit_progress(self, bot, chat_id: int, message_id: int, text: str) -> None:
+        """Правка прогресса не должна ломать проверку"""
+        try:
+            await self.outbox.edit_message_text(bot, chat_id=chat_id, message_id=message_id, text=text)
+        except Exception as e:
+            logger.debug(f"Не удалось обновить прогресс: {e}")
 
     async def handle_help_command(self, bot, message: Message):
         """Обработка команды /help"""
@@ -133,7 +363,8 @@ Discord объявил новую функцию ИИ-модерации гол
             model=Config.GPT_MODEL
         )
         
-        await bot.send_message(
+        await self.outbox.send_message(
+            bot,
             chat_id=message.chat.id,
             text=help_text
         )
@@ -1,15 +1,47 @@
 import os
-from typing import List
+from typing import Dict, List, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _parse_int_mapping(raw: str) -> Dict[str, int]:
+    """Разбирает строку вида "news=1800,science=604800" в словарь"""
+    result: Dict[str, int] = {}
+    for item in raw.split(','):
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        try:
+            result[name.strip().lower()] = int(value.strip())
+        except ValueError:
+            continue
+    return result
+
+
+def _parse_price_mapping(raw: str) -> Dict[str, Tuple[float, float]]:
+    """Разбирает строку вида "gpt-4o=2.5/10,gpt-5=1.25/10" (вход/выход за 1M токенов)"""
+    result: Dict[str, Tuple[float, float]] = {}
+    for item in raw.split(','):
+        if '=' not in item or '/' not in item:
+            continue
+        name, prices = item.split('=', 1)
+        prompt_price, completion_price = prices.split('/', 1)
+        try:
+            result[name.strip().lower()] = (float(prompt_price), float(completion_price))
+        except ValueError:
+            continue
+    return result
+
+
 class Config:
     TELEGRAM_API_ID = int(os.getenv('TELEGRAM_API_ID', 0))
     TELEGRAM_API_HASH = os.getenv('TELEGRAM_API_HASH', '')
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
     
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
+    # Другой адрес API (прокси или локальная замена для бенчмарков, benchmarks/fake_openai.py)
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
     
     # Настройки фактчекинга
     GPT_MODEL = os.getenv('GPT_MODEL', 'gpt-5')
@@ -20,6 +52,46 @@ class Config:
     STAGE2_RETRY_DOMAIN_LIMIT = int(os.getenv('STAGE2_RETRY_DOMAIN_LIMIT', 5))
     FACT_CHECK_TIMEOUT = float(os.getenv('FACT_CHECK_TIMEOUT', 45))
     
+    # Хеджирование этапа 2: off — попытки строго по очереди, hedged — следующая попытка
+    # стартует параллельно, если текущая не уложилась в перцентиль наблюдаемой задержки
+    STAGE2_HEDGE_MODE = os.getenv('STAGE2_HEDGE_MODE', 'off').lower()
+    STAGE2_HEDGE_PERCENTILE = float(os.getenv('STAGE2_HEDGE_PERCENTILE', 0.75))
+    STAGE2_HEDGE_DELAY = float(os.getenv('STAGE2_HEDGE_DELAY', 15))  # пока нет статистики
+    STAGE2_HEDGE_MAX_PARALLEL = int(os.getenv('STAGE2_HEDGE_MAX_PARALLEL', 2))
+    
+    # Спекулятивный этап 2: стартует на локально подобранных источниках параллельно с этапом 1.
+    # Результат сохраняется, если источники этапа 1 покрыты не меньше чем на MIN_OVERLAP
+    # (0 — всегда сохранять, больше 1 — всегда перезапускать)
+    STAGE2_SPECULATIVE_MODE = os.getenv('STAGE2_SPECULATIVE_MODE', 'off').lower()
+    STAGE2_SPECULATIVE_MIN_OVERLAP = float(os.getenv('STAGE2_SPECULATIVE_MIN_OVERLAP', 0.5))
+    
+    # Режим пайплайна: two_stage — всегда этап 1 и этап 2; auto — короткие простые утверждения
+    # (сложность не выше SINGLE_PASS_MAX_COMPLEXITY) проверяются одним запросом Responses API,
+    # где классификация и веб-поиск по доменам из sources.json идут вместе
+    PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'two_stage').lower()
+    # Сложность — число слов плюс 10 за каждое следующее предложение и каждую ссылку
+    SINGLE_PASS_MAX_COMPLEXITY = int(os.getenv('SINGLE_PASS_MAX_COMPLEXITY', 25))
+    
+    # Разбиение длинных сообщений на отдельные утверждения: каждое проверяется своим запросом
+    # этапа 2 параллельно (не больше CLAIM_CONCURRENCY сразу), вердикты сводятся в один.
+    # Применяется, если сложность текста не ниже CLAIM_DECOMPOSITION_MIN_COMPLEXITY
+    CLAIM_DECOMPOSITION_ENABLED = os.getenv('CLAIM_DECOMPOSITION_ENABLED', 'false').lower() == 'true'
+    CLAIM_DECOMPOSITION_MIN_COMPLEXITY = int(os.getenv('CLAIM_DECOMPOSITION_MIN_COMPLEXITY', 40))
+    CLAIM_MAX_COUNT = int(os.getenv('CLAIM_MAX_COUNT', 5))
+    CLAIM_CONCURRENCY = int(os.getenv('CLAIM_CONCURRENCY', 3))
+    
+    # Транспорт Responses API: true — ответ берется из события response.completed потока,
+    # false — статус опрашивается. Опрос также остается запасным вариантом, если поток недоступен
+    STAGE2_STREAMING = os.getenv('STAGE2_STREAMING', 'true').lower() == 'true'
+    
+    # Общие лимиты OpenAI на процесс: запросы и оценка токенов в минуту (0 — без лимита).
+    # OPENAI_MODEL_RPM/TPM переопределяют их по моделям: "gpt-4o=500,gpt-5=50"
+    OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', 500))
+    OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', 200000))
+    OPENAI_MODEL_RPM = _parse_int_mapping(os.getenv('OPENAI_MODEL_RPM', ''))
+    OPENAI_MODEL_TPM = _parse_int_mapping(os.getenv('OPENAI_MODEL_TPM', ''))
+    OPENAI_LIMITER_MAX_RETRIES = int(os.getenv('OPENAI_LIMITER_MAX_RETRIES', 3))
+    
     # Token limits
     STAGE1_MAX_TOKENS = int(os.getenv('STAGE1_MAX_TOKENS', 1500))
     STAGE2_MAX_TOKENS = int(os.getenv('STAGE2_MAX_TOKENS', 2000))
@@ -30,6 +102,122 @@ class Config:
     # Настройки перевода
     TRANSLATE_TO_RUSSIAN = os.getenv('TRANSLATE_TO_RUSSIAN', 'true').lower() == 'true'
     
+    # Память переводов Stage 2.5 (SQLite, LRU-вытеснение)
+    TRANSLATION_MEMORY_ENABLED = os.getenv('TRANSLATION_MEMORY_ENABLED', 'true').lower() == 'true'
+    TRANSLATION_MEMORY_PATH = os.getenv('TRANSLATION_MEMORY_PATH', 'data/translation_memory.sqlite3')
+    TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv('TRANSLATION_MEMORY_MAX_ENTRIES', 50000))
+    
+    # Кэш вердиктов (LRU в памяти + SQLite на диске)
+    VERDICT_CACHE_ENABLED = os.getenv('VERDICT_CACHE_ENABLED', 'true').lower() == 'true'
+    VERDICT_CACHE_PATH = os.getenv('VERDICT_CACHE_PATH', 'data/verdict_cache.sqlite3')
+    VERDICT_CACHE_MEMORY_SIZE = int(os.getenv('VERDICT_CACHE_MEMORY_SIZE', 1000))
+    # TTL в секундах по классификации этапа 1
+    VERDICT_CACHE_TTLS = {
+        'news': 1800,
+        'science': 7 * 24 * 3600,
+        'entertainment': 24 * 3600,
+        'personal': 24 * 3600,
+        'spam': 7 * 24 * 3600,
+        'other': 6 * 3600,
+        **_parse_int_mapping(os.getenv('VERDICT_CACHE_TTLS', '')),
+    }
+    # Почти-дубликаты (SimHash): максимальное расстояние Хэмминга и минимальная длина текста
+    NEAR_DUP_ENABLED = os.getenv('NEAR_DUP_ENABLED', 'true').lower() == 'true'
+    NEAR_DUP_MAX_DISTANCE = int(os.getenv('NEAR_DUP_MAX_DISTANCE', 4))
+    NEAR_DUP_MIN_LENGTH = int(os.getenv('NEAR_DUP_MIN_LENGTH', 40))
+    
+    # Допуск проверок: длина очереди, одновременные проверки (всего и на пользователя),
+    # частота запросов пользователя в скользящем окне (секунды)
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 50))
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 4))
+    ADMISSION_USER_CONCURRENCY = int(os.getenv('ADMISSION_USER_CONCURRENCY', 1))
+    ADMISSION_USER_RATE = int(os.getenv('ADMISSION_USER_RATE', 5))
+    ADMISSION_USER_RATE_WINDOW = float(os.getenv('ADMISSION_USER_RATE_WINDOW', 60))
+    
+    # Журнал проверок (SQLite): незавершенные проверки возобновляются после перезапуска.
+    # Задача, прерванная JOB_MAX_ATTEMPTS раз, отменяется; завершенные хранятся JOB_RETENTION_HOURS
+    JOB_QUEUE_ENABLED = os.getenv('JOB_QUEUE_ENABLED', 'true').lower() == 'true'
+    JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', 'data/jobs.sqlite3')
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    JOB_RETENTION_HOURS = float(os.getenv('JOB_RETENTION_HOURS', 24))
+    
+    # Режим развертывания: standalone — проверки в процессе бота; frontend — бот только
+    # принимает сообщения и отвечает, проверки выполняют воркеры (worker.py) через брокер
+    BOT_MODE = os.getenv('BOT_MODE', 'standalone').lower()
+    # Брокер: путь к файлу SQLite (воркеры на том же хосте) или redis://, rediss://, unix:// (Redis)
+    BROKER_URL = os.getenv('BROKER_URL', 'data/broker.sqlite3')
+    BROKER_POLL_INTERVAL = float(os.getenv('BROKER_POLL_INTERVAL', 0.2))
+    # Воркер: одновременных проверок и интервал heartbeat (секунды). Бот отдает задачу снова,
+    # если взявший ее воркер молчит WORKER_LEASE_SECONDS, и отказывает, если задачу
+    # никто не взял за WORKER_QUEUE_TIMEOUT
+    WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', 4))
+    WORKER_HEARTBEAT_INTERVAL = float(os.getenv('WORKER_HEARTBEAT_INTERVAL', 10))
+    WORKER_LEASE_SECONDS = float(os.getenv('WORKER_LEASE_SECONDS', 60))
+    WORKER_QUEUE_TIMEOUT = float(os.getenv('WORKER_QUEUE_TIMEOUT', 300))
+    
+    # HTTP-эндпоинт метрик Prometheus (/metrics) и проверки готовности (/healthz);
+    # задержка event loop измеряется раз в METRICS_LOOP_LAG_INTERVAL секунд
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 8080))
+    METRICS_LOOP_LAG_INTERVAL = float(os.getenv('METRICS_LOOP_LAG_INTERVAL', 0.5))
+    
+    # Трассировка: none, jsonl (файл для trace_report.py) или otlp (OTLP/HTTP JSON коллектор);
+    # спаны выгружаются фоновым потоком раз в TRACING_FLUSH_INTERVAL секунд
+    TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none').lower()
+    TRACING_JSONL_PATH = os.getenv('TRACING_JSONL_PATH', 'logs/traces.jsonl')
+    TRACING_OTLP_ENDPOINT = os.getenv('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+    TRACING_SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', 'fact-checking-bot')
+    TRACING_FLUSH_INTERVAL = float(os.getenv('TRACING_FLUSH_INTERVAL', 2))
+    
+    # Учет расхода OpenAI: цены моделей в долларах за 1M токенов (вход/выход) и за вызов
+    # веб-поиска; дневной журнал по пользователям, моделям и этапам — в USAGE_DB_PATH
+    OPENAI_PRICES = {
+        'gpt-4o': (2.5, 10.0),
+        'gpt-4o-mini': (0.15, 0.6),
+        'gpt-5': (1.25, 10.0),
+        'gpt-5-mini': (0.25, 2.0),
+        **_parse_price_mapping(os.getenv('OPENAI_PRICES', '')),
+    }
+    OPENAI_WEB_SEARCH_PRICE = float(os.getenv('OPENAI_WEB_SEARCH_PRICE', 0.01))
+    USAGE_LEDGER_ENABLED = os.getenv('USAGE_LEDGER_ENABLED', 'true').lower() == 'true'
+    USAGE_DB_PATH = os.getenv('USAGE_DB_PATH', 'data/usage.sqlite3')
+    # Дневные бюджеты пользователя (UTC-сутки, 0 — без лимита). Сверх бюджета проверка
+    # идет экономно: без перевода, одна попытка этапа 2 на BUDGET_DOMAIN_LIMIT доменах,
+    # без спекуляции, хеджирования и разбиения на утверждения
+    USER_DAILY_BUDGET_USD = float(os.getenv('USER_DAILY_BUDGET_USD', 0))
+    USER_DAILY_TOKEN_BUDGET = int(os.getenv('USER_DAILY_TOKEN_BUDGET', 0))
+    BUDGET_DOMAIN_LIMIT = int(os.getenv('BUDGET_DOMAIN_LIMIT', 3))
+    
+    # Кассета OpenAI: off, record (вызовы идут в API и пишутся в OPENAI_CASSETTE_PATH),
+    # replay (только из кассеты, без сети) или passthrough (из кассеты, если запись есть,
+    # иначе в API без записи). OPENAI_CASSETTE_TIME_SCALE: 1 — исходные задержки, 0 — мгновенно
+    OPENAI_CASSETTE_MODE = os.getenv('OPENAI_CASSETTE_MODE', 'off').lower()
+    OPENAI_CASSETTE_PATH = os.getenv('OPENAI_CASSETTE_PATH', 'data/cassettes/openai.jsonl')
+    OPENAI_CASSETTE_TIME_SCALE = float(os.getenv('OPENAI_CASSETTE_TIME_SCALE', 1.0))
+    
+    # Исходящая очередь Telegram: сообщений в секунду всего, интервал между вызовами в один чат,
+    # максимальный FloodWait, который переждать и повторить (секунды), и число повторов
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 25))
+    TELEGRAM_CHAT_INTERVAL = float(os.getenv('TELEGRAM_CHAT_INTERVAL', 1.0))
+    TELEGRAM_FLOOD_WAIT_MAX = float(os.getenv('TELEGRAM_FLOOD_WAIT_MAX', 60))
+    TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', 3))
+    
+    # Как часто проверять изменения sources.json (секунды, 0 — не следить)
+    SOURCES_RELOAD_INTERVAL = float(os.getenv('SOURCES_RELOAD_INTERVAL', 5))
+    
+    # Локальный спам-фильтр перед этапом 1: модель, обученная train_spam_filter.py,
+    # и порог вероятности спама, с которого ответ дается без обращения к OpenAI
+    SPAM_FILTER_ENABLED = os.getenv('SPAM_FILTER_ENABLED', 'true').lower() == 'true'
+    SPAM_FILTER_MODEL_PATH = os.getenv('SPAM_FILTER_MODEL_PATH', 'data/spam_model.json')
+    SPAM_FILTER_THRESHOLD = float(os.getenv('SPAM_FILTER_THRESHOLD', 0.97))
+    # Журнал классификаций этапа 1 (JSONL) — обучающие данные спам-фильтра
+    STAGE1_LOG_ENABLED = os.getenv('STAGE1_LOG_ENABLED', 'true').lower() == 'true'
+    STAGE1_LOG_PATH = os.getenv('STAGE1_LOG_PATH', 'data/stage1_classifications.jsonl')
+    
+    # Прогресс проверки: минимальный интервал между правками сообщения «Проверяю факты» (секунды)
+    PROGRESS_EDIT_INTERVAL = float(os.getenv('PROGRESS_EDIT_INTERVAL', 3))
+    
     @classmethod
     def validate(cls):
         errors = []
@@ -39,8 +227,14 @@ class Config:
             errors.append("TELEGRAM_API_HASH не установлен")
         if not cls.TELEGRAM_BOT_TOKEN:
             errors.append("TELEGRAM_BOT_TOKEN не установлен")
-        if not cls.OPENAI_API_KEY:
+        if not cls.OPENAI_API_KEY and cls.OPENAI_CASSETTE_MODE != "replay":
             errors.append("OPENAI_API_KEY не установлен")
+        if cls.BOT_MODE not in ("standalone", "frontend"):
+            errors.append(f"BOT_MODE должен быть standalone или frontend, а не {cls.BOT_MODE}")
+        if cls.OPENAI_CASSETTE_MODE not in ("off", "record", "replay", "passthrough"):
+            errors.append(f"OPENAI_CASSETTE_MODE должен быть off, record, replay или passthrough, а не {cls.OPENAI_CASSETTE_MODE}")
+        if cls.BOT_MODE == "frontend" and not cls.JOB_QUEUE_ENABLED:
+            errors.append("BOT_MODE=frontend требует JOB_QUEUE_ENABLED=true")
         
         if errors:
             raise ValueError(f"Ошибки конфигурации: {', '.join(errors)}")
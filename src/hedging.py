@@ -0,0 +1,90 @@
+"""
+Хеджированный запуск попыток: запасная попытка стартует, если первая затянулась
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Скользящее окно длительностей для вычисления перцентилей"""
+
+    def __init__(self, window: int = 200, min_samples: int = 5):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Перцентиль или None, пока наблюдений недостаточно"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+async def run_hedged(
+    attempts: List[Callable[[], Awaitable[Any]]],
+    hedge_delay: float,
+    max_parallel: int = 2,
+    on_launch: Optional[Callable[[int, bool], None]] = None
+) -> Any:
+    """
+    Запускает попытки по очереди: следующая стартует, если текущие не завершились
+    за hedge_delay, или сразу после ошибки. Побеждает первый успешный результат,
+    остальные попытки отменяются. Если все попытки упали — пробрасывает последнюю ошибку.
+
+    on_launch(номер_попытки, хедж) вызывается при каждом запуске.
+    """
+    if not attempts:
+        raise ValueError("Нет попыток для запуска")
+
+    pending: Set["asyncio.Task[Any]"] = set()
+    next_index = 0
+    last_error: Optional[BaseException] = None
+
+    def launch(hedge: bool) -> None:
+        nonlocal next_index
+        if on_launch:
+            on_launch(next_index + 1, hedge)
+        pending.add(asyncio.ensure_future(attempts[next_index]()))
+        next_index += 1
+
+    try:
+        launch(hedge=False)
+        while pending:
+            can_hedge = next_index < len(attempts) and len(pending) < max_parallel
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if can_hedge else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if not done:
+                logger.info("🪁 Хедж: попытка %s стартует параллельно (прошло %.1fс)", next_index + 1, hedge_delay)
+                launch(hedge=True)
+                continue
+
+            for task in done:
+                pending.discard(task)
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+
+            # Упавшую попытку сразу заменяем следующей, даже если хедж еще выполняется
+            if next_index < len(attempts) and len(pending) < max_parallel:
+                launch(hedge=False)
+
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
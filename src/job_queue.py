@@ -0,0 +1,189 @@
+"""
+Журнал проверок в SQLite: принятые запросы переживают перезапуск бота
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Статусы задачи:
+# pending   — принята, проверка еще не начиналась;
+# running   — проверка идет (после падения бота — возобновляется);
+# done      — вердикт получен и сохранен, но, возможно, еще не доставлен;
+# delivered — ответ показан пользователю;
+# failed    — проверка завершилась ошибкой, пользователю показано сообщение об ошибке
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+UNFINISHED = (PENDING, RUNNING, DONE)
+
+
+@dataclass
+class Job:
+    id: int
+    chat_id: int
+    message_id: int
+    user_id: Any
+    user_name: str
+    text: str
+    progress_message_id: Optional[int]
+    status: str
+    attempts: int
+    result: Optional[str]
+
+
+class JobQueue:
+    """
+    Задачи фактчекинга с гарантией «хотя бы один раз»: задача записывается до начала
+    проверки, а незавершенные задачи возобновляются при запуске. Вердикт сохраняется
+    один раз (повторное завершение игнорируется) и доставляется правкой того же сообщения,
+    так что повторная доставка не дублирует ответ.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_attempts: Optional[int] = None):
+        self.db_path = db_path or Config.JOB_QUEUE_PATH
+        self.max_attempts = max_attempts if max_attempts is not None else Config.JOB_MAX_ATTEMPTS
+        self._db_lock = threading.Lock()
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Каждая запись должна пережить падение процесса
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                user_id INTEGER,
+                user_name TEXT NOT NULL DEFAULT '',
+                text TEXT NOT NULL,
+                progress_message_id INTEGER,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (chat_id, message_id)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+        conn.commit()
+        return conn
+
+    async def enqueue(self, chat_id: int, message_id: int, user_id: Any, user_name: str, text: str) -> Optional[Job]:
+        """Записывает задачу; None — это сообщение уже принято (повторная доставка апдейта)"""
+        return await asyncio.to_thread(self._insert, chat_id, message_id, user_id, user_name, text)
+
+    async def set_progress_message(self, job_id: int, progress_message_id: int) -> None:
+        await asyncio.to_thread(
+            self._execute, "UPDATE jobs SET progress_message_id = ?, updated_at = ? WHERE id = ?",
+            (progress_message_id, time.time(), job_id)
+        )
+
+    async def start(self, job_id: int) -> None:
+        """Отмечает начало попытки проверки"""
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+            (RUNNING, time.time(), job_id, PENDING, RUNNING)
+        )
+
+    async def complete(self, job_id: int, result: str) -> Optional[str]:
+        """
+        Сохраняет вердикт. Если задача уже завершена (например, ее параллельно довела
+        другая попытка), возвращает ранее сохраненный вердикт — доставлять нужно его
+        """
+        return await asyncio.to_thread(self._complete, job_id, result)
+
+    async def mark_delivered(self, job_id: int) -> None:
+        await asyncio.to_thread(
+            self._execute, "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+            (DELIVERED, time.time(), job_id)
+        )
+
+    async def fail(self, job_id: int, error: str) -> None:
+        """Проверка не удалась; уже сохраненный вердикт ошибка доставки не затирает"""
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+            (FAILED, error, time.time(), job_id, PENDING, RUNNING)
+        )
+
+    async def unfinished(self) -> List[Job]:
+        """Незавершенные задачи в порядке поступления"""
+        return await asyncio.to_thread(self._select_unfinished)
+
+    async def purge(self, older_than: Optional[float] = None) -> int:
+        """Удаляет завершенные задачи старше older_than секунд"""
+        retention = older_than if older_than is not None else Config.JOB_RETENTION_HOURS * 3600
+        return await asyncio.to_thread(self._purge, time.time() - retention)
+
+    def _insert(self, chat_id: int, message_id: int, user_id: Any, user_name: str, text: str) -> Optional[Job]:
+        now = time.time()
+        with self._db_lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (chat_id, message_id, user_id, user_name, text, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (chat_id, message_id, user_id, user_name, text, PENDING, now, now)
+            )
+            self._conn.commit()
+            if cursor.rowcount == 0:
+                return None
+            job_id = cursor.lastrowid
+        return Job(job_id, chat_id, message_id, user_id, user_name, text, None, PENDING, 0, None)
+
+    def _complete(self, job_id: int, result: str) -> Optional[str]:
+        with self._db_lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (DONE, result, time.time(), job_id, PENDING, RUNNING)
+            )
+            self._conn.commit()
+            if cursor.rowcount:
+                return result
+            row = self._conn.execute("SELECT status, result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row and row[0] in (DONE, DELIVERED):
+            logger.info(f"♻️ Задача {job_id} уже завершена, используем сохраненный вердикт")
+            return row[1]
+        return None
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        with self._db_lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    def _select_unfinished(self) -> List[Job]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT id, chat_id, message_id, user_id, user_name, text, progress_message_id, status, attempts, result "
+                f"FROM jobs WHERE status IN ({', '.join('?' * len(UNFINISHED))}) ORDER BY id",
+                UNFINISHED
+            ).fetchall()
+        return [Job(*row) for row in rows]
+
+    def _purge(self, cutoff: float) -> int:
+        with self._db_lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DELIVERED, FAILED, cutoff)
+            )
+            self._conn.commit()
+        return cursor.rowcount
@@ -0,0 +1,75 @@
+"""
+Автомат Ахо — Корасик: все ключевые слова находятся за один проход по тексту
+"""
+
+from collections import deque
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Tuple
+
+_EMPTY: FrozenSet[Hashable] = frozenset()
+
+
+class KeywordAutomaton:
+    """
+    Поиск вхождений подстрок (как `keyword in text`) сразу для всех ключевых слов.
+    Каждому слову сопоставляются метки; find_labels возвращает метки всех слов,
+    встретившихся в тексте. Время поиска зависит от длины текста, а не от числа слов.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Hashable]] = ()):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._outputs: List[FrozenSet[Hashable]] = [_EMPTY]
+        self._pending: Dict[int, set] = {}
+        self.keyword_count = 0
+        for keyword, label in keywords:
+            self.add(keyword, label)
+        self.build()
+
+    def add(self, keyword: str, label: Hashable) -> None:
+        keyword = keyword.lower()
+        if not keyword:
+            return
+        node = 0
+        for char in keyword:
+            following = self._goto[node].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[node][char] = following
+                self._goto.append({})
+                self._outputs.append(_EMPTY)
+            node = following
+        self._pending.setdefault(node, set()).add(label)
+        self.keyword_count += 1
+
+    def build(self) -> None:
+        """Достраивает переходы по неудаче и сливает выходы суффиксов в каждый узел"""
+        for node, labels in self._pending.items():
+            self._outputs[node] = self._outputs[node] | frozenset(labels)
+        self._pending.clear()
+
+        fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in self._goto[state]:
+                    state = fail[state]
+                candidate = self._goto[state].get(char, 0)
+                fail[child] = candidate if candidate != child else 0
+                if self._outputs[fail[child]]:
+                    self._outputs[child] = self._outputs[child] | self._outputs[fail[child]]
+        self._fail = fail
+
+    def find_labels(self, text: str) -> FrozenSet[Hashable]:
+        """Метки всех ключевых слов, входящих в текст (без учета регистра)"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found: set = set()
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if outputs[node]:
+                found |= outputs[node]
+        return frozenset(found)
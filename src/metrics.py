@@ -0,0 +1,292 @@
+"""
+Метрики в формате Prometheus и HTTP-эндпоинт /metrics, /healthz.
+Без сторонних зависимостей: счетчики, гистограммы и gauge с текстовым форматом 0.0.4.
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм (секунды): пайплайн идет от миллисекунд (кэш) до минут (веб-поиск)
+LATENCY_BUCKETS = (0.05, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидались метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Монотонный счетчик; значение можно брать из функции в момент чтения метрик"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        if self._function:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        if self._function:
+            return [f"{self.name} {_format_value(self._function())}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """Текущее значение: задается set() или функцией"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # По меткам: счетчики попаданий в каждую границу (+Inf последним), сумма
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] = self._sums.get(key, 0) + value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key in sorted(self._counts):
+            cumulative = 0
+            for bound, hits in zip((*self.buckets, math.inf), self._counts[key]):
+                cumulative += hits
+                labels = _format_labels((*self.labelnames, "le"), (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+CHECKS = REGISTRY.counter(
+    "factcheck_checks_total", "Завершенные проверки по режиму пайплайна и итоговому статусу", ("pipeline_mode", "status")
+)
+CHECK_DURATION = REGISTRY.histogram(
+    "factcheck_check_duration_seconds", "Полное время проверки сообщения", ("pipeline_mode",)
+)
+STAGE_DURATION = REGISTRY.histogram(
+    "factcheck_stage_duration_seconds", "Время этапов: stage1, stage2, translation", ("stage",)
+)
+STAGE2_ATTEMPTS = REGISTRY.counter("factcheck_stage2_attempts_total", "Запущенные попытки этапа 2")
+STAGE2_HEDGES = REGISTRY.counter("factcheck_stage2_hedges_total", "Параллельные (хеджирующие) попытки этапа 2")
+STAGE2_FAILURES = REGISTRY.counter(
+    "factcheck_stage2_attempt_failures_total", "Неудачные попытки этапа 2: timeout или error", ("reason",)
+)
+FALLBACKS = REGISTRY.counter("factcheck_fallbacks_total", "Проверки, завершенные запасным путем после ошибки")
+WEB_SEARCHES = REGISTRY.counter("factcheck_web_search_total", "Проверки, в которых использовался веб-поиск")
+CHECK_ERRORS = REGISTRY.counter("factcheck_check_errors_total", "Проверки, закончившиеся ошибкой для пользователя")
+QUEUE_DEPTH = REGISTRY.gauge("factcheck_queue_depth", "Проверки, ожидающие допуска")
+IN_FLIGHT = REGISTRY.gauge("factcheck_in_flight", "Проверки, выполняющиеся сейчас")
+ADMISSION_REJECTED = REGISTRY.counter("factcheck_admission_rejected_total", "Запросы, отклоненные очередью допуска")
+OPENAI_TOKENS = REGISTRY.counter("factcheck_openai_tokens_total", "Токены OpenAI по модели: prompt или completion", ("model", "type"))
+OPENAI_COST = REGISTRY.counter("factcheck_openai_cost_usd_total", "Оценка стоимости вызовов OpenAI в долларах", ("model",))
+OPENAI_WEB_SEARCH_CALLS = REGISTRY.counter("factcheck_openai_web_search_calls_total", "Вызовы инструмента веб-поиска")
+LOOP_LAG = REGISTRY.histogram(
+    "factcheck_event_loop_lag_seconds", "Задержка event loop относительно запланированного пробуждения",
+    buckets=LOOP_LAG_BUCKETS
+)
+
+
+def record_check(debug, elapsed: float) -> None:
+    """Учитывает завершенную проверку по ее DebugInfo (None — слишком короткое сообщение)"""
+    if debug is None:
+        mode, status = "short", "skipped"
+    else:
+        if debug.cache_hit:
+            mode = "cache"
+        elif debug.coalesced:
+            mode = "coalesced"
+        elif debug.spam_filter_score is not None:
+            mode = "spam_filter"
+        else:
+            mode = debug.pipeline_mode or "two_stage"
+        status = debug.verification_status or "not_checked"
+    CHECKS.inc(pipeline_mode=mode, status=status)
+    CHECK_DURATION.observe(elapsed, pipeline_mode=mode)
+    # Кэш и присоединенные к single-flight проверки этапы не выполняли — их уже учел ведущий
+    if debug is None or debug.cache_hit or debug.coalesced:
+        return
+
+    if debug.stage1_time:
+        STAGE_DURATION.observe(debug.stage1_time, stage="stage1")
+    if debug.stage2_time:
+        STAGE_DURATION.observe(debug.stage2_time, stage="stage2")
+    if debug.stage2_attempts:
+        STAGE2_ATTEMPTS.inc(debug.stage2_attempts)
+    if debug.stage2_hedges:
+        STAGE2_HEDGES.inc(debug.stage2_hedges)
+    if debug.fallback_used:
+        FALLBACKS.inc()
+    if debug.web_search_used:
+        WEB_SEARCHES.inc()
+
+
+class MetricsServer:
+    """
+    HTTP-сервер на asyncio: /metrics — метрики Prometheus, /healthz — 200, когда
+    ready() истинно, иначе 503. Заодно измеряет задержку event loop.
+    """
+
+    def __init__(self, ready: Callable[[], bool], host: Optional[str] = None, port: Optional[int] = None,
+                 registry: MetricsRegistry = REGISTRY):
+        self.ready = ready
+        self.host = host or Config.METRICS_HOST
+        self.port = port if port is not None else Config.METRICS_PORT
+        self.registry = registry
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._lag_task = asyncio.create_task(self._watch_loop_lag(Config.METRICS_LOOP_LAG_INTERVAL))
+        logger.info(f"📈 Метрики: http://{self.host}:{self.port}/metrics, проверка готовности: /healthz")
+
+    async def stop(self) -> None:
+        if self._lag_task:
+            self._lag_task.cancel()
+            await asyncio.gather(self._lag_task, return_exceptions=True)
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Заголовки не нужны, но их надо дочитать
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else ""
+
+            if path == "/metrics":
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", self.registry.render()
+            elif path == "/healthz":
+                ready = self._is_ready()
+                status, content_type, body = ("200 OK" if ready else "503 Service Unavailable"), "text/plain", \
+                    ("ok\n" if ready else "not ready\n")
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", "not found\n"
+
+            payload = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"Запрос метрик прерван: {e}")
+        finally:
+            writer.close()
+
+    def _is_ready(self) -> bool:
+        try:
+            return bool(self.ready())
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка проверки готовности: {e}")
+            return False
+
+    async def _watch_loop_lag(self, interval: float) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            LOOP_LAG.observe(max(0.0, loop.time() - started - interval))
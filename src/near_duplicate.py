@@ -0,0 +1,224 @@
+"""
+Поиск почти-дубликатов сообщений по SimHash-отпечаткам
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_URL_RE = re.compile(r"(https?://\S+|www\.\S+|t\.me/\S+)")
+_MENTION_RE = re.compile(r"@\w+")
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+_SIGNATURE_RE = re.compile(r"^(подпис|читайте|источник|канал|subscribe|via)")
+_SIGNATURE_MAX_WORDS = 4
+
+FINGERPRINT_BITS = 64
+_MASK = (1 << FINGERPRINT_BITS) - 1
+SHINGLE_SIZE = 4
+_LANE_BITS = 20
+_LANE_TABLE = [sum((byte >> i & 1) << (_LANE_BITS * i) for i in range(8)) for byte in range(256)]
+_BYTE_SHIFTS = [8 * _LANE_BITS * i for i in range(8)]
+_NEGATIONS = {"не", "нет", "ни", "никогда", "not", "no", "never", "без"}
+
+
+def normalize_for_fingerprint(text: str) -> str:
+    """Убирает ссылки, упоминания, эмодзи и подписи каналов"""
+    lines: List[str] = []
+    for line in (text or "").casefold().replace("ё", "е").splitlines():
+        line = _MENTION_RE.sub(" ", _URL_RE.sub(" ", line))
+        line = _WHITESPACE_RE.sub(" ", _NON_WORD_RE.sub(" ", line)).strip()
+        if not line:
+            continue
+        if _SIGNATURE_RE.match(line) and len(line.split()) <= _SIGNATURE_MAX_WORDS:
+            continue
+        lines.append(line)
+    return " ".join(lines)
+
+
+def simhash(text: str) -> int:
+    """64-битный SimHash по символьным шинглам нормализованного текста"""
+    normalized = normalize_for_fingerprint(text)
+    if len(normalized) < SHINGLE_SIZE:
+        shingles = {normalized} if normalized else set()
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+    # Счетчики единиц по всем 64 битам складываются одним сложением длинных чисел:
+    # каждый бит хэша раскладывается в собственную 20-битную "дорожку"
+    total = 0
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        total += sum(_LANE_TABLE[byte] << shift for byte, shift in zip(digest, _BYTE_SHIFTS))
+
+    fingerprint = 0
+    lane_mask = (1 << _LANE_BITS) - 1
+    for bit in range(FINGERPRINT_BITS):
+        if 2 * (total >> (_LANE_BITS * bit) & lane_mask) > len(shingles):
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def guard_signature(text: str) -> str:
+    """
+    Числа и отрицания должны совпадать точно: "упал на 20%" и "упал на 25%"
+    близки по SimHash, но это разные утверждения
+    """
+    tokens = normalize_for_fingerprint(text).split()
+    numbers = [token for token in tokens if any(ch.isdigit() for ch in token)]
+    negations = sum(1 for token in tokens if token in _NEGATIONS)
+    return f"{' '.join(numbers)}|{negations}"
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK).bit_count()
+
+
+class NearDuplicateIndex:
+    """
+    Индекс отпечатков с разбиением на полосы (принцип Дирихле):
+    при расстоянии Хэмминга <= k хотя бы одна из k+1 полос совпадает точно,
+    поэтому поиск проверяет только кандидатов из совпавших корзин.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_distance: Optional[int] = None,
+        min_length: Optional[int] = None
+    ):
+        self.db_path = db_path or Config.VERDICT_CACHE_PATH
+        self.max_distance = max_distance if max_distance is not None else Config.NEAR_DUP_MAX_DISTANCE
+        self.min_length = min_length if min_length is not None else Config.NEAR_DUP_MIN_LENGTH
+        self._bands = self._band_layout(self.max_distance + 1)
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in self._bands]
+        self._fingerprints: Dict[str, Tuple[int, str]] = {}
+        self._db_lock = threading.Lock()
+        self._conn = self._connect()
+        self._load()
+
+    @staticmethod
+    def _band_layout(count: int) -> List[Tuple[int, int]]:
+        """Делит 64 бита на count полос: [(сдвиг, маска), ...]"""
+        layout: List[Tuple[int, int]] = []
+        base, extra = divmod(FINGERPRINT_BITS, count)
+        shift = 0
+        for index in range(count):
+            width = base + (1 if index < extra else 0)
+            layout.append((shift, (1 << width) - 1))
+            shift += width
+        return layout
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                key TEXT PRIMARY KEY,
+                simhash INTEGER NOT NULL,
+                guard TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        conn.commit()
+        return conn
+
+    def _load(self) -> None:
+        with self._db_lock:
+            rows = self._conn.execute("SELECT key, simhash, guard FROM fingerprints").fetchall()
+        for key, signed, guard in rows:
+            self._insert(key, signed & _MASK, guard)
+        if rows:
+            logger.info("🧬 Загружено %s отпечатков почти-дубликатов", len(rows))
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def eligible(self, text: str) -> bool:
+        """Слишком короткие тексты сравниваем только по точному ключу"""
+        return len(normalize_for_fingerprint(text)) >= self.min_length
+
+    def find(self, text: str) -> Optional[Tuple[str, int]]:
+        """Возвращает (ключ, расстояние) ближайшего сохраненного текста"""
+        if not self._fingerprints or not self.eligible(text):
+            return None
+        return self.find_fingerprint(simhash(text), guard_signature(text))
+
+    def find_fingerprint(self, fingerprint: int, guard: str) -> Optional[Tuple[str, int]]:
+        best: Optional[Tuple[str, int]] = None
+        checked: Set[str] = set()
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            for key in buckets.get(fingerprint >> shift & mask, ()):
+                if key in checked:
+                    continue
+                checked.add(key)
+                stored, stored_guard = self._fingerprints[key]
+                if stored_guard != guard:
+                    continue
+                distance = hamming_distance(fingerprint, stored)
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (key, distance)
+        return best
+
+    def add(self, key: str, text: str) -> Optional[Tuple[int, str]]:
+        """Индексирует текст под ключом вердикта (только в памяти, см. persist)"""
+        if not self.eligible(text):
+            return None
+        fingerprint = simhash(text)
+        guard = guard_signature(text)
+        self._insert(key, fingerprint, guard)
+        return fingerprint, guard
+
+    def persist(self, key: str, fingerprint: int, guard: str) -> None:
+        """Сохраняет отпечаток в SQLite; вызывается вне event loop"""
+        # SQLite хранит знаковые 64-битные целые
+        signed = fingerprint - (1 << FINGERPRINT_BITS) if fingerprint >> (FINGERPRINT_BITS - 1) else fingerprint
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (key, simhash, guard, created_at) VALUES (?, ?, ?, ?)",
+                (key, signed, guard, time.time())
+            )
+            self._conn.commit()
+
+    def remove(self, key: str) -> bool:
+        """Убирает отпечаток истекшего вердикта из памяти (из SQLite — см. delete)"""
+        return self._unindex(key)
+
+    def delete(self, key: str) -> None:
+        """Удаляет отпечаток из SQLite; вызывается вне event loop"""
+        with self._db_lock:
+            self._conn.execute("DELETE FROM fingerprints WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _unindex(self, key: str) -> bool:
+        entry = self._fingerprints.pop(key, None)
+        if entry is None:
+            return False
+        fingerprint = entry[0]
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            band = fingerprint >> shift & mask
+            bucket = buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del buckets[band]
+        return True
+
+    def _insert(self, key: str, fingerprint: int, guard: str) -> None:
+        self._unindex(key)
+        self._fingerprints[key] = (fingerprint, guard)
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault(fingerprint >> shift & mask, set()).add(key)
@@ -0,0 +1,268 @@
+"""
+Общий лимитер запросов к OpenAI: RPM/TPM по моделям и пауза по Retry-After
+"""
+
+import asyncio
+import email.utils
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from openai import RateLimitError
+
+from config import Config
+from tracing import span
+from usage import record_response
+
+logger = logging.getLogger(__name__)
+
+# Грубая оценка: ~4 символа на токен
+CHARS_PER_TOKEN = 4
+# Ответ без явного лимита токенов оцениваем так
+DEFAULT_COMPLETION_TOKENS = 1000
+
+
+class TokenBucket:
+    """Ведро токенов, пополняемое равномерно: limit единиц за period секунд"""
+
+    def __init__(self, limit: float, period: float = 60.0):
+        self.capacity = float(limit)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Сколько ждать, пока в ведре наберется amount (не больше емкости)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Возвращает (delta > 0) или доначисляет (delta < 0) токены после фактического расхода"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+    def utilisation(self) -> float:
+        self._refill()
+        return round(max(0.0, min(1.0, 1 - self.tokens / self.capacity)), 3)
+
+
+class _ModelLimits:
+    """Лимиты одной модели; очередь ожидающих — FIFO через asyncio.Lock"""
+
+    def __init__(self, rpm: int, tpm: int, period: float):
+        self.requests = TokenBucket(rpm, period) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, period) if tpm > 0 else None
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+        self.waiting = 0
+        self.waited_seconds = 0.0
+        self.rate_limited = 0
+
+    async def acquire(self, estimated_tokens: int) -> float:
+        """Ждет своей очереди и списывает запрос и оценку токенов; возвращает время ожидания"""
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            async with self.lock:
+                while True:
+                    delay = max(
+                        self.paused_until - time.monotonic(),
+                        self.requests.delay_for(1) if self.requests else 0.0,
+                        self.tokens.delay_for(estimated_tokens) if self.tokens else 0.0
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens:
+                    self.tokens.take(estimated_tokens)
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - started
+        self.waited_seconds += waited
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        self.rate_limited += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RateLimitedOpenAI:
+    """
+    Обертка над AsyncOpenAI: все chat.completions.create и responses.create проходят
+    через общие для процесса лимиты RPM/TPM модели. Вызывающий ждет своей очереди
+    вместо ошибки 429; на 429 модель ставится на паузу по Retry-After для всех вызовов.
+    Остальные атрибуты клиента доступны как есть.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        model_rpm: Optional[Dict[str, int]] = None,
+        model_tpm: Optional[Dict[str, int]] = None,
+        max_retries: Optional[int] = None,
+        period: float = 60.0
+    ):
+        self._client = client
+        self.rpm = rpm if rpm is not None else Config.OPENAI_RPM_LIMIT
+        self.tpm = tpm if tpm is not None else Config.OPENAI_TPM_LIMIT
+        self.model_rpm = model_rpm if model_rpm is not None else Config.OPENAI_MODEL_RPM
+        self.model_tpm = model_tpm if model_tpm is not None else Config.OPENAI_MODEL_TPM
+        self.max_retries = max_retries if max_retries is not None else Config.OPENAI_LIMITER_MAX_RETRIES
+        self.period = period
+        self._models: Dict[str, _ModelLimits] = {}
+
+        self.chat = _LimitedNamespace(
+            client.chat, completions=_LimitedEndpoint(self, client.chat.completions, "chat.completions")
+        )
+        self.responses = _LimitedEndpoint(self, client.responses, "responses")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def utilisation(self) -> Dict[str, Dict[str, Any]]:
+        """Текущая загрузка лимитов по моделям (доля 0..1) и статистика ожиданий"""
+        now = time.monotonic()
+        return {
+            model: {
+                "rpm": limits.requests.utilisation() if limits.requests else 0.0,
+                "tpm": limits.tokens.utilisation() if limits.tokens else 0.0,
+                "waiting": limits.waiting,
+                "paused_for": round(max(0.0, limits.paused_until - now), 1),
+                "waited_seconds": round(limits.waited_seconds, 1),
+                "rate_limited": limits.rate_limited,
+            }
+            for model, limits in self._models.items()
+        }
+
+    def _limits(self, model: str) -> _ModelLimits:
+        limits = self._models.get(model)
+        if limits is None:
+            key = model.lower()
+            limits = _ModelLimits(self.model_rpm.get(key, self.rpm), self.model_tpm.get(key, self.tpm), self.period)
+            self._models[model] = limits
+        return limits
+
+    async def call(self, method: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any], endpoint: str = "create") -> Any:
+        model = str(kwargs.get("model") or "default")
+        limits = self._limits(model)
+        estimated = estimate_tokens(kwargs)
+
+        with span(f"openai.{endpoint}", model=model, estimated_tokens=estimated,
+                  stream=bool(kwargs.get("stream")), background=bool(kwargs.get("background"))) as call_span:
+            waited_total = 0.0
+            for attempt in range(self.max_retries + 1):
+                waited = await limits.acquire(estimated)
+                waited_total += waited
+                call_span.set_attribute("limiter_wait_s", round(waited_total, 3))
+                if waited >= 1:
+                    logger.info("⏳ Лимит OpenAI для %s: ждали очереди %.1fс", model, waited)
+                try:
+                    response = await method(**kwargs)
+                except RateLimitError as err:
+                    if getattr(err, "code", None) == "insufficient_quota":
+                        raise
+                    delay = retry_after_seconds(err)
+                    if delay is None:
+                        delay = min(60.0, 2.0 ** attempt)
+                    limits.pause(delay)
+                    call_span.set_attribute("rate_limited", attempt + 1)
+                    if attempt >= self.max_retries:
+                        raise
+                    logger.warning("🚦 429 от OpenAI для %s, пауза %.1fс (попытка %s)", model, delay, attempt + 1)
+                    continue
+
+                record_response(model, response)
+                actual = _usage_tokens(response)
+                if actual is not None:
+                    call_span.set_attribute("total_tokens", actual)
+                    if limits.tokens:
+                        limits.tokens.adjust(estimated - actual)
+                return response
+
+
+class _LimitedEndpoint:
+    """create идет через лимитер, остальные методы — напрямую"""
+
+    def __init__(self, limiter: RateLimitedOpenAI, endpoint: Any, name: str = "create"):
+        self._limiter = limiter
+        self._endpoint = endpoint
+        self._name = name
+
+    async def create(self, **kwargs) -> Any:
+        return await self._limiter.call(self._endpoint.create, kwargs, endpoint=self._name)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._endpoint, name)
+
+
+class _LimitedNamespace:
+    def __init__(self, wrapped: Any, **overrides: Any):
+        self._wrapped = wrapped
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._wrapped, name)
+
+
+def estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    """Оценка токенов запроса: текст промпта плюс лимит ответа"""
+    chars = 0
+    for message in kwargs.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            chars += len(content)
+    for key in ("input", "instructions"):
+        if isinstance(kwargs.get(key), str):
+            chars += len(kwargs[key])
+    completion = (
+        kwargs.get("max_tokens")
+        or kwargs.get("max_completion_tokens")
+        or kwargs.get("max_output_tokens")
+        or DEFAULT_COMPLETION_TOKENS
+    )
+    return chars // CHARS_PER_TOKEN + int(completion)
+
+
+def retry_after_seconds(err: RateLimitError) -> Optional[float]:
+    """Читает Retry-After (секунды или HTTP-дата) и retry-after-ms из ответа 429"""
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
+    retry_ms = headers.get("retry-after-ms")
+    if retry_ms:
+        try:
+            return float(retry_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def _usage_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    return total if isinstance(total, int) else None
@@ -0,0 +1,129 @@
+"""
+События прогресса пайплайна фактчекинга для пошагового отображения
+"""
+
+import asyncio
+import contextvars
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EventSink = Callable[["PipelineEvent"], None]
+
+_event_sink: contextvars.ContextVar[Optional[EventSink]] = contextvars.ContextVar("pipeline_event_sink", default=None)
+
+
+@dataclass
+class PipelineEvent:
+    """Базовый класс событий пайплайна"""
+
+
+@dataclass
+class Stage1Completed(PipelineEvent):
+    classification: str
+    requires_fact_check: bool
+    elapsed: float
+
+
+@dataclass
+class SourcesChosen(PipelineEvent):
+    domains: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Stage2AttemptStarted(PipelineEvent):
+    attempt: int
+    total: int
+    domains: List[str] = field(default_factory=list)
+    hedge: bool = False
+    speculative: bool = False
+
+
+@dataclass
+class SinglePassStarted(PipelineEvent):
+    """Классификация и проверка одним запросом вместо этапов 1 и 2"""
+    domains: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ClaimsExtracted(PipelineEvent):
+    """Сообщение разбито на отдельные утверждения"""
+    claims: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ClaimVerified(PipelineEvent):
+    index: int
+    total: int
+    verification_status: str
+    confidence_score: int = 0
+    cached: bool = False
+
+
+@dataclass
+class Stage2AttemptFailed(PipelineEvent):
+    attempt: int
+    timed_out: bool
+    error: str = ""
+
+
+@dataclass
+class PartialVerdict(PipelineEvent):
+    """Вердикт этапа 2 до перевода полей (Stage 2.5)"""
+    verification_status: str
+    confidence_score: int
+    category: str
+
+
+@dataclass
+class FinalVerdict(PipelineEvent):
+    category: str
+    comment: str
+    debug: Any = None
+
+
+def emit(event: PipelineEvent) -> None:
+    """Передает событие подписчику текущего контекста, если он есть"""
+    sink = _event_sink.get()
+    if sink is None:
+        return
+    try:
+        sink(event)
+    except Exception as e:
+        logger.debug("Подписчик событий упал на %s: %s", type(event).__name__, e)
+
+
+async def run_with_sink(factory: Callable[[], Awaitable[Any]], sink: EventSink) -> Any:
+    """
+    Выполняет корутину с подписчиком событий. Вызывать внутри отдельной задачи:
+    у задачи своя копия контекста, и подписчик не утекает наружу.
+    """
+    _event_sink.set(sink)
+    return await factory()
+
+
+async def stream_events(
+    factory: Callable[[], Awaitable[Any]],
+    finish: Callable[[Any], PipelineEvent]
+) -> AsyncIterator[PipelineEvent]:
+    """
+    Запускает корутину в отдельной задаче и отдает ее события по мере появления.
+    Последним событием идет finish(результат). Ошибка корутины пробрасывается.
+    При выходе из генератора незавершенная задача отменяется.
+    """
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    done_marker = object()
+    task = asyncio.ensure_future(run_with_sink(factory, queue.put_nowait))
+    task.add_done_callback(lambda _: queue.put_nowait(done_marker))
+    try:
+        while True:
+            item = await queue.get()
+            if item is done_marker:
+                break
+            yield item
+        yield finish(task.result())
+    finally:
+        if not task.done():
+            task.cancel()
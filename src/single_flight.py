@@ -0,0 +1,45 @@
+"""
+Объединение одинаковых одновременных проверок в один прогон пайплайна
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Первый запрос с ключом запускает задачу, остальные ждут ее результат.
+    Отмена одного из ожидающих не отменяет общую задачу.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, "asyncio.Task[Any]"] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Возвращает (результат, был_ли_результат_общим)"""
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.info("🤝 Присоединяемся к уже идущей проверке (объединено запросов: %s)", self.coalesced)
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(factory())
+        self._calls[key] = task
+        self.started += 1
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), False
+
+    def in_flight(self) -> int:
+        """Количество уникальных проверок в работе"""
+        return len(self._calls)
+
+    def _forget(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Общая проверка %s завершилась ошибкой: %s", key[:12], task.exception())
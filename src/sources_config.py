@@ -2,228 +2,407 @@
 Конфигурация источников для фактчекинга
 """
 
-from typing import Dict, List, Optional
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+import asyncio
+import copy
 import json
+import logging
 import os
+import tempfile
+
+from config import Config
+from keyword_automaton import KeywordAutomaton
+
+logger = logging.getLogger(__name__)
+
+# Сколько комбинаций совпавших меток держать в кэше готовых списков доменов
+DOMAIN_CACHE_SIZE = 4096
+
+DEFAULT_SOURCES = {
+    "general_news": {
+        "description": "Общие новостные источники",
+        "domains": [
+            "reuters.com",
+            "bbc.com", 
+            "cnn.com",
+            "tass.ru",
+            "ria.ru",
+            "kommersant.ru",
+            "vedomosti.ru",
+            "gazeta.ru",
+            "rbc.ru",
+            "interfax.ru"
+        ],
+        "always_include": True
+    },
+    "technology": {
+        "description": "Технологические компании и их официальные источники",
+        "domains": [
+            "techcrunch.com",
+            "theverge.com",
+            "arstechnica.com",
+            "wired.com",
+            "venturebeat.com",
+            # Официальные сайты компаний
+            "blog.discord.com",
+            "discord.com",
+            "blog.google.com",
+            "microsoft.com",
+            "apple.com",
+            "meta.com",
+            "openai.com",
+            "github.blog",
+            "stackoverflow.blog",
+            "reddit.com",
+            "twitter.com",
+            "x.com"
+        ],
+        "keywords": [
+            "discord", "google", "microsoft", "apple", "meta", "openai",
+            "github", "reddit", "twitter", "telegram", "youtube", "netflix",
+            "amazon", "tesla", "facebook", "instagram", "whatsapp"
+        ]
+    },
+    "finance": {
+        "description": "Финансовые источники",
+        "domains": [
+            "bloomberg.com",
+            "reuters.com",
+            "wsj.com",
+            "ft.com",
+            "marketwatch.com",
+            "investing.com",
+            "yahoo.com",
+            "cbr.ru",
+            "moex.com"
+        ],
+        "keywords": [
+            "курс", "доллар", "рубль", "биткоин", "акции", "биржа", "банк",
+            "инфляция", "экономика", "финансы", "инвестиции"
+        ]
+    },
+    "science": {
+        "description": "Научные источники",
+        "domains": [
+            "nature.com",
+            "science.org",
+            "pubmed.ncbi.nlm.nih.gov",
+            "arxiv.org",
+            "who.int",
+            "cdc.gov",
+            "fda.gov",
+            "nih.gov"
+        ],
+        "keywords": [
+            "исследование", "наука", "ученые", "медицина", "вакцина", "лечение",
+            "covid", "вирус", "болезнь", "препарат"
+        ]
+    },
+    "entertainment": {
+        "description": "Развлечения и медиа",
+        "domains": [
+            "variety.com",
+            "hollywoodreporter.com",
+            "deadline.com",
+            "entertainment.com",
+            "imdb.com",
+            "rottentomatoes.com"
+        ],
+        "keywords": [
+            "фильм", "сериал", "актер", "режиссер", "кино", "голливуд",
+            "премия", "оскар", "спектакль", "концерт"
+        ],
+        "match_categories": ["развлечения"]
+    },
+    "social_media_verification": {
+        "description": "Источники для проверки социальных сетей и вирусного контента",
+        "domains": [
+            "snopes.com",
+            "factcheck.org",
+            "politifact.com",
+            "checkyourfact.com",
+            "mediabiasfactcheck.com",
+            "knowyourmeme.com",
+            "buzzfeed.com",
+            "mashable.com",
+            "digitaltrends.com",
+            "socialmediatoday.com",
+            "techcrunch.com",
+            "theverge.com",
+            "engadget.com",
+            "gizmodo.com"
+        ],
+        "keywords": [
+            "twitter", "твиттер", "tweet", "твит", "@", "x.com",
+            "viral", "вирусный", "trending", "трендинг", "репост", "retweet",
+            "социальные сети", "соцсети", "пост", "влияние", "заявление", "признался"
+        ]
+    },
+    "company_specifics": {
+        "description": "Автоматически определяемые официальные сайты",
+        "auto_detect": True,
+        "patterns": {
+            "discord": ["blog.discord.com", "discord.com", "support.discord.com"],
+            "google": ["blog.google.com", "support.google.com", "developers.google.com"],
+            "microsoft": ["microsoft.com", "techcommunity.microsoft.com", "devblogs.microsoft.com"],
+            "apple": ["apple.com", "developer.apple.com", "support.apple.com"],
+            "meta": ["meta.com", "about.fb.com", "blog.whatsapp.com"],
+            "openai": ["openai.com", "help.openai.com"],
+            "github": ["github.blog", "github.com", "docs.github.com"],
+            "reddit": ["reddit.com", "redditinc.com"],
+            "twitter": ["blog.twitter.com", "help.twitter.com", "x.com"],
+            "telegram": ["telegram.org", "core.telegram.org"],
+            "youtube": ["youtube.com", "creators.youtube.com"],
+            "netflix": ["about.netflix.com", "media.netflix.com"],
+            "amazon": ["press.aboutamazon.com", "aws.amazon.com"],
+            "tesla": ["tesla.com", "ir.tesla.com"]
+        }
+    }
+}
+
+
+def merge_defaults(loaded: Dict, defaults: Dict = DEFAULT_SOURCES) -> Dict:
+    """Дополняет старый sources.json недостающими категориями и ключевыми словами"""
+    for category, info in defaults.items():
+        if category not in loaded:
+            loaded[category] = copy.deepcopy(info)
+            continue
+        for key in ("keywords", "always_include", "match_categories"):
+            if key in info and key not in loaded[category]:
+                loaded[category][key] = copy.deepcopy(info[key])
+    return loaded
+
+
+class SourceIndex:
+    """
+    Снимок конфигурации: все ключевые слова категорий и компаний собраны в один автомат,
+    наборы доменов заморожены. После сборки снимок не меняется — при перезагрузке
+    собирается новый и подменяется целиком.
+    """
+
+    def __init__(self, sources: Dict):
+        self.sources = sources
+        keywords: List[Tuple[str, Hashable]] = []
+        label_domains: Dict[Hashable, Tuple[str, ...]] = {}
+        stage_category_labels: Dict[str, FrozenSet[Hashable]] = {}
+        always: List[Hashable] = []
+
+        for category, info in sources.items():
+            if info.get("auto_detect"):
+                continue
+            label = ("category", category)
+            label_domains[label] = tuple(info.get("domains", []))
+            if info.get("always_include"):
+                always.append(label)
+            keywords.extend((word, label) for word in info.get("keywords", []))
+            for stage_category in info.get("match_categories", []):
+                stage_category_labels[stage_category] = \
+                    stage_category_labels.get(stage_category, frozenset()) | {label}
+
+        for category, info in sources.items():
+            if not info.get("auto_detect"):
+                continue
+            for company, domains in info.get("patterns", {}).items():
+                label = ("company", company)
+                label_domains[label] = tuple(domains)
+                keywords.append((company, label))
+
+        self.label_domains = label_domains
+        self.stage_category_labels = stage_category_labels
+        self.always_labels = frozenset(always)
+        self.automaton = KeywordAutomaton(keywords)
+        # Кэш результатов: запись идемпотентна, снимок от этого не меняется по смыслу
+        self._domain_cache: Dict[FrozenSet[Hashable], Tuple[str, ...]] = {}
+
+    def sources_for_topic(self, text: str, category: Optional[str] = None) -> Tuple[str, ...]:
+        labels = self.automaton.find_labels(text) | self.always_labels
+        if category:
+            labels |= self.stage_category_labels.get(category, frozenset())
+        return self._domains_for(labels)
+
+    def _domains_for(self, labels: FrozenSet[Hashable]) -> Tuple[str, ...]:
+        """Домены для набора меток: сначала сайты компаний, затем тематические, затем общие"""
+        cached = self._domain_cache.get(labels)
+        if cached is not None:
+            return cached
+
+        def rank(label: Hashable) -> Tuple[int, str]:
+            kind, name = label
+            if kind == "company":
+                return 0, name
+            return (2 if label in self.always_labels else 1), name
+
+        ordered: Dict[str, None] = {}
+        for label in sorted(labels, key=rank):
+            for domain in self.label_domains.get(label, ()):
+                ordered.setdefault(domain)
+        domains = tuple(ordered)
+        if len(self._domain_cache) >= DOMAIN_CACHE_SIZE:
+            self._domain_cache.clear()
+        self._domain_cache[labels] = domains
+        return domains
+
 
 class SourcesConfig:
-    """Умная система управления источниками для фактчекинга"""
+    """
+    Умная система управления источниками для фактчекинга.
+    Файл перечитывается при изменении (по mtime), новый индекс собирается в потоке
+    и подменяется одной операцией; записи идут через временный файл и rename в потоке.
+    """
     
-    def __init__(self):
-        self.config_file = "sources.json"
-        self.sources = self._load_sources()
+    def __init__(self, config_file: str = "sources.json"):
+        self.config_file = config_file
+        self._index = SourceIndex(self._load_sources())
+        self._signature = self._file_signature()
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._watch_task: Optional["asyncio.Task[None]"] = None
+    
+    @property
+    def sources(self) -> Dict:
+        """Текущий снимок конфигурации (не изменять — используйте add/remove)"""
+        return self._index.sources
     
     def _load_sources(self) -> Dict:
         """Загружает конфигурацию источников"""
-        default_sources = {
-            "general_news": {
-                "description": "Общие новостные источники",
-                "domains": [
-                    "reuters.com",
-                    "bbc.com", 
-                    "cnn.com",
-                    "tass.ru",
-                    "ria.ru",
-                    "kommersant.ru",
-                    "vedomosti.ru",
-                    "gazeta.ru",
-                    "rbc.ru",
-                    "interfax.ru"
-                ]
-            },
-            "technology": {
-                "description": "Технологические компании и их официальные источники",
-                "domains": [
-                    "techcrunch.com",
-                    "theverge.com",
-                    "arstechnica.com",
-                    "wired.com",
-                    "venturebeat.com",
-                    # Официальные сайты компаний
-                    "blog.discord.com",
-                    "discord.com",
-                    "blog.google.com",
-                    "microsoft.com",
-                    "apple.com",
-                    "meta.com",
-                    "openai.com",
-                    "github.blog",
-                    "stackoverflow.blog",
-                    "reddit.com",
-                    "twitter.com",
-                    "x.com"
-                ]
-            },
-            "finance": {
-                "description": "Финансовые источники",
-                "domains": [
-                    "bloomberg.com",
-                    "reuters.com",
-                    "wsj.com",
-                    "ft.com",
-                    "marketwatch.com",
-                    "investing.com",
-                    "yahoo.com",
-                    "cbr.ru",
-                    "moex.com"
-                ]
-            },
-            "science": {
-                "description": "Научные источники",
-                "domains": [
-                    "nature.com",
-                    "science.org",
-                    "pubmed.ncbi.nlm.nih.gov",
-                    "arxiv.org",
-                    "who.int",
-                    "cdc.gov",
-                    "fda.gov",
-                    "nih.gov"
-                ]
-            },
-            "entertainment": {
-                "description": "Развлечения и медиа",
-                "domains": [
-                    "variety.com",
-                    "hollywoodreporter.com",
-                    "deadline.com",
-                    "entertainment.com",
-                    "imdb.com",
-                    "rottentomatoes.com"
-                ]
-            },
-            "social_media_verification": {
-                "description": "Источники для проверки социальных сетей и вирусного контента",
-                "domains": [
-                    "snopes.com",
-                    "factcheck.org",
-                    "politifact.com",
-                    "checkyourfact.com",
-                    "mediabiasfactcheck.com",
-                    "knowyourmeme.com",
-                    "buzzfeed.com",
-                    "mashable.com",
-                    "digitaltrends.com",
-                    "socialmediatoday.com",
-                    "techcrunch.com",
-                    "theverge.com",
-                    "engadget.com",
-                    "gizmodo.com"
-                ]
-            },
-            "company_specifics": {
-                "description": "Автоматически определяемые официальные сайты",
-                "auto_detect": True,
-                "patterns": {
-                    "discord": ["blog.discord.com", "discord.com", "support.discord.com"],
-                    "google": ["blog.google.com", "support.google.com", "developers.google.com"],
-                    "microsoft": ["microsoft.com", "techcommunity.microsoft.com", "devblogs.microsoft.com"],
-                    "apple": ["apple.com", "developer.apple.com", "support.apple.com"],
-                    "meta": ["meta.com", "about.fb.com", "blog.whatsapp.com"],
-                    "openai": ["openai.com", "help.openai.com"],
-                    "github": ["github.blog", "github.com", "docs.github.com"],
-                    "reddit": ["reddit.com", "redditinc.com"],
-                    "twitter": ["blog.twitter.com", "help.twitter.com", "x.com"],
-                    "telegram": ["telegram.org", "core.telegram.org"],
-                    "youtube": ["youtube.com", "creators.youtube.com"],
-                    "netflix": ["about.netflix.com", "media.netflix.com"],
-                    "amazon": ["press.aboutamazon.com", "aws.amazon.com"],
-                    "tesla": ["tesla.com", "ir.tesla.com"]
-                }
-            }
-        }
-        
         if os.path.exists(self.config_file):
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception:
-                pass
+                return self._read_file()
+            except Exception as e:
+                logger.error(f"Ошибка чтения {self.config_file}: {e}")
         
-        self._save_sources(default_sources)
-        return default_sources
+        sources = copy.deepcopy(DEFAULT_SOURCES)
+        try:
+            self._write_atomic(sources)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения источников: {e}")
+        return sources
+    
+    def _read_file(self) -> Dict:
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            return merge_defaults(json.load(f))
     
-    def _save_sources(self, sources: Dict):
-        """Сохраняет конфигурацию источников"""
+    def _write_atomic(self, sources: Dict) -> None:
+        """Пишет во временный файл рядом и переименовывает — читатели не видят полузаписанный файл"""
+        directory = os.path.dirname(os.path.abspath(self.config_file))
+        fd, tmp_path = tempfile.mkstemp(prefix=".sources-", suffix=".json", dir=directory)
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
                 json.dump(sources, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp создает файл с правами 0600 — сохраняем права исходного файла
+            mode = os.stat(self.config_file).st_mode & 0o777 if os.path.exists(self.config_file) else 0o644
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, self.config_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    async def reload_if_changed(self) -> bool:
+        """Перечитывает файл, если он изменился; индекс собирается вне цикла событий"""
+        signature = await asyncio.to_thread(self._file_signature)
+        if signature is None or signature == self._signature:
+            return False
+        
+        def build() -> SourceIndex:
+            return SourceIndex(self._read_file())
+        
+        try:
+            index = await asyncio.to_thread(build)
         except Exception as e:
-            print(f"Ошибка сохранения источников: {e}")
+            # Битый файл не ломает работу: остаемся на прежнем снимке до следующего изменения
+            self._signature = signature
+            logger.error(f"❌ {self.config_file} не перезагружен, оставлена прежняя версия: {e}")
+            return False
+        
+        self._index = index
+        self._signature = signature
+        logger.info(
+            f"🔄 {self.config_file} перезагружен: {len(index.sources)} категорий, "
+            f"{index.automaton.keyword_count} ключевых слов"
+        )
+        return True
     
-    def get_sources_for_topic(self, text: str, category: str = None) -> List[str]:
+    async def watch(self, interval: Optional[float] = None) -> None:
+        """Следит за изменениями файла, пока задачу не отменят"""
+        interval = interval if interval is not None else Config.SOURCES_RELOAD_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload_if_changed()
+            except Exception as e:
+                logger.error(f"Ошибка проверки {self.config_file}: {e}")
+    
+    def start_watching(self, interval: Optional[float] = None) -> Optional["asyncio.Task[None]"]:
+        """Запускает слежение в фоне (не больше одной задачи); 0 — слежение выключено"""
+        interval = interval if interval is not None else Config.SOURCES_RELOAD_INTERVAL
+        if interval <= 0:
+            return None
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.ensure_future(self.watch(interval))
+        return self._watch_task
+    
+    def stop_watching(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+    
+    async def _update(self, change) -> bool:
         """
-        Умный выбор источников на основе содержания сообщения
+        Применяет change к копии конфигурации; если изменение было,
+        пишет файл и собирает индекс в потоке, затем подменяет снимок
         """
-        text_lower = text.lower()
-        selected_domains = set()
-        
-        # Всегда добавляем общие новостные источники
-        selected_domains.update(self.sources["general_news"]["domains"])
-        
-        # Определяем тематику по ключевым словам
-        if any(word in text_lower for word in [
-            "discord", "google", "microsoft", "apple", "meta", "openai", 
-            "github", "reddit", "twitter", "telegram", "youtube", "netflix",
-            "amazon", "tesla", "facebook", "instagram", "whatsapp"
-        ]):
-            # Ищем упоминания конкретных компаний
-            for company, domains in self.sources["company_specifics"]["patterns"].items():
-                if company in text_lower:
-                    selected_domains.update(domains)
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            sources = copy.deepcopy(self._index.sources)
+            if not change(sources):
+                return False
             
-            # Добавляем технологические источники
-            selected_domains.update(self.sources["technology"]["domains"])
-        
-        if any(word in text_lower for word in [
-            "курс", "доллар", "рубль", "биткоин", "акции", "биржа", "банк",
-            "инфляция", "экономика", "финансы", "инвестиции"
-        ]):
-            selected_domains.update(self.sources["finance"]["domains"])
-        
-        if any(word in text_lower for word in [
-            "исследование", "наука", "ученые", "медицина", "вакцина", "лечение",
-            "covid", "вирус", "болезнь", "препарат"
-        ]):
-            selected_domains.update(self.sources["science"]["domains"])
-        
-        if any(word in text_lower for word in [
-            "фильм", "сериал", "актер", "режиссер", "кино", "голливуд",
-            "премия", "оскар", "спектакль", "концерт"
-        ]) or category == "развлечения":
-            selected_domains.update(self.sources["entertainment"]["domains"])
-        
-        # Добавляем источники для проверки социальных сетей при упоминании Twitter/X, вирусного контента
-        if any(word in text_lower for word in [
-            "twitter", "твиттер", "tweet", "твит", "@", "x.com",
-            "viral", "вирусный", "trending", "трендинг", "репост", "retweet",
-            "социальные сети", "соцсети", "пост", "влияние", "заявление", "признался"
-        ]):
-            selected_domains.update(self.sources["social_media_verification"]["domains"])
-        
-        return list(selected_domains)
+            def persist() -> Tuple[SourceIndex, Optional[Tuple[int, int]]]:
+                self._write_atomic(sources)
+                return SourceIndex(sources), self._file_signature()
+            
+            self._index, self._signature = await asyncio.to_thread(persist)
+            return True
     
-    def add_custom_source(self, category: str, domain: str, description: str = ""):
+    def get_sources_for_topic(self, text: str, category: str = None) -> List[str]:
+        """
+        Умный выбор источников на основе содержания сообщения.
+        Все ключевые слова проверяются за один проход автомата по тексту.
+        """
+        return list(self._index.sources_for_topic(text, category))
+    
+    async def add_custom_source(self, category: str, domain: str, description: str = "") -> bool:
         """Добавляет пользовательский источник"""
-        if category not in self.sources:
-            self.sources[category] = {
-                "description": description or f"Пользовательская категория: {category}",
-                "domains": []
-            }
-        
-        if domain not in self.sources[category]["domains"]:
-            self.sources[category]["domains"].append(domain)
-            self._save_sources(self.sources)
+        def change(sources: Dict) -> bool:
+            if category not in sources:
+                sources[category] = {
+                    "description": description or f"Пользовательская категория: {category}",
+                    "domains": []
+                }
+            if domain in sources[category]["domains"]:
+                return False
+            sources[category]["domains"].append(domain)
             return True
-        return False
+        return await self._update(change)
     
-    def remove_source(self, category: str, domain: str):
+    async def remove_source(self, category: str, domain: str) -> bool:
         """Удаляет источник"""
-        if category in self.sources and domain in self.sources[category]["domains"]:
-            self.sources[category]["domains"].remove(domain)
-            self._save_sources(self.sources)
-            return True
-        return False
+        def change(sources: Dict) -> bool:
+            if category in sources and domain in sources[category].get("domains", []):
+                sources[category]["domains"].remove(domain)
+                return True
+            return False
+        return await self._update(change)
     
     def get_all_categories(self) -> Dict[str, str]:
         """Возвращает все категории с описаниями"""
@@ -235,7 +414,7 @@ class SourcesConfig:
     
     def get_category_domains(self, category: str) -> List[str]:
         """Возвращает домены для конкретной категории"""
-        return self.sources.get(category, {}).get("domains", [])
+        return list(self.sources.get(category, {}).get("domains", []))
 
 # Глобальный экземпляр
 sources_config = SourcesConfig()
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""
+Локальный спам-фильтр перед этапом 1: логистическая регрессия по хэшированным
+символьным n-граммам, обучаемая на журнале классификаций этапа 1
+"""
+
+import json
+import logging
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from verdict_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+MODEL_VERSION = 1
+# Число корзин хэширования признаков
+DEFAULT_BUCKETS = 1 << 20
+DEFAULT_NGRAM_RANGE = (3, 5)
+# Признаки берутся только из начала сообщения — время ответа не зависит от длины текста
+MAX_CHARS = 1000
+
+_DIGITS_RE = re.compile(r"\d")
+
+Sample = Tuple[str, bool]
+
+
+def extract_features(text: str, buckets: int = DEFAULT_BUCKETS, ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE) -> List[int]:
+    """Номера корзин символьных n-грамм нормализованного текста (без повторов)"""
+    normalized = " " + _DIGITS_RE.sub("0", normalize_text(text)[:MAX_CHARS]) + " "
+    low, high = ngram_range
+    found = set()
+    for size in range(low, high + 1):
+        for start in range(len(normalized) - size + 1):
+            found.add(zlib.crc32(normalized[start:start + size].encode("utf-8")) % buckets)
+    return list(found)
+
+
+class SpamFilter:
+    """
+    Бинарный классификатор «спам / не спам». Вектор признаков — наличие n-грамм,
+    нормированный на корень из их числа, поэтому длина текста не смещает оценку.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Dict[int, float]] = None,
+        bias: float = 0.0,
+        buckets: int = DEFAULT_BUCKETS,
+        ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE
+    ):
+        self.weights: Dict[int, float] = weights or {}
+        self.bias = bias
+        self.buckets = buckets
+        self.ngram_range = tuple(ngram_range)
+
+    def features(self, text: str) -> List[int]:
+        return extract_features(text, self.buckets, self.ngram_range)
+
+    def predict_proba(self, text: str) -> float:
+        """Вероятность того, что сообщение — спам"""
+        features = self.features(text)
+        if not features:
+            return 0.0
+        get = self.weights.get
+        score = self.bias + sum(get(index, 0.0) for index in features) / math.sqrt(len(features))
+        return _sigmoid(score)
+
+    @classmethod
+    def train(
+        cls,
+        samples: Sequence[Sample],
+        epochs: int = 8,
+        learning_rate: float = 1.0,
+        l2: float = 1e-5,
+        buckets: int = DEFAULT_BUCKETS,
+        ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE,
+        seed: int = 0
+    ) -> "SpamFilter":
+        """Обучает модель стохастическим градиентным спуском по логистической функции потерь"""
+        model = cls(buckets=buckets, ngram_range=ngram_range)
+        vectors = []
+        for text, is_spam in samples:
+            features = model.features(text)
+            if features:
+                vectors.append((features, 1.0 if is_spam else 0.0, 1 / math.sqrt(len(features))))
+        if not vectors:
+            raise ValueError("Нет примеров для обучения")
+
+        weights = model.weights
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(vectors)
+            rate = learning_rate / (1 + epoch)
+            for features, target, scale in vectors:
+                score = model.bias + scale * sum(weights.get(index, 0.0) for index in features)
+                gradient = _sigmoid(score) - target
+                model.bias -= rate * gradient
+                step = rate * gradient * scale
+                decay = 1 - rate * l2
+                for index in features:
+                    weights[index] = weights.get(index, 0.0) * decay - step
+        # Почти нулевые веса не влияют на оценку, но раздувают файл модели
+        model.weights = {index: weight for index, weight in weights.items() if abs(weight) >= 1e-4}
+        return model
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": MODEL_VERSION,
+            "buckets": self.buckets,
+            "ngram_range": list(self.ngram_range),
+            "bias": round(self.bias, 6),
+            "weights": {str(index): round(weight, 5) for index, weight in self.weights.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SpamFilter":
+        if data.get("version") != MODEL_VERSION:
+            raise ValueError(f"Неподдерживаемая версия модели: {data.get('version')}")
+        return cls(
+            weights={int(index): float(weight) for index, weight in data.get("weights", {}).items()},
+            bias=float(data.get("bias", 0.0)),
+            buckets=int(data.get("buckets", DEFAULT_BUCKETS)),
+            ngram_range=tuple(data.get("ngram_range", DEFAULT_NGRAM_RANGE))
+        )
+
+    def save(self, path: str) -> None:
+        """Сохраняет модель атомарно: читатели видят либо старый файл, либо новый"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".spam_model.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SpamFilter"]:
+        """Загружает модель; без файла или при ошибке возвращает None (фильтр выключен)"""
+        if not os.path.exists(path):
+            logger.info("ℹ️ Модель спам-фильтра %s не найдена, локальный фильтр выключен", path)
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                model = cls.from_dict(json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            logger.error("❌ Не удалось загрузить модель спам-фильтра %s: %s", path, e)
+            return None
+        logger.info("✅ Спам-фильтр загружен: %s весов", len(model.weights))
+        return model
+
+
+def evaluate(model: SpamFilter, samples: Sequence[Sample], thresholds: Iterable[float] = (0.5, 0.9, 0.95, 0.97, 0.99)) -> Dict[str, Any]:
+    """
+    Качество на отложенной выборке для каждого порога: точность и полнота по спаму,
+    доля всех сообщений, которые фильтр закрыл бы без OpenAI, и время оценки
+    """
+    started = time.perf_counter()
+    scored = [(model.predict_proba(text), is_spam) for text, is_spam in samples]
+    elapsed = time.perf_counter() - started
+    spam_total = sum(1 for _, is_spam in scored if is_spam)
+
+    report: Dict[str, Any] = {
+        "samples": len(scored),
+        "spam": spam_total,
+        "avg_latency_ms": round(elapsed / len(scored) * 1000, 4) if scored else 0.0,
+        "thresholds": {},
+    }
+    for threshold in thresholds:
+        flagged = [is_spam for score, is_spam in scored if score >= threshold]
+        true_positive = sum(1 for is_spam in flagged if is_spam)
+        report["thresholds"][threshold] = {
+            "precision": round(true_positive / len(flagged), 4) if flagged else 1.0,
+            "recall": round(true_positive / spam_total, 4) if spam_total else 0.0,
+            "false_positives": len(flagged) - true_positive,
+            "skipped_share": round(len(flagged) / len(scored), 4) if scored else 0.0,
+        }
+    return report
+
+
+class ClassificationLog:
+    """Журнал классификаций этапа 1 (JSONL) — обучающие данные для спам-фильтра"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, text: str, classification: str, requires_fact_check: bool) -> None:
+        record = {
+            "ts": round(time.time(), 3),
+            "text": text,
+            "classification": classification,
+            "requires_fact_check": requires_fact_check,
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def read_classification_log(path: str) -> List[Sample]:
+    """
+    Примеры (текст, спам ли) из журнала. Повторы одного текста схлопываются,
+    действует последняя классификация; битые строки пропускаются.
+    """
+    labels: Dict[str, Sample] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                text = record["text"]
+                classification = str(record.get("classification") or "").lower()
+            except (ValueError, KeyError, TypeError):
+                continue
+            if text:
+                labels[normalize_text(text)] = (text, classification == "spam")
+    return list(labels.values())
+
+
+def _sigmoid(score: float) -> float:
+    if score >= 0:
+        return 1 / (1 + math.exp(-score))
+    exp = math.exp(score)
+    return exp / (1 + exp)
@@ -0,0 +1,167 @@
+"""
+Исходящая очередь Telegram: темп отправки по чатам и глобально, FloodWait, схлопывание правок
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from pyrogram.errors import FloodWait, MessageNotModified
+
+from config import Config
+from tracing import current_span, span
+
+logger = logging.getLogger(__name__)
+
+
+class _ChatState:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.next_at = 0.0
+
+
+class _PendingEdit:
+    def __init__(self, text: str, kwargs: Dict[str, Any]):
+        self.text = text
+        self.kwargs = kwargs
+        self.future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        # Ошибку забирает хотя бы один из ожидающих; гасим предупреждение о незабранной
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+class TelegramOutbox:
+    """
+    Все исходящие вызовы Telegram идут через одну очередь:
+    - вызовы в один чат выполняются по порядку и не чаще chat_interval;
+    - все вызовы вместе — не чаще global_rate в секунду;
+    - FloodWait усыпляет очередь на указанное Telegram время и повторяет вызов;
+    - правка сообщения, которая еще ждет отправки, заменяется более новой.
+    """
+
+    def __init__(
+        self,
+        global_rate: Optional[float] = None,
+        chat_interval: Optional[float] = None,
+        flood_wait_max: Optional[float] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.global_rate = global_rate if global_rate is not None else Config.TELEGRAM_GLOBAL_RATE
+        self.chat_interval = chat_interval if chat_interval is not None else Config.TELEGRAM_CHAT_INTERVAL
+        self.flood_wait_max = flood_wait_max if flood_wait_max is not None else Config.TELEGRAM_FLOOD_WAIT_MAX
+        self.max_retries = max_retries if max_retries is not None else Config.TELEGRAM_MAX_RETRIES
+
+        self._chats: Dict[Any, _ChatState] = {}
+        self._pending_edits: Dict[Tuple[Any, int], _PendingEdit] = {}
+        self._global_next = 0.0
+        self.sent = 0
+        self.coalesced = 0
+        self.flood_waits = 0
+
+    async def send_message(self, bot, chat_id: Any, text: str, **kwargs) -> Any:
+        with span("telegram.send_message", chat_id=chat_id):
+            return await self._submit(chat_id, lambda: bot.send_message(chat_id=chat_id, text=text, **kwargs))
+
+    async def delete_messages(self, bot, chat_id: Any, message_ids: Any, **kwargs) -> Any:
+        with span("telegram.delete_messages", chat_id=chat_id):
+            return await self._submit(chat_id, lambda: bot.delete_messages(chat_id=chat_id, message_ids=message_ids, **kwargs))
+
+    async def edit_message_text(self, bot, chat_id: Any, message_id: int, text: str, **kwargs) -> Any:
+        """Правка, еще не отправленная к моменту следующей правки того же сообщения, схлопывается с ней"""
+        with span("telegram.edit_message_text", chat_id=chat_id, message_id=message_id) as edit_span:
+            key = (chat_id, message_id)
+            pending = self._pending_edits.get(key)
+            if pending is not None:
+                pending.text = text
+                pending.kwargs = kwargs
+                self.coalesced += 1
+                edit_span.set_attribute("coalesced", True)
+                return await asyncio.shield(pending.future)
+            return await self._edit(bot, chat_id, message_id, key, text, kwargs)
+
+    async def _edit(self, bot, chat_id: Any, message_id: int, key: Tuple[Any, int], text: str, kwargs: Dict[str, Any]) -> Any:
+        pending = _PendingEdit(text, kwargs)
+        self._pending_edits[key] = pending
+
+        async def edit() -> Any:
+            # С этого момента новые правки встают в очередь отдельно
+            if self._pending_edits.get(key) is pending:
+                del self._pending_edits[key]
+            try:
+                return await bot.edit_message_text(
+                    chat_id=chat_id, message_id=message_id, text=pending.text, **pending.kwargs
+                )
+            except MessageNotModified:
+                return None
+
+        try:
+            result = await self._submit(chat_id, edit)
+        except BaseException as e:
+            if self._pending_edits.get(key) is pending:
+                del self._pending_edits[key]
+            if not pending.future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    pending.future.cancel()
+                else:
+                    pending.future.set_exception(e)
+            raise
+        pending.future.set_result(result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "flood_waits": self.flood_waits,
+            "chats": len(self._chats),
+        }
+
+    async def _submit(self, chat_id: Any, call: Callable[[], Awaitable[Any]]) -> Any:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            self._prune()
+            chat = self._chats[chat_id] = _ChatState()
+
+        async with chat.lock:
+            for attempt in range(self.max_retries + 1):
+                await self._wait_slot(chat)
+                try:
+                    result = await call()
+                except FloodWait as e:
+                    wait = float(e.value or 1)
+                    self.flood_waits += 1
+                    current_span().set_attribute("flood_wait_s", wait)
+                    if attempt >= self.max_retries or wait > self.flood_wait_max:
+                        raise
+                    logger.warning("🌊 FloodWait %.0fс от Telegram (чат %s), ждем и повторяем", wait, chat_id)
+                    # Ограничение действует на бота целиком — придерживаем всю очередь
+                    resume_at = time.monotonic() + wait
+                    self._global_next = max(self._global_next, resume_at)
+                    chat.next_at = max(chat.next_at, resume_at)
+                    continue
+                self.sent += 1
+                return result
+
+    async def _wait_slot(self, chat: _ChatState) -> None:
+        """Сначала ждем очереди чата, затем общий слот — чужие будущие слоты не задерживают другие чаты"""
+        now = time.monotonic()
+        slot = max(now, chat.next_at)
+        chat.next_at = slot + self.chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+        now = time.monotonic()
+        slot = max(now, self._global_next)
+        if self.global_rate > 0:
+            self._global_next = slot + 1 / self.global_rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def _prune(self) -> None:
+        """Убирает состояния простаивающих чатов, чтобы словарь не рос бесконечно"""
+        if len(self._chats) < 1000:
+            return
+        now = time.monotonic()
+        for chat_id, chat in list(self._chats.items()):
+            if not chat.lock.locked() and chat.next_at < now:
+                del self._chats[chat_id]
@@ -0,0 +1,375 @@
+"""
+Трассировка проверок: спаны этапов, вызовов OpenAI и Telegram с одним trace id на сообщение.
+Экспорт в JSON Lines (для офлайн-анализа, см. trace_report.py) или в OTLP/HTTP коллектор.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# (trace_id, span_id) — родительский контекст, который можно передать в другой процесс
+TraceContext = Tuple[str, str]
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    end: Optional[float] = None
+    status: str = "ok"
+    error: str = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Спан при выключенной трассировке: ничего не пишет"""
+    trace_id = span_id = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("tracing_current_span", default=None)
+
+
+class JsonlExporter:
+    """Один завершенный спан — одна строка JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: Sequence[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP с JSON-кодированием (коллектор OpenTelemetry, Jaeger, Tempo на порту 4318)"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans: Sequence[Span]) -> None:
+        body = json.dumps(self.encode(spans)).encode("utf-8")
+        request = urllib.request.Request(
+            self.endpoint, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def encode(self, spans: Sequence[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "fact-checking-bot"},
+                    "spans": [self._encode_span(span) for span in spans],
+                }],
+            }]
+        }
+
+    def _encode_span(self, span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(int(span.start * 1e9)),
+            "endTimeUnixNano": str(int((span.end or span.start) * 1e9)),
+            "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+            # STATUS_CODE_OK / STATUS_CODE_ERROR
+            "status": {"code": 1} if span.status == "ok" else {"code": 2, "message": span.error or span.status},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class BatchSpanProcessor:
+    """
+    Завершенные спаны копятся в очереди и выгружаются фоновым потоком пачками —
+    запись файла или HTTP-запрос не задерживают event loop. Сверх max_queue спаны отбрасываются.
+    """
+
+    def __init__(self, exporter, flush_interval: float = 2.0, max_batch: int = 512, max_queue: int = 10000):
+        self.exporter = exporter
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Выгружает оставшиеся спаны и останавливает поток"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning(f"⚠️ Не удалось выгрузить {len(batch)} спанов: {e}")
+
+
+_processor: Optional[BatchSpanProcessor] = None
+_configured = False
+_config_lock = threading.Lock()
+
+
+def configure(exporter=None, flush_interval: Optional[float] = None) -> None:
+    """
+    Включает трассировку с экспортером (None — выключает). Без вызова настраивается
+    по TRACING_EXPORTER при первом спане.
+    """
+    global _processor, _configured
+    with _config_lock:
+        if _processor:
+            _processor.shutdown()
+        _processor = BatchSpanProcessor(
+            exporter, flush_interval if flush_interval is not None else Config.TRACING_FLUSH_INTERVAL
+        ) if exporter else None
+        _configured = True
+
+
+def shutdown() -> None:
+    """Выгружает накопленные спаны (при остановке процесса)"""
+    global _processor
+    with _config_lock:
+        if _processor:
+            _processor.shutdown()
+            _processor = None
+
+
+def _get_processor() -> Optional[BatchSpanProcessor]:
+    if not _configured:
+        configure(_exporter_from_config())
+    return _processor
+
+
+def _exporter_from_config():
+    kind = Config.TRACING_EXPORTER
+    if kind == "jsonl":
+        return JsonlExporter(Config.TRACING_JSONL_PATH)
+    if kind == "otlp":
+        return OtlpHttpExporter(Config.TRACING_OTLP_ENDPOINT, Config.TRACING_SERVICE_NAME)
+    if kind not in ("", "none"):
+        logger.warning(f"⚠️ Неизвестный TRACING_EXPORTER={kind}, трассировка выключена")
+    return None
+
+
+def current_span() -> Any:
+    """Текущий спан (или пустой, если трассировка выключена) — для атрибутов из вложенного кода"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def current_trace_context() -> Optional[TraceContext]:
+    """Контекст текущего спана для передачи воркеру"""
+    span = _current_span.get()
+    return (span.trace_id, span.span_id) if span else None
+
+
+@contextmanager
+def span(name: str, parent: Optional[Sequence[str]] = None, **attributes: Any) -> Iterator[Any]:
+    """
+    Спан вокруг блока. Родитель — parent (контекст из другого процесса) или текущий спан;
+    без родителя начинается новая трасса. Исключение помечает спан ошибкой и пробрасывается.
+    """
+    processor = _get_processor()
+    if processor is None:
+        yield NOOP_SPAN
+        return
+
+    if parent:
+        trace_id, parent_id = parent
+    else:
+        current = _current_span.get()
+        trace_id, parent_id = (current.trace_id, current.span_id) if current else (secrets.token_hex(16), None)
+    current_span = Span(trace_id, secrets.token_hex(8), parent_id, name, time.time(), dict(attributes))
+    token = _current_span.set(current_span)
+    try:
+        yield current_span
+    except BaseException as e:
+        # CancelledError и GeneratorExit — не ошибки, а отмена (проигравшая попытка хеджирования и т.п.)
+        current_span.status = "error" if isinstance(e, Exception) else "cancelled"
+        current_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current_span.end = time.time()
+        _current_span.reset(token)
+        processor.on_end(current_span)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Декоратор асинхронной функции: вызов оборачивается в спан (по умолчанию — имя функции)"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__.lstrip("_")
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def read_spans(path: str) -> List[Dict[str, Any]]:
+    """Спаны из файла JSON Lines; битые строки пропускаются"""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and record.get("span_id"):
+                spans.append(record)
+    return spans
+
+
+def _self_times(spans: Sequence[Dict[str, Any]]) -> Dict[str, float]:
+    """Собственное время спана (мс): длительность минус объединение интервалов детей"""
+    children: Dict[str, List[Tuple[float, float]]] = {}
+    for record in spans:
+        if record.get("parent_id"):
+            start = record["start"] * 1000
+            children.setdefault(record["parent_id"], []).append((start, start + record["duration_ms"]))
+
+    result = {}
+    for record in spans:
+        covered = 0.0
+        cursor = float("-inf")
+        for start, end in sorted(children.get(record["span_id"], ())):
+            start = max(start, cursor)
+            if end > start:
+                covered += end - start
+                cursor = end
+        result[record["span_id"]] = max(0.0, record["duration_ms"] - covered)
+    return result
+
+
+def folded_stacks(spans: Sequence[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Свернутые стеки для флейм-графа (flamegraph.pl, speedscope): «корень;...;спан» →
+    собственное время в микросекундах. Параллельные дети (хедж, утверждения) учитываются один раз.
+    """
+    by_id = {record["span_id"]: record for record in spans}
+    self_times = _self_times(spans)
+    stacks: Dict[str, int] = {}
+    for record in spans:
+        path = []
+        current: Optional[Dict[str, Any]] = record
+        while current is not None and len(path) < 64:
+            path.append(current["name"])
+            current = by_id.get(current.get("parent_id"))
+        key = ";".join(reversed(path))
+        stacks[key] = stacks.get(key, 0) + int(round(self_times[record["span_id"]] * 1000))
+    return {key: value for key, value in stacks.items() if value > 0}
+
+
+def summarize_spans(spans: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Статистика по именам спанов (мс), по убыванию суммарного времени"""
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for record in spans:
+        durations.setdefault(record["name"], []).append(record["duration_ms"])
+        if record.get("status") == "error":
+            errors[record["name"]] = errors.get(record["name"], 0) + 1
+
+    def percentile(values: List[float], fraction: float) -> float:
+        return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        rows.append({
+            "name": name,
+            "count": len(values),
+            "errors": errors.get(name, 0),
+            "p50_ms": round(percentile(values, 0.5), 1),
+            "p95_ms": round(percentile(values, 0.95), 1),
+            "max_ms": round(values[-1], 1),
+            "total_ms": round(sum(values), 1),
+        })
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+    return rows
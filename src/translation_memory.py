@@ -0,0 +1,188 @@
+"""
+Память переводов для Stage 2.5: повторяющиеся предложения не переводятся заново
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?…])\s+(?=[\"«(\[]?[A-ZА-ЯЁ0-9])")
+_LINE_BREAK_RE = re.compile(r"[ \t]*(?:\r?\n[ \t]*)+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Сокращения, после точки которых предложение не заканчивается
+_ABBREVIATIONS = {
+    "dr", "mr", "mrs", "ms", "prof", "st", "jr", "sr", "vs", "etc", "inc", "ltd", "co", "corp",
+    "no", "gen", "sen", "rep", "gov", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+    "sept", "oct", "nov", "dec", "др", "проф", "тыс", "млн", "млрд", "руб", "им", "ул", "гг", "стр",
+}
+
+
+def _is_sentence_end(head: str) -> bool:
+    """Точка заканчивает предложение только после настоящего слова, а не номера или сокращения"""
+    if not head.endswith("."):
+        return True
+    word = head.rstrip(".").rsplit(None, 1)[-1].lstrip("\"«([")
+    return word.isalpha() and len(word) > 1 and word.lower() not in _ABBREVIATIONS
+
+
+def _split_line(line: str) -> List[str]:
+    line = _WHITESPACE_RE.sub(" ", line).strip()
+    segments, start = [], 0
+    for match in _SENTENCE_BOUNDARY_RE.finditer(line):
+        if _is_sentence_end(line[start:match.start()]):
+            segments.append(line[start:match.start()])
+            start = match.end()
+    segments.append(line[start:])
+    return [segment for segment in segments if segment]
+
+
+def segment_text(text: str) -> Tuple[List[str], List[str]]:
+    """
+    Делит текст на предложения — единицы повторного использования — и возвращает
+    разделители между ними: переводы собираются обратно с теми же переносами строк
+    """
+    segments: List[str] = []
+    separators: List[str] = []
+    stripped = (text or "").strip()
+    line_breaks = [""] + _LINE_BREAK_RE.findall(stripped)
+    for line, line_break in zip(_LINE_BREAK_RE.split(stripped), line_breaks):
+        line_segments = _split_line(line)
+        if not line_segments:
+            continue
+        if segments:
+            separators.append(line_break)
+        segments.extend(line_segments)
+        separators.extend(" " for _ in line_segments[1:])
+    return segments, separators
+
+
+def split_segments(text: str) -> List[str]:
+    """Делит текст на предложения — единицы повторного использования"""
+    return segment_text(text)[0]
+
+
+def join_segments(segments: List[str], separators: List[str]) -> str:
+    """Собирает переведенные предложения с исходными разделителями"""
+    return "".join(segment + separator for segment, separator in zip(segments, separators + [""]))
+
+
+def segment_key(segment: str) -> str:
+    return hashlib.sha256(_WHITESPACE_RE.sub(" ", segment).strip().encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """SQLite-хранилище переводов сегментов с LRU-вытеснением и лимитом размера"""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.db_path = db_path or Config.TRANSLATION_MEMORY_PATH
+        self.max_entries = max_entries if max_entries is not None else Config.TRANSLATION_MEMORY_MAX_ENTRIES
+        self._db_lock = threading.Lock()
+        self._conn = self._connect()
+        self.hits = 0
+        self.misses = 0
+        self.requests_saved = 0
+        self._model_latency_total = 0.0
+        self._model_calls = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                uses INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)")
+        conn.commit()
+        return conn
+
+    async def lookup(self, segments: Iterable[str]) -> Dict[str, str]:
+        """Возвращает известные переводы {сегмент: перевод}"""
+        unique = list(dict.fromkeys(segment for segment in segments if segment))
+        if not unique:
+            return {}
+        found = await asyncio.to_thread(self._select, unique)
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    async def store(self, translations: Dict[str, str]) -> None:
+        """Сохраняет переводы сегментов и вытесняет самые давно использованные"""
+        pairs = {source: target for source, target in translations.items() if source and target}
+        if pairs:
+            await asyncio.to_thread(self._upsert, pairs)
+
+    def record_saved_request(self) -> None:
+        """Запрос к модели не понадобился — все сегменты нашлись в памяти"""
+        self.requests_saved += 1
+
+    def record_model_latency(self, seconds: float) -> None:
+        self._model_latency_total += seconds
+        self._model_calls += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        average_latency = self._model_latency_total / self._model_calls if self._model_calls else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "requests_saved": self.requests_saved,
+            "avg_model_latency": round(average_latency, 2),
+            "latency_saved_seconds": round(self.requests_saved * average_latency, 1),
+        }
+
+    def _select(self, segments: List[str]) -> Dict[str, str]:
+        keys = {segment_key(segment): segment for segment in segments}
+        placeholders = ",".join("?" * len(keys))
+        now = time.time()
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT key, translation FROM translations WHERE key IN ({placeholders})",
+                list(keys)
+            ).fetchall()
+            if rows:
+                self._conn.executemany(
+                    "UPDATE translations SET last_used = ?, uses = uses + 1 WHERE key = ?",
+                    [(now, key) for key, _ in rows]
+                )
+                self._conn.commit()
+        return {keys[key]: translation for key, translation in rows}
+
+    def _upsert(self, pairs: Dict[str, str]) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations (key, source, translation, last_used, uses) "
+                "VALUES (?, ?, ?, ?, 0)",
+                [(segment_key(source), source, target, now) for source, target in pairs.items()]
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM translations WHERE key IN "
+                    "(SELECT key FROM translations ORDER BY last_used ASC LIMIT ?)",
+                    (excess,)
+                )
+            self._conn.commit()
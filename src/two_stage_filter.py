@@ -7,16 +7,58 @@ import asyncio
 import json
 import time
 import re
+from collections import Counter
 from datetime import datetime
-from typing import Any, Dict, Tuple, List, Optional
-from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Tuple, List, Optional
+from dataclasses import asdict, dataclass, fields, replace
 from urllib.parse import urlparse
-from openai import AsyncOpenAI
+from openai import APIConnectionError, AsyncOpenAI, BadRequestError
+from cassette import wrap_client
+from claims import aggregate_claims, claim_key, claim_verdict, parse_claims
 from config import Config
+from hedging import LatencyTracker, run_hedged
+from metrics import STAGE2_FAILURES, STAGE_DURATION, record_check
+from openai_limiter import RateLimitedOpenAI
+from pipeline_events import (
+    ClaimVerified, ClaimsExtracted, FinalVerdict, PartialVerdict, PipelineEvent, SinglePassStarted,
+    SourcesChosen, Stage1Completed, Stage2AttemptFailed, Stage2AttemptStarted, emit, stream_events
+)
 from sources_config import sources_config
+from single_flight import SingleFlight
+from spam_filter import ClassificationLog, SpamFilter
+from tracing import span, traced
+from usage import CheckUsage, economy_mode, record_response, track_check, usage_stage
+from translation_memory import TranslationMemory, join_segments, segment_text
+from verdict_cache import VerdictCache, text_key
 
 logger = logging.getLogger(__name__)
 
+# Поля вердикта, которые переводятся на этапе 2.5
+TRANSLATABLE_FIELDS = [
+    ('detailed_findings', 'детальные выводы'),
+    ('contradictions', 'противоречия'),
+    ('missing_evidence', 'отсутствующие доказательства'),
+    ('special_notes', 'специальные примечания')
+]
+
+# Предел выходных токенов gpt-4o и запас на перевод одного сегмента пакета
+TRANSLATION_MAX_COMPLETION_TOKENS = 16384
+TRANSLATION_TOKENS_PER_FIELD = 500
+# Сегментов памяти переводов в одном запросе: так ответ укладывается в предел модели
+TRANSLATION_BATCH_SEGMENTS = TRANSLATION_MAX_COMPLETION_TOKENS // TRANSLATION_TOKENS_PER_FIELD
+
+_SENTENCE_END_RE = re.compile(r"[.!?…]+(?=\s|$)")
+_URL_RE = re.compile(r"https?://|www\.", re.IGNORECASE)
+
+
+def estimate_complexity(text: str) -> int:
+    """Грубая сложность утверждения: слова плюс 10 за каждое следующее предложение и каждую ссылку"""
+    stripped = text.strip()
+    words = len(stripped.split())
+    sentences = max(1, len(_SENTENCE_END_RE.findall(stripped)))
+    links = len(_URL_RE.findall(stripped))
+    return words + 10 * (sentences - 1) + 10 * links
+
 @dataclass
 class DebugInfo:
     """Информация для отладки"""
@@ -28,38 +70,204 @@ class DebugInfo:
     web_search_used: bool = False
     fallback_used: bool = False
     stage2_attempts: int = 0
+    stage2_hedges: int = 0
+    speculative_outcome: str = ""
     confidence_score: int = 0
     verification_status: str = ""
     detailed_findings: str = ""
     contradictions: str = ""
     missing_evidence: str = ""
     special_notes: str = ""
+    classification: str = ""
+    cache_hit: bool = False
+    coalesced: bool = False
+    spam_filter_score: Optional[float] = None
+    pipeline_mode: str = ""
+    claim_results: List[Dict[str, Any]] = None
+    # Расход OpenAI по этапам: calls, prompt_tokens, completion_tokens, web_search_calls, cost_usd
+    token_usage: Dict[str, Dict[str, Any]] = None
+    cost_usd: float = 0.0
+    economy_mode: bool = False
     
     def __post_init__(self):
         if self.sources_found is None:
             self.sources_found = []
+        if self.claim_results is None:
+            self.claim_results = []
+        if self.token_usage is None:
+            self.token_usage = {}
 
 class TwoStageFilter:
     """Двухэтапный фактчекер"""
     
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY)
+        # Все вызовы OpenAI идут через общий лимитер RPM/TPM; кассета (если включена) — под ним,
+        # чтобы воспроизведение проходило те же очереди, что и настоящие вызовы.
+        # Повторы 429 делает только лимитер: встроенные повторы SDK отключены, иначе они
+        # умножаются на попытки лимитера и идут мимо его пауз.
+        # Воспроизведению ключ API не нужен, клиенту SDK — нужен
+        api_key = Config.OPENAI_API_KEY or ("sk-replay" if Config.OPENAI_CASSETTE_MODE == "replay" else "")
+        self.client = RateLimitedOpenAI(wrap_client(
+            AsyncOpenAI(api_key=api_key, base_url=Config.OPENAI_BASE_URL or None, max_retries=0)
+        ))
         self.gpt5_available = True
         self.sources = sources_config
         self.fact_check_model = Config.FACT_CHECK_MODEL or "gpt-4o"
         self.web_search_effort = Config.WEB_SEARCH_EFFORT or "medium"
+        self.verdict_cache = VerdictCache() if Config.VERDICT_CACHE_ENABLED else None
+        self.single_flight = SingleFlight()
+        self.translation_memory = TranslationMemory() if Config.TRANSLATION_MEMORY_ENABLED else None
+        self.stage2_latency = LatencyTracker()
+        self._background_tasks = set()
+        self.speculation_stats = Counter()
+        self.streaming_available = Config.STAGE2_STREAMING
+        self.spam_filter = SpamFilter.load(Config.SPAM_FILTER_MODEL_PATH) if Config.SPAM_FILTER_ENABLED else None
+        self.stage1_log = ClassificationLog(Config.STAGE1_LOG_PATH) if Config.STAGE1_LOG_ENABLED else None
         
-    async def analyze_message(self, text: str, channel_name: str) -> Tuple[str, str, Optional[DebugInfo]]:
+    async def analyze_message(
+        self, text: str, channel_name: str, usage: Optional[CheckUsage] = None
+    ) -> Tuple[str, str, Optional[DebugInfo]]:
         """
         Двухэтапный анализ сообщения
         Возвращает: (категория, комментарий, отладочная_информация)
+        В usage накапливается расход OpenAI этой проверки; usage.economy — экономный режим
         """
+        started = time.perf_counter()
+        with span("analyze_message", chars=len(text or "")) as current, track_check(usage) as usage:
+            category, comment, debug = await self._analyze_message(text, channel_name)
+            if debug:
+                if not debug.cache_hit and not debug.coalesced:
+                    debug.token_usage = usage.by_stage()
+                    debug.cost_usd = round(usage.cost_usd, 6)
+                debug.economy_mode = usage.economy
+                current.set_attribute("pipeline_mode", debug.pipeline_mode)
+                current.set_attribute("verification_status", debug.verification_status)
+                current.set_attribute("cache_hit", debug.cache_hit)
+            current.set_attribute("total_tokens", usage.total_tokens)
+            current.set_attribute("cost_usd", round(usage.cost_usd, 6))
+        if usage.stages:
+            logger.info(
+                f"💰 Расход проверки: {usage.total_tokens} токенов, ${usage.cost_usd:.4f}"
+                f"{' (экономный режим)' if usage.economy else ''}"
+            )
+        record_check(debug, time.perf_counter() - started)
+        return category, comment, debug
+
+    async def _analyze_message(self, text: str, channel_name: str) -> Tuple[str, str, Optional[DebugInfo]]:
         if not text or len(text.strip()) < 10:
             return "скрыто", "Слишком короткое сообщение", None
-            
+
+        spam_verdict = self._local_spam_verdict(text)
+        if spam_verdict:
+            return spam_verdict
+
+        if self.verdict_cache:
+            try:
+                cached = await self.verdict_cache.get(text)
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка чтения кэша вердиктов: {e}")
+                cached = None
+            if cached:
+                logger.info(f"⚡ Вердикт из кэша ({self.verdict_cache.stats()})")
+                return self._verdict_from_payload(cached)
+
+        # Одинаковые тексты, пришедшие одновременно, проверяются один раз
+        # (экономная проверка отдельно — ее урезанный вердикт не должен достаться другим)
+        key = text_key(text) + (":economy" if economy_mode() else "")
+        (category, comment, debug), shared = await self.single_flight.do(
+            key, lambda: self._analyze_and_store(text, channel_name)
+        )
+        if shared and debug:
+            # Расход записан на того, кто запустил проверку
+            debug = replace(debug, coalesced=True, token_usage={}, cost_usd=0.0)
+        return category, comment, debug
+
+    def _local_spam_verdict(self, text: str) -> Optional[Tuple[str, str, Optional[DebugInfo]]]:
+        """Явный спам отсекается локальной моделью без этапов 1 и 2"""
+        if not self.spam_filter:
+            return None
+        start_time = time.perf_counter()
+        score = self.spam_filter.predict_proba(text)
+        if score < Config.SPAM_FILTER_THRESHOLD:
+            return None
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"🚫 Локальный спам-фильтр: вероятность спама {score:.3f} ({elapsed * 1000:.2f} мс)")
+        emit(Stage1Completed(classification="spam", requires_fact_check=False, elapsed=elapsed))
+        debug = None
+        if Config.DEBUG_MODE:
+            debug = DebugInfo(
+                stage1_time=elapsed,
+                reasoning="Локальный спам-фильтр",
+                classification="spam",
+                spam_filter_score=round(score, 4)
+            )
+        return "скрыто", "Определено как спам", debug
+
+    async def analyze_message_events(
+        self, text: str, channel_name: str, usage: Optional[CheckUsage] = None
+    ) -> AsyncIterator[PipelineEvent]:
+        """
+        То же, что analyze_message, но с событиями прогресса по ходу проверки.
+        Последнее событие — FinalVerdict с результатом analyze_message.
+        """
+        async for event in stream_events(
+            lambda: self.analyze_message(text, channel_name, usage=usage),
+            lambda result: FinalVerdict(*result)
+        ):
+            yield event
+
+    async def _analyze_and_store(self, text: str, channel_name: str) -> Tuple[str, str, Optional[DebugInfo]]:
+        """Прогоняет пайплайн и сохраняет результат в кэш вердиктов"""
+        category, comment, debug = await self._analyze_uncached(text, channel_name)
+
+        # Экономный вердикт (меньше источников, без перевода) в общий кэш не попадает
+        if self.verdict_cache and debug and not debug.fallback_used and not economy_mode():
+            try:
+                await self.verdict_cache.put(
+                    text, self._verdict_to_payload(category, comment, debug), debug.classification
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка записи в кэш вердиктов: {e}")
+
+        return category, comment, debug
+
+    async def _analyze_uncached(self, text: str, channel_name: str) -> Tuple[str, str, Optional[DebugInfo]]:
+        """Полный прогон пайплайна без кэша: одним запросом для простых утверждений или в два этапа"""
         debug = DebugInfo() if Config.DEBUG_MODE else None
+
+        if self._use_single_pass(text):
+            verdict = await self._analyze_single_pass(text, debug)
+            if verdict is not None:
+                return verdict
+            # Одиночный запрос не удался — проверяем обычным путем, отметив это в debug
+            if debug:
+                debug.pipeline_mode = "single_pass_fallback"
+        elif debug:
+            debug.pipeline_mode = "two_stage"
+
+        return await self._analyze_two_stage(text, debug)
+
+    def _use_claim_decomposition(self, text: str) -> bool:
+        if not Config.CLAIM_DECOMPOSITION_ENABLED or economy_mode():
+            return False
+        return estimate_complexity(text) >= Config.CLAIM_DECOMPOSITION_MIN_COMPLEXITY
+
+    def _use_single_pass(self, text: str) -> bool:
+        if Config.PIPELINE_MODE != "auto":
+            return False
+        return estimate_complexity(text) <= Config.SINGLE_PASS_MAX_COMPLEXITY
+
+    async def _analyze_two_stage(self, text: str, debug: Optional[DebugInfo]) -> Tuple[str, str, Optional[DebugInfo]]:
+        """Двухэтапный пайплайн: выбор источников, затем фактчекинг по ним"""
+        speculation: Optional[Dict[str, Any]] = None
         
         try:
+            # Длинный текст пойдет на проверку по утверждениям — спекулятивный этап 2 не нужен
+            use_claims = self._use_claim_decomposition(text)
+            if Config.STAGE2_SPECULATIVE_MODE == "on" and not use_claims and not economy_mode():
+                speculation = self._start_speculative_stage2(text)
+
             # ЭТАП 1: Определение источников для проверки
             start_time = time.time()
             sources, analysis = await self._stage1_select_sources(text, debug)
@@ -68,15 +276,33 @@ class TwoStageFilter:
                 debug.sources_found = [src.get("domain") or src.get("url", "") for src in sources]
                 debug.sources_count = len(sources)
                 debug.reasoning = analysis.get("reasoning", "")
+                debug.classification = (analysis.get("classification") or "other").lower()
+            emit(Stage1Completed(
+                classification=(analysis.get("classification") or "other").lower(),
+                requires_fact_check=analysis.get("requires_fact_check", True),
+                elapsed=time.time() - start_time
+            ))
+            if sources:
+                emit(SourcesChosen([src.get("domain") or src.get("url", "") for src in sources]))
+            if self.stage1_log and not analysis.get("fallback"):
+                self._log_stage1(text, analysis)
 
             # Если сообщение не требует глубокого фактчекинга, завершаем на этапе 1
             if not analysis.get("requires_fact_check", True):
+                if speculation:
+                    self._settle_speculation(speculation, "cancelled", debug)
                 category, comment = self._finalize_without_stage2(analysis)
                 return category, comment, debug
 
             # ЭТАП 2: Фактчекинг по выбранным источникам
             start_time = time.time()
-            category, comment = await self._stage2_fact_check(text, sources, analysis, debug)
+            verdict = await self._stage2_by_claims(text, sources, analysis, debug) if use_claims else None
+            if verdict:
+                category, comment = verdict
+            elif speculation:
+                category, comment = await self._stage2_with_speculation(text, sources, analysis, debug, speculation)
+            else:
+                category, comment = await self._stage2_fact_check(text, sources, analysis, debug)
             if debug:
                 debug.stage2_time = time.time() - start_time
             
@@ -88,7 +314,224 @@ class TwoStageFilter:
                 debug.fallback_used = True
                 debug.reasoning = f"Ошибка: {str(e)}"
             return "другое", "", debug
+        finally:
+            if speculation and not speculation["task"].done():
+                speculation["task"].cancel()
+
+    @traced()
+    @usage_stage("single_pass")
+    async def _analyze_single_pass(self, text: str, debug: Optional[DebugInfo]) -> Optional[Tuple[str, str, Optional[DebugInfo]]]:
+        """
+        Классификация и проверка одним запросом Responses API с веб-поиском по доменам
+        из sources.json. При ошибке возвращает None — вызывающий переходит к двум этапам.
+        """
+        sources = self._single_pass_sources(text)
+        domains = [src["domain"] for src in sources]
+        logger.info(f"⚡ ОДИН ПРОХОД: сложность {estimate_complexity(text)}, {len(domains)} доменов")
+        emit(SinglePassStarted(domains))
+
+        if debug:
+            debug.pipeline_mode = "single_pass"
+            debug.sources_found = domains
+            debug.sources_count = len(domains)
+            debug.stage2_attempts = 1
+
+        start_time = time.time()
+        try:
+            result = await self._request_single_pass_verdict(text, sources, debug)
+        except Exception as e:
+            self._note_stage2_failure(1, sources, e, debug)
+            logger.warning("⚠️ Один проход не дал результата, переходим к двум этапам")
+            return None
+
+        classification = str(result.get("classification") or "other").lower()
+        requires_fact_check = self._needs_fact_check(result)
+        if debug:
+            debug.web_search_used = True
+            debug.classification = classification
+            debug.reasoning = result.get("reasoning", "")
+        if self.stage1_log:
+            self._log_stage1(text, {"classification": classification, "requires_fact_check": requires_fact_check})
+
+        if requires_fact_check and classification != "spam":
+            category, comment = await self._apply_stage2_result(result, debug)
+        else:
+            category, comment = self._finalize_without_stage2(result)
+        if debug:
+            debug.stage2_time = time.time() - start_time
+        return category, comment, debug
+
+    def _single_pass_sources(self, text: str) -> List[Dict[str, Any]]:
+        """Источники для одного прохода: домены sources.json по ключевым словам текста"""
+        domains = list(dict.fromkeys(self.sources.get_sources_for_topic(text)))
+        limit = Config.BUDGET_DOMAIN_LIMIT if economy_mode() else Config.STAGE2_INITIAL_DOMAIN_LIMIT
+        if not domains:
+            return self._build_backup_sources(text)[:limit]
+        return [
+            {
+                "name": domain,
+                "url": f"https://{domain}",
+                "domain": domain,
+                "why": "Источник из sources.json",
+                "priority": idx
+            }
+            for idx, domain in enumerate(domains[:limit], start=1)
+        ]
+
+    @traced()
+    async def _request_single_pass_verdict(
+        self,
+        text: str,
+        sources: List[Dict[str, Any]],
+        debug: Optional[DebugInfo]
+    ) -> Dict[str, Any]:
+        """Запрос одного прохода: вердикт этапа 2 плюс классификация этапа 1 в одном JSON."""
+
+        current_year = datetime.now().year
+        prompt = f"""
+You are a strict fact-checker. It is {current_year} now. First decide whether this message contains verifiable factual claims, then verify them using web search ONLY on the specified reliable sources.
+
+Sources to check:
+{self._format_sources_for_prompt(sources)}
+
+Message to verify: "{text}"
+
+If the message is a joke, personal note, advertisement or spam, do not search: set "needs_fact_check" to false and explain why in "skip_reason".
+
+Otherwise:
+1. Search the specified domains for EXACT information matching the message
+2. Verify EVERY specific claim, detail, and statement in the message
+3. Pay special attention to precise wording (e.g., "will affect" vs "will NOT affect")
+4. If any detail cannot be confirmed or contradicts found information, mark as unconfirmed/contradictory
+
+Response in strict JSON format:
+{{
+  "needs_fact_check": true,
+  "classification": "news|science|entertainment|personal|spam|other",
+  "reasoning": "short explanation of the classification",
+  "skip_reason": "why fact-checking is not needed (if needs_fact_check is false)",
+  "verification_status": "confirmed|partially_confirmed|contradictory|unconfirmed",
+  "confidence_score": 75,
+  "category": "news|entertainment|other|spam",
+  "detailed_findings": "What exactly was found/not found in sources with specific details",
+  "contradictions": "Any contradictions found between message and sources",
+  "sources_checked": ["List of sources actually checked"],
+  "missing_evidence": "What specific claims lack evidence",
+  "special_notes": "Any special circumstances like fresh content, API limitations, etc."
+}}
+
+CRITICAL: confidence_score MUST be a numeric integer between 0-100, NOT text like "ninety" or "high".
+
+Verification criteria:
+- "confirmed" (90-100): Direct quotes/official statements support ALL claims
+- "partially_confirmed" (60-89): Some claims supported, others unclear
+- "contradictory" (30-59): Some claims directly contradicted by sources
+- "unconfirmed" (0-29): No supporting evidence found for key claims
+"""
+
+        domains = [src["domain"] for src in sources]
+        output_text = await self._web_search_request(prompt, domains, Config.FACT_CHECK_TIMEOUT, debug)
+        logger.info(f"📄 Ответ одного прохода: {output_text[:200]}...")
+        return self._parse_verdict_json(output_text)
+
+    def _log_stage1(self, text: str, analysis: Dict[str, Any]) -> None:
+        """Пишет классификацию этапа 1 в журнал в фоне, не задерживая проверку"""
+        async def write() -> None:
+            try:
+                await asyncio.to_thread(
+                    self.stage1_log.append,
+                    text,
+                    (analysis.get("classification") or "other").lower(),
+                    bool(analysis.get("requires_fact_check", True))
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка записи журнала этапа 1: {e}")
+
+        task = asyncio.create_task(write())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _start_speculative_stage2(self, text: str) -> Dict[str, Any]:
+        """Запускает этап 2 на локально подобранных источниках параллельно с этапом 1."""
+
+        spec_sources = self._build_backup_sources(text)[:Config.STAGE2_INITIAL_DOMAIN_LIMIT or None]
+        task = asyncio.ensure_future(
+            self._request_stage2_verdict(text, spec_sources, Config.FACT_CHECK_TIMEOUT, None, None)
+        )
+        # Исключение забирается в _stage2_with_speculation или гасится здесь при отмене
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.speculation_stats["launched"] += 1
+        logger.info("🔮 Спекулятивный этап 2 запущен на %s доменах", len(spec_sources))
+        return {"task": task, "domains": {src["domain"] for src in spec_sources if src.get("domain")}}
+
+    @traced()
+    async def _stage2_with_speculation(
+        self,
+        text: str,
+        sources: List[Dict[str, Any]],
+        analysis: Dict[str, Any],
+        debug: Optional[DebugInfo],
+        speculation: Dict[str, Any]
+    ) -> Tuple[str, str]:
+        """Решает судьбу спекулятивного запуска после ответа этапа 1."""
+
+        first_attempt = self._build_stage2_attempts(sources)[0] if sources else []
+        wanted = {src.get("domain") for src in first_attempt if src.get("domain")}
+        coverage = len(wanted & speculation["domains"]) / len(wanted) if wanted else 0.0
+
+        if not sources or coverage < Config.STAGE2_SPECULATIVE_MIN_OVERLAP:
+            logger.info("🔮 Этап 1 выбрал другие источники (покрытие %.0f%%), перезапускаем этап 2", coverage * 100)
+            self._settle_speculation(speculation, "replaced", debug)
+            return await self._stage2_fact_check(text, sources, analysis, debug)
+
+        logger.info("🔮 Источники совпадают на %.0f%%, ждем спекулятивный этап 2", coverage * 100)
+        emit(Stage2AttemptStarted(attempt=1, total=1, domains=sorted(speculation["domains"]), speculative=True))
+        if debug:
+            debug.stage2_attempts += 1
+        try:
+            result = await speculation["task"]
+        except Exception as e:
+            logger.warning(f"⚠️ Спекулятивный этап 2 не удался ({e}), запускаем обычный")
+            self._settle_speculation(speculation, "failed", debug)
+            return await self._stage2_fact_check(text, sources, analysis, debug)
+
+        self._settle_speculation(speculation, "kept", debug)
+        if debug:
+            debug.web_search_used = True
+            debug.sources_found = sorted(speculation["domains"])
+            debug.sources_count = len(debug.sources_found)
+        return await self._apply_stage2_result(result, debug)
+
+    def _settle_speculation(self, speculation: Dict[str, Any], outcome: str, debug: Optional[DebugInfo]) -> None:
+        """Фиксирует исход спекуляции и отменяет ненужный запуск."""
+
+        if outcome != "kept" and not speculation["task"].done():
+            speculation["task"].cancel()
+        self.speculation_stats[outcome] += 1
+        if debug:
+            debug.speculative_outcome = outcome
+        stats = self.speculation_stats
+        logger.info(
+            "🔮 Спекуляция: %s | окупилась %s из %s (заменена %s, отменена %s, ошибка %s)",
+            outcome, stats["kept"], stats["launched"], stats["replaced"], stats["cancelled"], stats["failed"]
+        )
+
+    def _verdict_to_payload(self, category: str, comment: str, debug: DebugInfo) -> Dict[str, Any]:
+        """Сериализует вердикт для кэша"""
+        return {"category": category, "comment": comment, "debug": asdict(debug)}
+
+    def _verdict_from_payload(self, payload: Dict[str, Any]) -> Tuple[str, str, Optional[DebugInfo]]:
+        """Восстанавливает вердикт из кэша"""
+        debug_data = payload.get("debug")
+        debug = None
+        if isinstance(debug_data, dict):
+            known = {f.name for f in fields(DebugInfo)}
+            debug = DebugInfo(**{k: v for k, v in debug_data.items() if k in known})
+            debug.cache_hit = True
+        return payload.get("category", "другое"), payload.get("comment", ""), debug
     
+    @traced()
+    @usage_stage("stage1")
     async def _stage1_select_sources(self, text: str, debug: Optional[DebugInfo]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
         """
         ЭТАП 1: Умный выбор источников для проверки
@@ -115,7 +558,7 @@ class TwoStageFilter:
 Ответь строго JSON-объектом:
 {{
   "needs_fact_check": true/false,
-  "classification": "news/entertainment/personal/spam/other",
+  "classification": "news/science/entertainment/personal/spam/other",
   "reasoning": "краткое объяснение",
   "skip_reason": "почему можно пропустить фактчекинг (если нужно)",
   "source_candidates": [
@@ -165,7 +608,8 @@ class TwoStageFilter:
                 "needs_fact_check": True,
                 "classification": "other",
                 "reasoning": "Не удалось получить ответ от модели",
-                "requires_fact_check": True
+                "requires_fact_check": True,
+                "fallback": True
             }
             backup = self._build_backup_sources(text)
             fallback_analysis["normalized_sources"] = backup
@@ -204,6 +648,7 @@ class TwoStageFilter:
         logger.info(f"✅ ЭТАП 1 завершен: выбрано {len(normalized_sources)} источников")
         return normalized_sources, analysis
 
+    @traced()
     async def _stage2_fact_check(
         self,
         text: str,
@@ -223,6 +668,16 @@ class TwoStageFilter:
         attempts = self._build_stage2_attempts(sources)
         last_error: Optional[Exception] = None
 
+        if Config.STAGE2_HEDGE_MODE == "hedged" and len(attempts) > 1:
+            try:
+                result = await self._stage2_hedged(text, attempts, analysis, debug)
+                if debug:
+                    debug.web_search_used = True
+                return await self._apply_stage2_result(result, debug)
+            except Exception as e:
+                last_error = e
+                attempts = []
+
         for idx, attempt_sources in enumerate(attempts, start=1):
             logger.info(
                 "🧪 ЭТАП 2: попытка %s с %s доменами", idx, len(attempt_sources)
@@ -230,40 +685,29 @@ class TwoStageFilter:
 
             if debug:
                 debug.stage2_attempts += 1
+            emit(Stage2AttemptStarted(
+                attempt=idx, total=len(attempts), domains=[src.get("domain", "") for src in attempt_sources]
+            ))
 
             try:
-                return await self._run_stage2_attempt(
-                    text,
-                    attempt_sources,
-                    Config.FACT_CHECK_TIMEOUT,
-                    analysis,
-                    debug
-                )
-            except asyncio.TimeoutError:
-                last_error = asyncio.TimeoutError()
-                preview = [src.get("domain") or self._extract_domain(src.get("url")) or "?" for src in attempt_sources[:3]]
-                preview_text = ", ".join(filter(None, preview))
-                if len(attempt_sources) > 3:
-                    preview_text += "..."
-                logger.warning(
-                    "⏰ Таймаут на попытке %s этапа 2 (домены: %s)",
-                    idx,
-                    preview_text or "неизвестно"
-                )
-                if debug:
-                    base_reason = debug.reasoning if debug.reasoning else "Логика недоступна"
-                    debug.reasoning = f"{base_reason} (timeout попытка {idx})"
-                continue
+                started = time.time()
+                with span("stage2_attempt", attempt=idx, domains=self._span_domains(attempt_sources)):
+                    category, comment = await self._run_stage2_attempt(
+                        text,
+                        attempt_sources,
+                        Config.FACT_CHECK_TIMEOUT,
+                        analysis,
+                        debug
+                    )
+                self.stage2_latency.record(time.time() - started)
+                return category, comment
             except Exception as e:
                 last_error = e
-                logger.error(f"❌ Ошибка этапа 2 на попытке {idx}: {e}")
-                if "gpt-5" in str(e).lower() and self.gpt5_available:
+                self._note_stage2_failure(idx, attempt_sources, e, debug)
+                if not isinstance(e, asyncio.TimeoutError) and "gpt-5" in str(e).lower() and self.gpt5_available:
                     logger.info("GPT-5 недоступен, переключаемся на GPT-4o")
                     self.gpt5_available = False
-                    return await self._stage2_fact_check(text, sources, debug)
-                if debug:
-                    base_reason = debug.reasoning if debug.reasoning else "Логика недоступна"
-                    debug.reasoning = f"{base_reason} (ошибка этапа 2, попытка {idx})"
+                    return await self._stage2_fact_check(text, sources, analysis, debug)
                 continue
 
         logger.warning("⚠️ Этап 2 не дал результата, переходим в fallback")
@@ -275,6 +719,229 @@ class TwoStageFilter:
                 debug.reasoning = f"{base_reason} (stage2 timeout)"
         return await self._fallback_check(text, debug)
     
+    @traced()
+    async def _stage2_by_claims(
+        self,
+        text: str,
+        sources: List[Dict[str, Any]],
+        analysis: Dict[str, Any],
+        debug: Optional[DebugInfo]
+    ) -> Optional[Tuple[str, str]]:
+        """
+        ЭТАП 2 по утверждениям: сообщение разбивается на отдельные утверждения, каждое
+        проверяется параллельно по своему набору доменов, вердикты сводятся в один.
+        None — разбить не удалось или ни одно утверждение не проверено; нужен обычный этап 2.
+        """
+        claims = await self._decompose_claims(text, sources)
+        if len(claims) < 2:
+            logger.info("ℹ️ Утверждений меньше двух, проверяем сообщение целиком")
+            return None
+
+        logger.info(f"🧩 ЭТАП 2: проверяем {len(claims)} утверждений параллельно")
+        emit(ClaimsExtracted([claim["claim"] for claim in claims]))
+        classification = (analysis.get("classification") or "other").lower()
+        semaphore = asyncio.Semaphore(max(1, Config.CLAIM_CONCURRENCY))
+        results = await asyncio.gather(*(
+            self._verify_claim(idx, len(claims), claim, sources, analysis, classification, semaphore, debug)
+            for idx, claim in enumerate(claims, start=1)
+        ))
+        if debug:
+            debug.claim_results = results
+
+        aggregate = aggregate_claims(results)
+        if aggregate is None:
+            logger.warning("⚠️ Ни одно утверждение не проверено, проверяем сообщение целиком")
+            return None
+        if debug:
+            debug.pipeline_mode = "claims"
+            # Поиск был, только если хотя бы одно утверждение проверено не из кэша
+            debug.web_search_used = any(
+                not result.get("cached") and result.get("verification_status") != "failed" for result in results
+            )
+        return await self._apply_stage2_result(aggregate, debug)
+
+    @traced()
+    @usage_stage("claims")
+    async def _decompose_claims(self, text: str, sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Разбивает сообщение на самостоятельные утверждения и раздает им домены этапа 1"""
+        domains = [src.get("domain") or self._extract_domain(src.get("url")) for src in sources]
+        domains = [d for d in domains if d]
+        prompt = f"""
+Разбей сообщение на отдельные проверяемые утверждения (не больше {Config.CLAIM_MAX_COUNT}).
+
+Сообщение: "{text}"
+
+Доступные источники: {", ".join(domains) or "нет"}
+
+Правила:
+- Каждое утверждение — одна проверяемая мысль, понятная без исходного сообщения
+  (вместо «он», «компания» — имена и названия).
+- Мнения, эмоции и призывы не включай.
+- Для каждого утверждения выбери до {Config.STAGE2_RETRY_DOMAIN_LIMIT} наиболее подходящих источников только из списка выше.
+
+Ответь строго JSON-объектом:
+{{
+  "claims": [
+    {{"claim": "утверждение", "domains": ["example.com"], "search_query": "поисковый запрос"}}
+  ]
+}}
+"""
+        try:
+            response = await self.client.chat.completions.create(
+                model="gpt-4o",
+                messages=[{"role": "user", "content": prompt}],
+                max_completion_tokens=Config.STAGE1_MAX_TOKENS,
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            )
+            payload = json.loads(response.choices[0].message.content.strip())
+        except Exception as e:
+            logger.error(f"❌ Ошибка разбиения на утверждения: {e}")
+            return []
+        return parse_claims(payload, domains, Config.CLAIM_MAX_COUNT)
+
+    @traced()
+    async def _verify_claim(
+        self,
+        idx: int,
+        total: int,
+        claim: Dict[str, Any],
+        sources: List[Dict[str, Any]],
+        analysis: Dict[str, Any],
+        classification: str,
+        semaphore: asyncio.Semaphore,
+        debug: Optional[DebugInfo]
+    ) -> Dict[str, Any]:
+        """Проверяет одно утверждение; вердикт берется из кэша утверждений, если он там есть"""
+        key = claim_key(claim["claim"])
+        if self.verdict_cache:
+            try:
+                cached = await self.verdict_cache.get_by_key(key)
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка чтения кэша утверждений: {e}")
+                cached = None
+            if cached:
+                logger.info(f"⚡ Утверждение {idx} из кэша: {claim['claim'][:60]}")
+                emit(ClaimVerified(idx, total, cached.get("verification_status", ""), cached.get("confidence_score", 0), cached=True))
+                return {"claim": claim["claim"], **cached, "cached": True}
+
+        claim_sources = self._claim_sources(claim, sources)
+        queries = [claim["search_query"]] if claim["search_query"] else analysis.get("recommended_queries")
+        async with semaphore:
+            if debug:
+                debug.stage2_attempts += 1
+            try:
+                raw = await self._request_stage2_verdict(
+                    claim["claim"], claim_sources, Config.FACT_CHECK_TIMEOUT, {"recommended_queries": queries}, debug
+                )
+            except Exception as e:
+                reason = "таймаут" if isinstance(e, asyncio.TimeoutError) else str(e)
+                logger.warning(f"⚠️ Утверждение {idx} не проверено ({reason}): {claim['claim'][:60]}")
+                emit(ClaimVerified(idx, total, "failed"))
+                return {"claim": claim["claim"], "verification_status": "failed", "error": reason}
+
+        verdict = claim_verdict(raw)
+        verdict["confidence_score"] = self._normalize_confidence(verdict["verification_status"], verdict["confidence_score"])
+        emit(ClaimVerified(idx, total, verdict["verification_status"], verdict["confidence_score"]))
+        if self.verdict_cache:
+            try:
+                await self.verdict_cache.put_by_key(key, verdict, classification)
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка записи в кэш утверждений: {e}")
+        return {"claim": claim["claim"], **verdict, "cached": False}
+
+    def _claim_sources(self, claim: Dict[str, Any], sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Домены утверждения: выбранные моделью, иначе совпавшие по ключевым словам, иначе первые из этапа 1"""
+        limit = Config.STAGE2_RETRY_DOMAIN_LIMIT
+        by_domain = {src.get("domain") or self._extract_domain(src.get("url")): src for src in sources}
+        chosen = [by_domain[d] for d in claim["domains"] if d in by_domain]
+        if not chosen:
+            chosen = [by_domain[d] for d in self.sources.get_sources_for_topic(claim["claim"]) if d in by_domain]
+        return (chosen or sources)[:limit]
+
+    @traced()
+    async def _stage2_hedged(
+        self,
+        text: str,
+        attempts: List[List[Dict[str, Any]]],
+        analysis: Dict[str, Any],
+        debug: Optional[DebugInfo]
+    ) -> Dict[str, Any]:
+        """Хеджированный этап 2: следующий набор доменов стартует, если текущий затянулся."""
+
+        observed = self.stage2_latency.percentile(Config.STAGE2_HEDGE_PERCENTILE)
+        hedge_delay = observed if observed is not None else Config.STAGE2_HEDGE_DELAY
+        hedge_delay = min(hedge_delay, Config.FACT_CHECK_TIMEOUT)
+        logger.info(
+            "🪁 ЭТАП 2 (хедж): %s попыток, задержка хеджа %.1fс (p%s по %s наблюдениям)",
+            len(attempts), hedge_delay, int(Config.STAGE2_HEDGE_PERCENTILE * 100), len(self.stage2_latency)
+        )
+
+        def make_attempt(idx: int, attempt_sources: List[Dict[str, Any]]):
+            async def attempt() -> Dict[str, Any]:
+                started = time.time()
+                try:
+                    with span("stage2_attempt", attempt=idx, domains=self._span_domains(attempt_sources)):
+                        result = await self._request_stage2_verdict(
+                            text, attempt_sources, Config.FACT_CHECK_TIMEOUT, analysis, debug
+                        )
+                except Exception as e:
+                    self._note_stage2_failure(idx, attempt_sources, e, debug)
+                    raise
+                self.stage2_latency.record(time.time() - started)
+                logger.info("🏁 ЭТАП 2: попытка %s победила за %.1fс", idx, time.time() - started)
+                return result
+            return attempt
+
+        def on_launch(idx: int, hedge: bool) -> None:
+            logger.info("🧪 ЭТАП 2: попытка %s с %s доменами%s", idx, len(attempts[idx - 1]), " (хедж)" if hedge else "")
+            if debug:
+                debug.stage2_attempts += 1
+                if hedge:
+                    debug.stage2_hedges += 1
+            emit(Stage2AttemptStarted(
+                attempt=idx, total=len(attempts),
+                domains=[src.get("domain", "") for src in attempts[idx - 1]], hedge=hedge
+            ))
+
+        return await run_hedged(
+            [make_attempt(idx, attempt_sources) for idx, attempt_sources in enumerate(attempts, start=1)],
+            hedge_delay,
+            max_parallel=Config.STAGE2_HEDGE_MAX_PARALLEL,
+            on_launch=on_launch
+        )
+
+    def _note_stage2_failure(
+        self,
+        idx: int,
+        attempt_sources: List[Dict[str, Any]],
+        error: Exception,
+        debug: Optional[DebugInfo]
+    ) -> None:
+        """Логирует неудачную попытку этапа 2 и дописывает причину в debug."""
+
+        if isinstance(error, asyncio.TimeoutError):
+            preview = [src.get("domain") or self._extract_domain(src.get("url")) or "?" for src in attempt_sources[:3]]
+            preview_text = ", ".join(filter(None, preview))
+            if len(attempt_sources) > 3:
+                preview_text += "..."
+            logger.warning(
+                "⏰ Таймаут на попытке %s этапа 2 (домены: %s)",
+                idx,
+                preview_text or "неизвестно"
+            )
+            suffix = f"timeout попытка {idx}"
+        else:
+            logger.error(f"❌ Ошибка этапа 2 на попытке {idx}: {error}")
+            suffix = f"ошибка этапа 2, попытка {idx}"
+        emit(Stage2AttemptFailed(attempt=idx, timed_out=isinstance(error, asyncio.TimeoutError), error=str(error)))
+        STAGE2_FAILURES.inc(reason="timeout" if isinstance(error, asyncio.TimeoutError) else "error")
+        if debug:
+            base_reason = debug.reasoning if debug.reasoning else "Логика недоступна"
+            debug.reasoning = f"{base_reason} ({suffix})"
+    
+    @traced()
+    @usage_stage("spam_check")
     async def _quick_spam_check(self, text: str, debug: Optional[DebugInfo]) -> Tuple[str, str]:
         """Быстрая проверка на спам без веб-поиска"""
         logger.info("⚡ Быстрая проверка на спам...")
@@ -301,6 +968,8 @@ class TwoStageFilter:
             logger.error(f"Ошибка быстрой проверки: {e}")
             return "другое", ""
     
+    @traced()
+    @usage_stage("fallback")
     async def _fallback_check(self, text: str, debug: Optional[DebugInfo]) -> Tuple[str, str]:
         """Резервная проверка"""
         logger.info("🔄 Резервная проверка...")
@@ -354,6 +1023,23 @@ class TwoStageFilter:
     ) -> Tuple[str, str]:
         """Выполняет одиночную попытку этапа 2 с заданным списком источников."""
 
+        result = await self._request_stage2_verdict(text, attempt_sources, timeout, analysis, debug)
+        if debug:
+            debug.web_search_used = True
+        return await self._apply_stage2_result(result, debug)
+
+    @traced()
+    @usage_stage("stage2")
+    async def _request_stage2_verdict(
+        self,
+        text: str,
+        attempt_sources: List[Dict[str, Any]],
+        timeout: float,
+        analysis: Optional[Dict[str, Any]],
+        debug: Optional[DebugInfo]
+    ) -> Dict[str, Any]:
+        """Запрашивает у модели вердикт этапа 2 и возвращает разобранный JSON без побочных эффектов."""
+
         sources_text = self._format_sources_for_prompt(attempt_sources)
 
         queries = analysis.get("recommended_queries") if analysis else None
@@ -434,23 +1120,50 @@ Verification criteria:
             logger.info(f"🔍 Поисковые запросы: {queries_text.strip() if queries_text else 'Нет специальных запросов'}")
             logger.info(f"📝 Текст для проверки: {text[:100]}...")
 
+        output_text = await self._web_search_request(prompt, allowed_domains, timeout, debug)
+        logger.info(f"📄 Ответ этапа 2: {output_text[:200]}...")
+        
+        # Special logging for X.com search results  
+        x_domains = [d for d in allowed_domains if 'x.com' in d or 'twitter.com' in d]
+        if x_domains:
+            logger.info(f"🐦 X.com результат: {output_text[:300]}...")
+            if 'sources_checked' in output_text.lower():
+                try:
+                    temp_result = json.loads(output_text if output_text.startswith('{') else output_text[output_text.find('{'):output_text.rfind('}')+1])
+                    sources_checked = temp_result.get("sources_checked", [])
+                    x_sources_found = [s for s in sources_checked if 'x.com' in str(s).lower() or 'twitter.com' in str(s).lower()]
+                    logger.info(f"🐦 X.com источники найдены: {x_sources_found}")
+                except:
+                    logger.info("🐦 X.com: не удалось извлечь sources_checked из ответа")
+
+        return self._parse_verdict_json(output_text)
+
+    @traced()
+    async def _web_search_request(
+        self,
+        prompt: str,
+        allowed_domains: List[str],
+        timeout: float,
+        debug: Optional[DebugInfo]
+    ) -> str:
+        """Запрос к Responses API с веб-поиском по разрешенным доменам; возвращает текст ответа."""
+
         responses_client = self.client.responses
+        request = {
+            "model": self.fact_check_model,
+            "tools": [{
+                "type": "web_search",
+                "filters": {
+                    "allowed_domains": allowed_domains
+                }
+            }],
+            "input": prompt,
+            "tool_choice": "auto",
+            "max_output_tokens": Config.STAGE2_MAX_TOKENS
+        }
 
         try:
-            create_task = responses_client.create(
-                model=self.fact_check_model,
-                tools=[{
-                    "type": "web_search",
-                    "filters": {
-                        "allowed_domains": allowed_domains
-                    }
-                }],
-                input=prompt,
-                tool_choice="auto",
-                max_output_tokens=Config.STAGE2_MAX_TOKENS
-            )
-            initial_response = await asyncio.wait_for(create_task, timeout=timeout)
-            response = await self._poll_response(responses_client, initial_response, timeout)
+            response = await self._execute_responses_request(responses_client, request, timeout)
         except asyncio.TimeoutError:
             raise
         except Exception as err:
@@ -460,25 +1173,13 @@ Verification criteria:
                     self.fact_check_model
                 )
                 self.fact_check_model = "gpt-4o"
-                create_task = responses_client.create(
-                    model=self.fact_check_model,
-                    tools=[{
-                        "type": "web_search",
-                        "filters": {
-                            "allowed_domains": allowed_domains
-                        }
-                    }],
-                    input=prompt,
-                    tool_choice="auto",
-                    max_output_tokens=Config.STAGE2_MAX_TOKENS
-                )
-                initial_response = await asyncio.wait_for(create_task, timeout=timeout)
-                response = await self._poll_response(responses_client, initial_response, timeout)
+                request["model"] = self.fact_check_model
+                response = await self._execute_responses_request(responses_client, request, timeout)
             else:
                 raise
 
-        if debug:
-            debug.web_search_used = True
+        # Итоговый usage потокового и фонового ответа лимитер не видит
+        record_response(request["model"], response)
 
         output_text = self._extract_response_text(response)
         status = getattr(response, "status", None)
@@ -488,20 +1189,10 @@ Verification criteria:
                 logger.debug("📝 Полный ответ этапа 2: %s", response.model_dump(exclude_none=True))
             except Exception:
                 logger.debug("📝 Полный ответ этапа 2: %r", response)
-        logger.info(f"📄 Ответ этапа 2: {output_text[:200]}...")
-        
-        # Special logging for X.com search results  
-        x_domains = [d for d in allowed_domains if 'x.com' in d or 'twitter.com' in d]
-        if x_domains:
-            logger.info(f"🐦 X.com результат: {output_text[:300]}...")
-            if 'sources_checked' in output_text.lower():
-                try:
-                    temp_result = json.loads(output_text if output_text.startswith('{') else output_text[output_text.find('{'):output_text.rfind('}')+1])
-                    sources_checked = temp_result.get("sources_checked", [])
-                    x_sources_found = [s for s in sources_checked if 'x.com' in str(s).lower() or 'twitter.com' in str(s).lower()]
-                    logger.info(f"🐦 X.com источники найдены: {x_sources_found}")
-                except:
-                    logger.info("🐦 X.com: не удалось извлечь sources_checked из ответа")
+        return output_text
+
+    def _parse_verdict_json(self, output_text: str) -> Dict[str, Any]:
+        """Достает JSON-объект вердикта из текста ответа модели."""
 
         if not output_text:
             raise ValueError("Пустой ответ от модели этапа 2")
@@ -516,31 +1207,24 @@ Verification criteria:
             json_text = output_text[json_start:json_end]
             result = json.loads(json_text)
 
+        if not isinstance(result, dict):
+            raise ValueError("Ответ этапа 2 не является JSON-объектом")
+        return result
+
+    async def _apply_stage2_result(self, result: Dict[str, Any], debug: Optional[DebugInfo]) -> Tuple[str, str]:
+        """Нормализует вердикт этапа 2, сохраняет поля в debug и переводит их (Stage 2.5)."""
+
         # Handle new verification-based schema
         verification_status = result.get("verification_status", "")
         confidence_score = result.get("confidence_score", 0)
         
-        # Validate and fix confidence_score if it's not numeric
-        if not isinstance(confidence_score, (int, float)):
-            logger.warning(f"⚠️ confidence_score не является числом: {confidence_score}, устанавливаем 0")
-            confidence_score = 0
-        else:
-            confidence_score = int(confidence_score)
-            if confidence_score < 0 or confidence_score > 100:
-                logger.warning(f"⚠️ confidence_score вне диапазона 0-100: {confidence_score}, корректируем")
-                confidence_score = max(0, min(100, confidence_score))
         category = result.get("category", "другое")
         
         # Check for spam category first
         if category == "spam":
             return "скрыто", "Определено как спам"
         
-        # Fix confidence_score logic for contradictory status
-        # If status is contradictory, confidence_score should reflect low trust in the claim
-        if verification_status == "contradictory" and confidence_score > 50:
-            # Invert confidence score - high model confidence in contradiction = low trust in claim
-            confidence_score = 100 - confidence_score
-            logger.info(f"🔄 Inverted confidence_score for contradictory status: {confidence_score}%")
+        confidence_score = self._normalize_confidence(verification_status, confidence_score)
         
         # Extract fields from API response
         detailed_findings = result.get("detailed_findings", "")
@@ -556,6 +1240,7 @@ Verification criteria:
             debug.contradictions = contradictions
             debug.missing_evidence = missing_evidence
             debug.special_notes = special_notes
+        emit(PartialVerdict(verification_status=verification_status, confidence_score=confidence_score, category=category))
         
         # Stage 2.5: Translate comment fields to Russian if enabled
         await self._translate_comment_fields(debug)
@@ -565,35 +1250,192 @@ Verification criteria:
         
         return category, comment
 
+    def _normalize_confidence(self, verification_status: str, confidence_score: Any) -> int:
+        """Приводит confidence_score к целому 0-100 с учетом статуса вердикта."""
+
+        # Validate and fix confidence_score if it's not numeric
+        if not isinstance(confidence_score, (int, float)):
+            logger.warning(f"⚠️ confidence_score не является числом: {confidence_score}, устанавливаем 0")
+            confidence_score = 0
+        else:
+            confidence_score = int(confidence_score)
+            if confidence_score < 0 or confidence_score > 100:
+                logger.warning(f"⚠️ confidence_score вне диапазона 0-100: {confidence_score}, корректируем")
+                confidence_score = max(0, min(100, confidence_score))
+        
+        # Fix confidence_score logic for contradictory status
+        # If status is contradictory, confidence_score should reflect low trust in the claim
+        if verification_status == "contradictory" and confidence_score > 50:
+            # Invert confidence score - high model confidence in contradiction = low trust in claim
+            confidence_score = 100 - confidence_score
+            logger.info(f"🔄 Inverted confidence_score for contradictory status: {confidence_score}%")
+        return confidence_score
+
+    @traced()
+    @usage_stage("translation")
     async def _translate_comment_fields(self, debug: Optional[DebugInfo]) -> None:
         """Переводит текстовые поля комментария на русский язык (Stage 2.5)"""
         if not debug or not Config.TRANSLATE_TO_RUSSIAN:
             return
+        if economy_mode():
+            logger.info("💸 STAGE 2.5 пропущен: бюджет пользователя исчерпан")
+            return
         
         logger.info("🌐 STAGE 2.5: Переводим комментарии на русский...")
         
         # Переводим все доступные поля
-        fields_to_translate = [
-            ('detailed_findings', 'детальные выводы'),
-            ('contradictions', 'противоречия'),
-            ('missing_evidence', 'отсутствующие доказательства'),
-            ('special_notes', 'специальные примечания')
-        ]
-        
-        for field_name, field_description in fields_to_translate:
+        pending = {}
+        for field_name, _ in TRANSLATABLE_FIELDS:
             field_value = getattr(debug, field_name, "")
             if field_value and field_value.strip():
-                try:
-                    translated_text = await self._translate_text(field_value, field_description)
-                    setattr(debug, field_name, translated_text)
-                    logger.info(f"✅ Переведено поле {field_name}")
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка перевода поля {field_name}: {e}")
-                    # Оставляем оригинальный текст при ошибке
+                pending[field_name] = field_value
+        
+        if not pending:
+            return
+        
+        started = time.perf_counter()
+        try:
+            await self._translate_pending_fields(debug, pending)
+        finally:
+            STAGE_DURATION.observe(time.perf_counter() - started, stage="translation")
+
+    async def _translate_pending_fields(self, debug: DebugInfo, pending: Dict[str, str]) -> None:
+        if self.translation_memory:
+            await self._translate_with_memory(debug, pending)
+            return
+        
+        # Все поля переводятся одним запросом
+        try:
+            translated = await self._translate_fields_batch(pending)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка пакетного перевода: {e}")
+            return  # Оставляем оригинальный текст при ошибке
+        
+        for field_name, translated_text in translated.items():
+            setattr(debug, field_name, translated_text)
+        if translated:
+            logger.info(f"✅ Переведено одним запросом: {', '.join(translated)}")
+        
+        await self._translate_fields_one_by_one(
+            debug, {name: value for name, value in pending.items() if name not in translated}
+        )
+
+    async def _translate_fields_one_by_one(self, debug: DebugInfo, pending: Dict[str, str]) -> None:
+        """Запасной путь: поля, которые не удалось разобрать из пакетного ответа"""
+        descriptions = dict(TRANSLATABLE_FIELDS)
+        for field_name, field_value in pending.items():
+            try:
+                with span("translate_field", field=field_name, chars=len(field_value)):
+                    translated_text = await self._translate_text(field_value, descriptions.get(field_name, "текст"))
+                setattr(debug, field_name, translated_text)
+                logger.info(f"✅ Переведено поле {field_name}")
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка перевода поля {field_name}: {e}")
+                # Оставляем оригинальный текст при ошибке
+
+    async def _translate_with_memory(self, debug: DebugInfo, pending: Dict[str, str]) -> None:
+        """
+        Переводит поля по предложениям: известные берутся из памяти переводов,
+        новые переводятся одним пакетным запросом и сохраняются
+        """
+        memory = self.translation_memory
+        split_fields = {name: segment_text(value) for name, value in pending.items()}
+        all_segments = [segment for segments, _ in split_fields.values() for segment in segments]
+        
+        known = await memory.lookup(all_segments)
+        missing = [segment for segment in dict.fromkeys(all_segments) if segment not in known]
+        logger.info(
+            f"🧠 Память переводов: {len(all_segments) - len(missing)}/{len(all_segments)} "
+            f"сегментов найдено ({memory.stats()})"
+        )
+        
+        api_failed = False
+        if not missing:
+            memory.record_saved_request()
+        # Длинные отчеты переводятся несколькими пакетами, чтобы ответ не обрезался
+        for offset in range(0, len(missing), TRANSLATION_BATCH_SEGMENTS):
+            chunk = missing[offset:offset + TRANSLATION_BATCH_SEGMENTS]
+            batch = {f"s{index}": segment for index, segment in enumerate(chunk, start=1)}
+            started = time.time()
+            try:
+                translated = await self._translate_fields_batch(batch)
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка пакетного перевода: {e}")
+                api_failed = True
+                break
+            memory.record_model_latency(time.time() - started)
+            fresh = {batch[key]: value for key, value in translated.items()}
+            known.update(fresh)
+            await memory.store(fresh)
+        
+        unresolved: Dict[str, str] = {}
+        for field_name, (segments, separators) in split_fields.items():
+            if all(segment in known for segment in segments):
+                setattr(debug, field_name, join_segments([known[segment] for segment in segments], separators))
+            else:
+                unresolved[field_name] = pending[field_name]
+        
+        # При ошибке API оставляем оригинальный текст, при неразобранном ответе — переводим по полям
+        if not api_failed:
+            await self._translate_fields_one_by_one(debug, unresolved)
+
+    @traced()
+    async def _translate_fields_batch(self, fields_map: Dict[str, str]) -> Dict[str, str]:
+        """
+        Переводит несколько полей одним JSON-запросом.
+        Возвращает только успешно разобранные поля; ошибки API пробрасываются.
+        """
+        payload = json.dumps(fields_map, ensure_ascii=False, indent=2)
+        response = await self.client.chat.completions.create(
+            model="gpt-4o",
+            messages=[{
+                "role": "user",
+                "content": f"""Переведи значения полей fact-checking отчета на русский язык.
+
+ВАЖНО:
+- Сохрани всю техническую точность
+- Переведи названия компаний и источников на русский, если это общепринято
+- Сохрани специфические термины и даты
+- Используй профессиональный тон
+- Ключи JSON не переводи и не меняй
+
+Исходные поля (JSON):
+{payload}
+
+Ответь строго JSON-объектом с теми же ключами и переведенными значениями."""
+            }],
+            max_completion_tokens=min(TRANSLATION_TOKENS_PER_FIELD * len(fields_map), TRANSLATION_MAX_COMPLETION_TOKENS),
+            temperature=0.1,
+            response_format={"type": "json_object"},
+            timeout=15
+        )
+        
+        content = (response.choices[0].message.content or "").strip()
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError:
+            logger.warning(f"⚠️ Не удалось разобрать пакетный перевод: {content[:200]}")
+            return {}
+        if not isinstance(result, dict):
+            return {}
+        
+        return {
+            name: value.strip()
+            for name, value in result.items()
+            if name in fields_map and isinstance(value, str) and value.strip()
+        }
 
+    @traced()
     async def _translate_text(self, text: str, field_description: str = "текст") -> str:
         """Переводит текст на русский язык с сохранением технической точности"""
+        if self.translation_memory:
+            remembered = await self.translation_memory.lookup([text])
+            if text in remembered:
+                self.translation_memory.record_saved_request()
+                return remembered[text]
+        
         try:
+            started = time.time()
             response = await self.client.chat.completions.create(
                 model="gpt-4o",
                 messages=[{
@@ -616,7 +1458,11 @@ Verification criteria:
                 timeout=10
             )
             
-            return response.choices[0].message.content.strip()
+            translated = response.choices[0].message.content.strip()
+            if self.translation_memory:
+                self.translation_memory.record_model_latency(time.time() - started)
+                await self.translation_memory.store({text: translated})
+            return translated
             
         except Exception as e:
             logger.warning(f"⚠️ Ошибка перевода: {e}")
@@ -690,6 +1536,9 @@ Verification criteria:
 
         if not unique_sources:
             return [[]]
+        if economy_mode():
+            # Бюджет исчерпан: одна попытка на нескольких первых доменах
+            return [unique_sources[:max(1, Config.BUDGET_DOMAIN_LIMIT)]]
 
         limits: List[int] = []
         if Config.STAGE2_INITIAL_DOMAIN_LIMIT:
@@ -966,21 +1815,124 @@ Verification criteria:
                 segments.extend(self._extract_text_from_tool_output(output["content"]))
         return segments
 
+    async def _execute_responses_request(self, responses_client, request: Dict[str, Any], timeout: float) -> Any:
+        """
+        Выполняет запрос к Responses API с таймаутом.
+        По умолчанию ответ читается из потока событий; опрос статуса остается запасным вариантом.
+        В хеджированном и спекулятивном режимах запрос идет в фоне, чтобы
+        ненужную попытку можно было отменить и на стороне сервера.
+        """
+
+        background = Config.STAGE2_HEDGE_MODE == "hedged" or Config.STAGE2_SPECULATIVE_MODE == "on"
+        handle: Dict[str, Any] = {}
+        try:
+            if self.streaming_available:
+                initial_response = await asyncio.wait_for(
+                    self._stream_response(responses_client, request, background, handle), timeout=timeout
+                )
+            else:
+                create_task = responses_client.create(**request, background=True) if background \
+                    else responses_client.create(**request)
+                initial_response = await asyncio.wait_for(create_task, timeout=timeout)
+            handle["id"] = getattr(initial_response, "id", None) or handle.get("id")
+            return await self._poll_response(responses_client, initial_response, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if background and handle.get("id"):
+                self._cancel_response_later(responses_client, handle["id"])
+            raise
+
+    @traced()
+    async def _stream_response(
+        self,
+        responses_client,
+        request: Dict[str, Any],
+        background: bool,
+        handle: Dict[str, Any]
+    ) -> Any:
+        """
+        Читает поток событий Responses API и возвращает ответ в момент response.completed.
+        Если сервер вернул обычный ответ или поток оборвался до финального события,
+        возвращает ответ для дальнейшего опроса. В handle["id"] записывается id ответа для отмены.
+        """
+
+        stream_request = dict(request, stream=True)
+        if background:
+            stream_request["background"] = True
+        try:
+            stream = await responses_client.create(**stream_request)
+        except BadRequestError as err:
+            if "stream" not in str(err).lower():
+                raise
+            logger.warning("⚠️ Потоковые ответы недоступны (%s), переключаемся на опрос статуса", err)
+            self.streaming_available = False
+            stream_request.pop("stream")
+            return await responses_client.create(**stream_request)
+
+        if not hasattr(stream, "__aiter__"):
+            return stream
+
+        try:
+            async for event in stream:
+                response = getattr(event, "response", None)
+                if response is not None and getattr(response, "id", None):
+                    handle["id"] = response.id
+                event_type = getattr(event, "type", "")
+                if event_type in {"response.completed", "response.failed", "response.incomplete"}:
+                    return response
+                if event_type == "error":
+                    raise RuntimeError(f"Ошибка потока Responses API: {getattr(event, 'message', event)}")
+        except APIConnectionError:
+            if not handle.get("id"):
+                raise
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                await close()
+
+        if not handle.get("id"):
+            raise RuntimeError("Поток Responses API завершился без ответа")
+        logger.info("📶 Поток оборвался до завершения ответа %s, продолжаем опросом", handle["id"])
+        retrieve = getattr(responses_client, "retrieve", None) or responses_client.get
+        return await retrieve(handle["id"])
+
+    def _span_domains(self, sources: List[Dict[str, Any]]) -> str:
+        return ",".join(src.get("domain") or self._extract_domain(src.get("url")) or "?" for src in sources)
+
+    def _cancel_response_later(self, responses_client, response_id: str) -> None:
+        """Отменяет фоновый ответ на сервере, не блокируя отменяемую задачу."""
+
+        async def cancel() -> None:
+            try:
+                await responses_client.cancel(response_id)
+                logger.info("🛑 Ответ %s отменен на сервере", response_id)
+            except Exception as err:
+                logger.debug("Не удалось отменить ответ %s: %s", response_id, err)
+
+        task = asyncio.ensure_future(cancel())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
     async def _poll_response(self, responses_client, response: Any, timeout: float) -> Any:
         """Ожидает завершения Responses API с таймаутом."""
 
         start = time.time()
         current = response
-
-        while getattr(current, "status", "completed") in {"in_progress", "queued", "requires_action"}:
-            remaining = timeout - (time.time() - start)
-            if remaining <= 0:
-                raise asyncio.TimeoutError("Polling timed out")
-            await asyncio.sleep(min(1.5, remaining))
-            current = await responses_client.get(current.id)
+        retrieve = getattr(responses_client, "retrieve", None) or responses_client.get
+
+        with span("poll_response") as poll_span:
+            polls = 0
+            while getattr(current, "status", "completed") in {"in_progress", "queued", "requires_action"}:
+                remaining = timeout - (time.time() - start)
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("Polling timed out")
+                await asyncio.sleep(min(1.5, remaining))
+                current = await retrieve(current.id)
+                polls += 1
+                poll_span.set_attribute("polls", polls)
 
         return current
 
+    @traced()
     async def _stage1_retry_prompt(self, text: str) -> Optional[Dict[str, Any]]:
         """Повторный запрос для этапа 1 с упрощёнными требованиями."""
 
@@ -991,7 +1943,7 @@ Verification criteria:
 Строго следуй формату:
 {{
   "needs_fact_check": true/false,
-  "classification": "news/entertainment/personal/spam/other",
+  "classification": "news/science/entertainment/personal/spam/other",
   "reasoning": "...",
   "skip_reason": "...",
   "source_candidates": [
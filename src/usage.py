@@ -0,0 +1,327 @@
+"""
+Учет токенов и стоимости: расход каждой проверки по этапам, дневной журнал по
+пользователям и моделям в SQLite и дневные бюджеты с переходом на экономный режим
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from config import Config
+from metrics import OPENAI_COST, OPENAI_TOKENS, OPENAI_WEB_SEARCH_CALLS
+
+logger = logging.getLogger(__name__)
+
+# Вызовы вне размеченных этапов (например, повторная попытка из другого места)
+DEFAULT_STAGE = "other"
+
+
+@dataclass
+class StageUsage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    web_search_calls: int = 0
+    cost_usd: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def price_for(model: str) -> Optional[Tuple[float, float]]:
+    """Цена модели (вход, выход) в долларах за 1M токенов; снапшоты с датой — по префиксу"""
+    model = (model or "").lower()
+    matches = [name for name in Config.OPENAI_PRICES if model == name or model.startswith(f"{name}-")]
+    return Config.OPENAI_PRICES[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, web_search_calls: int = 0) -> float:
+    price = price_for(model)
+    cost = web_search_calls * Config.OPENAI_WEB_SEARCH_PRICE
+    if price:
+        cost += (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+    return cost
+
+
+def extract_usage(response: Any) -> Optional[Tuple[int, int, int]]:
+    """
+    (входные токены, выходные токены, вызовы веб-поиска) из ответа Chat Completions
+    или Responses API; None — в ответе нет usage (поток, фоновый запрос еще в работе)
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    if not isinstance(prompt, int):
+        # Responses API
+        prompt = getattr(usage, "input_tokens", None)
+        completion = getattr(usage, "output_tokens", None)
+    if not isinstance(prompt, int) or not isinstance(completion, int):
+        return None
+
+    web_search_calls = 0
+    for item in getattr(response, "output", None) or ():
+        item_type = item.get("type") if isinstance(item, dict) else getattr(item, "type", None)
+        if item_type == "web_search_call":
+            web_search_calls += 1
+    return prompt, completion, web_search_calls
+
+
+class CheckUsage:
+    """
+    Расход одной проверки по этапам и моделям. economy — пользователь превысил дневной
+    бюджет: пайплайн идет экономным путем (без перевода, меньше доменов, без параллельных попыток)
+    """
+
+    def __init__(self, economy: bool = False):
+        self.economy = economy
+        self.stages: Dict[Tuple[str, str], StageUsage] = {}
+        # Финальный ответ Responses API может прийти и из лимитера, и из опроса — считаем один раз
+        self._seen_responses: Set[str] = set()
+
+    def add(self, stage: str, model: str, prompt_tokens: int, completion_tokens: int, web_search_calls: int = 0) -> None:
+        entry = self.stages.setdefault((stage, model), StageUsage())
+        cost = estimate_cost(model, prompt_tokens, completion_tokens, web_search_calls)
+        entry.calls += 1
+        entry.prompt_tokens += prompt_tokens
+        entry.completion_tokens += completion_tokens
+        entry.web_search_calls += web_search_calls
+        entry.cost_usd += cost
+
+    def add_response(self, stage: str, model: str, response: Any) -> bool:
+        """Учитывает ответ OpenAI; False — usage нет или ответ уже учтен"""
+        response_id = getattr(response, "id", None)
+        if isinstance(response_id, str) and response_id in self._seen_responses:
+            return False
+        usage = extract_usage(response)
+        if usage is None:
+            return False
+        if isinstance(response_id, str):
+            self._seen_responses.add(response_id)
+        self.add(stage, model, *usage)
+        return True
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(entry.total_tokens for entry in self.stages.values())
+
+    @property
+    def cost_usd(self) -> float:
+        return sum(entry.cost_usd for entry in self.stages.values())
+
+    def by_stage(self) -> Dict[str, Dict[str, Any]]:
+        """Расход по этапам для DebugInfo"""
+        result: Dict[str, Dict[str, Any]] = {}
+        for (stage, _), entry in self.stages.items():
+            row = result.setdefault(stage, {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "web_search_calls": 0, "cost_usd": 0.0
+            })
+            row["calls"] += entry.calls
+            row["prompt_tokens"] += entry.prompt_tokens
+            row["completion_tokens"] += entry.completion_tokens
+            row["web_search_calls"] += entry.web_search_calls
+            row["cost_usd"] = round(row["cost_usd"] + entry.cost_usd, 6)
+        return result
+
+
+_current_usage: contextvars.ContextVar[Optional[CheckUsage]] = contextvars.ContextVar("usage_current_check", default=None)
+_current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("usage_current_stage", default=DEFAULT_STAGE)
+
+
+@contextmanager
+def track_check(usage: Optional[CheckUsage] = None) -> Iterator[CheckUsage]:
+    """Все вызовы OpenAI внутри блока (и в задачах, созданных из него) учитываются в usage"""
+    usage = usage or CheckUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def usage_stage(stage: str) -> Callable:
+    """Декоратор асинхронной функции: ее вызовы OpenAI относятся к этапу stage"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _current_stage.set(stage)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _current_stage.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def economy_mode() -> bool:
+    """Текущая проверка идет в экономном режиме (бюджет пользователя исчерпан)"""
+    usage = _current_usage.get()
+    return bool(usage and usage.economy)
+
+
+def record_response(model: str, response: Any) -> None:
+    """Учитывает ответ OpenAI в текущей проверке и в метриках"""
+    tokens = extract_usage(response)
+    if tokens is None:
+        return
+    usage = _current_usage.get()
+    if usage is not None and not usage.add_response(_current_stage.get(), model, response):
+        return
+    prompt, completion, web_search_calls = tokens
+    OPENAI_TOKENS.inc(prompt, model=model, type="prompt")
+    OPENAI_TOKENS.inc(completion, model=model, type="completion")
+    if web_search_calls:
+        OPENAI_WEB_SEARCH_CALLS.inc(web_search_calls)
+    OPENAI_COST.inc(estimate_cost(model, prompt, completion, web_search_calls), model=model)
+
+
+def today() -> str:
+    """Текущие сутки журнала (UTC)"""
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+class UsageLedger:
+    """
+    Дневной журнал расхода в SQLite: токены, вызовы веб-поиска и стоимость по
+    пользователю, модели и этапу. По нему проверяются дневные бюджеты пользователей.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or Config.USAGE_DB_PATH
+        self._db_lock = threading.Lock()
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Журнал могут писать бот и воркеры на одном хосте
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage (
+                day TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                calls INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                web_search_calls INTEGER NOT NULL DEFAULT 0,
+                cost_usd REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, user_id, model, stage)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage_checks (
+                day TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                checks INTEGER NOT NULL DEFAULT 0,
+                economy_checks INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, user_id)
+            )
+            """
+        )
+        conn.commit()
+        return conn
+
+    async def record(self, user_id: Any, usage: CheckUsage, day: Optional[str] = None) -> None:
+        await asyncio.to_thread(self._record, str(user_id), usage, day or today())
+
+    async def spent(self, user_id: Any, day: Optional[str] = None) -> Tuple[int, float]:
+        """(токены, доллары) пользователя за сутки"""
+        return await asyncio.to_thread(self._spent, str(user_id), day or today())
+
+    async def over_budget(self, user_id: Any) -> bool:
+        """Пользователь исчерпал дневной бюджет по токенам или деньгам"""
+        if not Config.USER_DAILY_TOKEN_BUDGET and not Config.USER_DAILY_BUDGET_USD:
+            return False
+        tokens, cost = await self.spent(user_id)
+        return bool(
+            (Config.USER_DAILY_TOKEN_BUDGET and tokens >= Config.USER_DAILY_TOKEN_BUDGET)
+            or (Config.USER_DAILY_BUDGET_USD and cost >= Config.USER_DAILY_BUDGET_USD)
+        )
+
+    def report(self, day: Optional[str] = None, group_by: str = "user_id") -> List[Dict[str, Any]]:
+        """Сводка за сутки (None — за все время) по user_id, model, stage или day"""
+        if group_by not in ("user_id", "model", "stage", "day"):
+            raise ValueError(f"Неизвестная группировка: {group_by}")
+        where, params = ("WHERE day = ?", (day,)) if day else ("", ())
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT {group_by}, SUM(calls), SUM(prompt_tokens), SUM(completion_tokens),
+                       SUM(web_search_calls), SUM(cost_usd)
+                FROM usage {where} GROUP BY {group_by} ORDER BY SUM(cost_usd) DESC
+                """,
+                params
+            ).fetchall()
+            checks = dict(self._conn.execute(
+                f"SELECT {group_by}, SUM(checks) FROM usage_checks {where} GROUP BY {group_by}", params
+            ).fetchall()) if group_by in ("user_id", "day") else {}
+        return [
+            {
+                group_by: key,
+                "checks": checks.get(key),
+                "calls": calls,
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "web_search_calls": searches,
+                "cost_usd": round(cost, 6),
+            }
+            for key, calls, prompt, completion, searches, cost in rows
+        ]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _record(self, user_id: str, usage: CheckUsage, day: str) -> None:
+        with self._db_lock:
+            for (stage, model), entry in usage.stages.items():
+                self._conn.execute(
+                    """
+                    INSERT INTO usage (day, user_id, model, stage, calls, prompt_tokens, completion_tokens,
+                                       web_search_calls, cost_usd)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (day, user_id, model, stage) DO UPDATE SET
+                        calls = calls + excluded.calls,
+                        prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                        completion_tokens = completion_tokens + excluded.completion_tokens,
+                        web_search_calls = web_search_calls + excluded.web_search_calls,
+                        cost_usd = cost_usd + excluded.cost_usd
+                    """,
+                    (day, user_id, model, stage, entry.calls, entry.prompt_tokens, entry.completion_tokens,
+                     entry.web_search_calls, entry.cost_usd)
+                )
+            self._conn.execute(
+                """
+                INSERT INTO usage_checks (day, user_id, checks, economy_checks) VALUES (?, ?, 1, ?)
+                ON CONFLICT (day, user_id) DO UPDATE SET
+                    checks = checks + 1, economy_checks = economy_checks + excluded.economy_checks
+                """,
+                (day, user_id, int(usage.economy))
+            )
+            self._conn.commit()
+
+    def _spent(self, user_id: str, day: str) -> Tuple[int, float]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT SUM(prompt_tokens + completion_tokens), SUM(cost_usd) FROM usage WHERE day = ? AND user_id = ?",
+                (day, user_id)
+            ).fetchone()
+        return int(row[0] or 0), float(row[1] or 0.0)
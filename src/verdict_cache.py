@@ -0,0 +1,213 @@
+"""
+Двухуровневый кэш вердиктов фактчекинга: LRU в памяти + SQLite на диске
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+from near_duplicate import NearDuplicateIndex
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Приводит текст к каноническому виду для построения ключа кэша"""
+    normalized = (text or "").casefold().replace("ё", "е")
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+def text_key(text: str) -> str:
+    """Возвращает хэш нормализованного текста"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """Кэш готовых вердиктов с TTL, зависящим от классификации этапа 1"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        memory_size: Optional[int] = None,
+        ttls: Optional[Dict[str, int]] = None,
+        near_duplicates: Optional[bool] = None
+    ):
+        self.db_path = db_path or Config.VERDICT_CACHE_PATH
+        self.memory_size = memory_size if memory_size is not None else Config.VERDICT_CACHE_MEMORY_SIZE
+        self.ttls = dict(ttls or Config.VERDICT_CACHE_TTLS)
+        # key -> (expires_at, payload)
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._db_lock = threading.Lock()
+        self._conn = self._connect()
+        use_near_duplicates = Config.NEAR_DUP_ENABLED if near_duplicates is None else near_duplicates
+        self.near_duplicates = NearDuplicateIndex(self.db_path) if use_near_duplicates else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.hits_near = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                classification TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_expires ON verdicts (expires_at)")
+        conn.commit()
+        return conn
+
+    def ttl_for(self, classification: Optional[str]) -> int:
+        """TTL в секундах для классификации этапа 1"""
+        name = (classification or "other").lower()
+        return self.ttls.get(name, self.ttls.get("other", 3600))
+
+    async def get(self, text: str) -> Optional[Dict[str, Any]]:
+        """Ищет вердикт по точному ключу, затем среди почти-дубликатов"""
+        payload = await self.get_by_key(text_key(text), count_miss=False)
+        if payload is not None:
+            return payload
+
+        if self.near_duplicates is not None:
+            match = self.near_duplicates.find(text)
+            if match is not None:
+                key, distance = match
+                payload = await self.get_by_key(key, count_miss=False)
+                if payload is not None:
+                    self.hits_near += 1
+                    logger.info("🧬 Найден почти-дубликат (расстояние %s)", distance)
+                    return payload
+                # Вердикт истек — отпечаток больше не нужен
+                if self.near_duplicates.remove(key):
+                    await asyncio.to_thread(self.near_duplicates.delete, key)
+
+        self.misses += 1
+        return None
+
+    async def get_by_key(self, key: str, count_miss: bool = True) -> Optional[Dict[str, Any]]:
+        """Ищет вердикт по готовому ключу"""
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return payload
+            del self._memory[key]
+
+        row = await asyncio.to_thread(self._select, key, now)
+        if row is None:
+            if count_miss:
+                self.misses += 1
+            return None
+
+        expires_at, payload = row
+        self._remember(key, expires_at, payload)
+        self.hits_disk += 1
+        return payload
+
+    async def put(self, text: str, payload: Dict[str, Any], classification: Optional[str]) -> str:
+        """Сохраняет вердикт в оба уровня и возвращает ключ"""
+        key = await self.put_by_key(text_key(text), payload, classification)
+        if self.near_duplicates is not None:
+            fingerprint = self.near_duplicates.add(key, text)
+            if fingerprint is not None:
+                await asyncio.to_thread(self.near_duplicates.persist, key, *fingerprint)
+        return key
+
+    async def put_by_key(self, key: str, payload: Dict[str, Any], classification: Optional[str]) -> str:
+        """Сохраняет запись по готовому ключу, без отпечатка для почти-дубликатов"""
+        now = time.time()
+        expires_at = now + self.ttl_for(classification)
+        self._remember(key, expires_at, payload)
+        expired = await asyncio.to_thread(
+            self._upsert, key, payload, (classification or "other").lower(), now, expires_at
+        )
+        if self.near_duplicates is not None:
+            for expired_key in expired:
+                self.near_duplicates.remove(expired_key)
+        return key
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и промахов"""
+        hits = self.hits_memory + self.hits_disk
+        total = hits + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "hits_near": self.hits_near,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "memory_entries": len(self._memory),
+            "fingerprints": len(self.near_duplicates) if self.near_duplicates is not None else 0,
+        }
+
+    def _remember(self, key: str, expires_at: float, payload: Dict[str, Any]) -> None:
+        if self.memory_size <= 0:
+            return
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _select(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM verdicts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload_text, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        try:
+            return expires_at, json.loads(payload_text)
+        except json.JSONDecodeError:
+            logger.warning("⚠️ Поврежденная запись кэша вердиктов %s", key[:12])
+            return None
+
+    def _upsert(self, key: str, payload: Dict[str, Any], classification: str,
+                created_at: float, expires_at: float) -> List[str]:
+        """Сохраняет вердикт и удаляет истекшие вместе с их отпечатками; возвращает их ключи"""
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, payload, classification, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(payload, ensure_ascii=False), classification, created_at, expires_at)
+            )
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT key FROM verdicts WHERE expires_at <= ?", (created_at,)
+            )]
+            if expired and self.near_duplicates is not None:
+                self._conn.execute(
+                    "DELETE FROM fingerprints WHERE key IN "
+                    "(SELECT key FROM verdicts WHERE expires_at <= ?)", (created_at,)
+                )
+            self._conn.execute("DELETE FROM verdicts WHERE expires_at <= ?", (created_at,))
+            self._conn.commit()
+        return expired
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Тест бенчмарка точности: разметка корпуса, оценка вердиктов и прогон конфигураций на фейковом API
+"""
+
+import asyncio
+import logging
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Добавляем src и benchmarks в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+
+from accuracy import load_corpus, parse_config, regressions, run_config, score_case
+from config import Config
+from fake_openai import FakeOpenAIConfig, FakeOpenAIServer, Latency
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LabeledFakeOpenAI(FakeOpenAIServer):
+    """Опровергает утверждения про 2010 год, остальное подтверждает"""
+
+    def _verdict(self, prompt):
+        verdict = super()._verdict(prompt)
+        if "2010" in prompt:
+            verdict.update(verification_status="contradictory", confidence_score=90)
+        return verdict
+
+
+async def test_corpus_labels():
+    """Корпус размечен: уникальные id, известные категории и статусы"""
+    logger.info("🏷️ Тестируем разметку корпуса...")
+
+    cases = load_corpus()
+    assert len(cases) >= 12
+    categories = {category for case in cases for category in
+                  (case["expected_category"] if isinstance(case["expected_category"], list) else [case["expected_category"]])}
+    assert {"news", "spam", "other"} <= categories
+    assert any(case["expected_status"] and "contradictory" in case["expected_status"] for case in cases)
+    logger.info(f"✅ В корпусе {len(cases)} случаев")
+
+
+async def test_scoring():
+    """Категории сводятся к одной схеме, статус и доверие проверяются полосой"""
+    logger.info("🎯 Тестируем оценку вердиктов...")
+
+    case = {"id": "c", "text": "t", "expected_category": "news",
+            "expected_status": ["confirmed", "partially_confirmed"], "min_confidence": 60}
+    assert score_case(case, "новости", SimpleNamespace(verification_status="confirmed", confidence_score=80))["ok"]
+    low = score_case(case, "news", SimpleNamespace(verification_status="confirmed", confidence_score=40))
+    assert low["category_ok"] and not low["status_ok"]
+    spam = {"id": "s", "text": "t", "expected_category": "spam", "expected_status": None}
+    assert score_case(spam, "скрыто", None)["ok"]
+    assert not score_case(spam, "news", None)["ok"]
+
+    assert parse_config("fast")["overrides"]["STAGE2_INITIAL_DOMAIN_LIMIT"] == "5"
+    custom = parse_config("tight:stage2_initial_domain_limit=4,TRANSLATE_TO_RUSSIAN=false")
+    assert custom == {"name": "tight", "overrides": {"STAGE2_INITIAL_DOMAIN_LIMIT": "4", "TRANSLATE_TO_RUSSIAN": "false"}}
+    assert regressions([{"config": "a", "accuracy": 0.9}, {"config": "b", "accuracy": 0.8},
+                        {"config": "c", "accuracy": 0.87}], 0.05) == ["b"]
+    logger.info("✅ Вердикты оцениваются по разметке")
+
+
+async def test_configs_on_fake_api():
+    """Конфигурации прогоняются на одном корпусе, Config после прогона восстанавливается"""
+    logger.info("📋 Тестируем прогон конфигураций...")
+
+    cases = [case for case in load_corpus() if case["id"] in {"iphone_2007", "iphone_2010_false", "spam_iphone"}]
+    server = LabeledFakeOpenAI(FakeOpenAIConfig(chat_latency=Latency(0.01, 0), responses_latency=Latency(0.02, 0)))
+    await server.start()
+    translate, domains = Config.TRANSLATE_TO_RUSSIAN, Config.STAGE2_INITIAL_DOMAIN_LIMIT
+    try:
+        with patch.object(Config, 'OPENAI_BASE_URL', server.base_url), \
+                patch.object(Config, 'OPENAI_API_KEY', 'sk-fake'), \
+                patch.object(Config, 'PIPELINE_MODE', 'two_stage'):
+            baseline = await run_config(parse_config("baseline"), cases)
+            lean = await run_config(parse_config("lean:TRANSLATE_TO_RUSSIAN=false,STAGE2_INITIAL_DOMAIN_LIMIT=2"), cases)
+    finally:
+        await server.stop()
+
+    assert (Config.TRANSLATE_TO_RUSSIAN, Config.STAGE2_INITIAL_DOMAIN_LIMIT) == (translate, domains)
+    results = {result["id"]: result for result in baseline["results"]}
+    assert results["iphone_2007"]["ok"] and results["iphone_2010_false"]["ok"]
+    assert not results["spam_iphone"]["ok"], "фейковый API не распознает спам"
+    assert baseline["accuracy"] == lean["accuracy"] == round(2 / 3, 3)
+    assert lean["cost_per_check_usd"] < baseline["cost_per_check_usd"], "без перевода дешевле"
+    assert baseline["errors"] == 0 and baseline["p50_s"] <= baseline["p95_s"]
+    logger.info("✅ Конфигурации сравниваются по точности, задержке и стоимости")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты бенчмарка точности...")
+
+    tests = [
+        test_corpus_labels,
+        test_scoring,
+        test_configs_on_fake_api
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты бенчмарка точности прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Тест очереди допуска проверок
+"""
+
+import asyncio
+import logging
+import sys
+import os
+from unittest.mock import patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+os.environ.setdefault('JOB_QUEUE_ENABLED', 'false')
+# Без пауз исходящей очереди Telegram между вызовами MockBot
+os.environ.setdefault('TELEGRAM_CHAT_INTERVAL', '0')
+
+from admission import AdmissionController, AdmissionRejected
+from command_handler import CommandHandler
+from two_stage_filter import DebugInfo
+from test_translation_formatting import MockBot, MockMessage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def test_limits_and_fair_order():
+    """Глобальный и пользовательский лимиты, обслуживание пользователей по кругу"""
+    logger.info("🚦 Тестируем лимиты допуска...")
+
+    controller = AdmissionController(max_queue=10, max_in_flight=2, user_concurrency=1, user_rate=10, user_rate_window=60)
+
+    # Пользователь A прислал 3 сообщения подряд, потом B и C по одному
+    a1, a2, a3 = controller.submit("A"), controller.submit("A"), controller.submit("A")
+    b1 = controller.submit("B")
+    c1 = controller.submit("C")
+
+    assert a1.admitted.done() and b1.admitted.done()
+    assert controller.in_flight == 2 and controller.queued == 3
+    # A не может занять второе место, C идет раньше остальных запросов A
+    assert [c1.position(), a2.position(), a3.position()] == [1, 2, 3]
+
+    a1.release()
+    assert c1.admitted.done() and not a2.admitted.done()
+    b1.release()
+    assert a2.admitted.done()
+
+    # Отмена ожидания освобождает место в очереди
+    waiter = asyncio.create_task(a3.wait(refresh=0.01))
+    await asyncio.sleep(0.02)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert controller.queued == 0
+    c1.release()
+    a2.release()
+    assert controller.in_flight == 0
+    logger.info("✅ Лимиты и очередность соблюдаются")
+
+
+async def test_rejections():
+    """Перегрузка и превышение частоты отклоняются сразу"""
+    logger.info("⛔ Тестируем отказы...")
+
+    controller = AdmissionController(max_queue=1, max_in_flight=1, user_concurrency=1, user_rate=2, user_rate_window=60)
+    first = controller.submit("A")
+    controller.submit("B")  # в очереди
+
+    try:
+        controller.submit("C")
+        assert False, "ожидался отказ по длине очереди"
+    except AdmissionRejected as e:
+        assert "перегружен" in str(e)
+
+    first.release()
+    controller.submit("A")
+    try:
+        controller.submit("A")
+        assert False, "ожидался отказ по частоте"
+    except AdmissionRejected as e:
+        assert "Слишком много запросов" in str(e)
+    assert controller.rejected == 2
+    logger.info("✅ Отказы понятны пользователю")
+
+
+async def test_handler_shows_queue_position():
+    """Пока проверка в очереди, в сообщении видна позиция"""
+    logger.info("🕒 Тестируем позицию в очереди...")
+
+    handler = CommandHandler()
+    controller = AdmissionController(max_queue=5, max_in_flight=1, user_concurrency=1, user_rate=10, user_rate_window=60)
+    blocker = controller.submit("other")
+    ticket = controller.submit("tester")
+    bot = MockBot()
+
+    async def pipeline(text, channel_name):
+        return "новости", "Достоверно", DebugInfo(confidence_score=95)
+
+    with patch.object(handler.two_stage_filter, '_analyze_uncached', side_effect=pipeline):
+        task = asyncio.create_task(handler.handle_fact_check(bot, MockMessage("Discord объявил новую функцию"), ticket))
+        await asyncio.sleep(0.05)
+        assert "вы следующий" in bot.messages[0]["text"]
+        assert not task.done()
+
+        blocker.release()
+        await asyncio.wait_for(task, timeout=5)
+
+    assert "95%" in bot.messages[-1]["text"]
+    assert controller.in_flight == 0 and controller.queued == 0
+    logger.info("✅ Позиция в очереди показывается, место освобождается")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты очереди допуска...")
+
+    tests = [
+        test_limits_and_fair_order,
+        test_rejections,
+        test_handler_shows_queue_position
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты очереди допуска прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Тест режима frontend: бот отдает проверки воркерам через брокер
+"""
+
+import asyncio
+import logging
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+os.environ.setdefault('JOB_QUEUE_ENABLED', 'false')
+# Без пауз исходящей очереди Telegram между вызовами MockBot
+os.environ.setdefault('TELEGRAM_CHAT_INTERVAL', '0')
+
+from broker import ACCEPTED, PROGRESS, RESULT, SQLiteBroker
+from check_worker import FactCheckWorker
+from command_handler import CommandHandler
+from two_stage_filter import DebugInfo
+from test_translation_formatting import MockBot, MockMessage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEXT = "Discord объявил новую функцию модерации"
+
+
+async def verdict(text, channel_name, usage=None):
+    return "новости", "Достоверно", DebugInfo(confidence_score=95)
+
+
+def make_frontend(tmp: str, lease: float = 5, queue_timeout: float = 5, max_attempts: int = 3) -> CommandHandler:
+    with patch('command_handler.Config.BOT_MODE', 'frontend'), \
+            patch('command_handler.Config.JOB_QUEUE_ENABLED', True), \
+            patch('command_handler.Config.JOB_QUEUE_PATH', os.path.join(tmp, "jobs.sqlite3")), \
+            patch('command_handler.Config.JOB_MAX_ATTEMPTS', max_attempts), \
+            patch('command_handler.Config.BROKER_URL', os.path.join(tmp, "broker.sqlite3")), \
+            patch('command_handler.Config.BROKER_POLL_INTERVAL', 0.01), \
+            patch('command_handler.Config.WORKER_LEASE_SECONDS', lease), \
+            patch('command_handler.Config.WORKER_QUEUE_TIMEOUT', queue_timeout):
+        return CommandHandler()
+
+
+def make_worker(tmp: str) -> FactCheckWorker:
+    # Отдельное подключение к файлу брокера — как из другого процесса
+    broker = SQLiteBroker(os.path.join(tmp, "broker.sqlite3"), poll_interval=0.01)
+    return FactCheckWorker(broker, CommandHandler(worker=True), concurrency=2)
+
+
+async def test_sqlite_broker_hands_out_each_job_once():
+    """Каждую задачу получает один воркер, сообщения приходят в порядке отправки"""
+    logger.info("📮 Тестируем брокер SQLite...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "broker.sqlite3")
+        frontend, worker_a, worker_b = (SQLiteBroker(path, poll_interval=0.01) for _ in range(3))
+        for job_id in (1, 2):
+            await frontend.put_job({"id": job_id, "text": TEXT, "user_name": "Пользователь test"})
+
+        jobs = await asyncio.gather(worker_a.get_job(timeout=1), worker_b.get_job(timeout=1))
+        assert sorted(job["id"] for job in jobs) == [1, 2]
+        assert await worker_a.get_job(timeout=0.05) is None
+
+        await worker_a.put_update(1, ACCEPTED)
+        await worker_a.put_update(1, PROGRESS, "шаг")
+        await worker_a.put_update(1, RESULT, "ответ")
+        assert await frontend.get_updates(timeout=1) == [(1, ACCEPTED, ""), (1, PROGRESS, "шаг"), (1, RESULT, "ответ")]
+        assert await frontend.get_updates(timeout=0.05) == []
+        for broker in (frontend, worker_a, worker_b):
+            await broker.close()
+    logger.info("✅ Брокер раздает задачи без повторов")
+
+
+async def test_worker_answers_through_frontend():
+    """Бот показывает прогресс и ответ воркера в своем сообщении"""
+    logger.info("🛰️ Тестируем проверку воркером...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frontend = make_frontend(tmp)
+        worker = make_worker(tmp)
+        bot = MockBot()
+        # Фронтенд сам не проверяет: ни пайплайна, ни клиента OpenAI, ни кэшей
+        assert frontend.two_stage_filter is None and frontend.usage_ledger is None
+        with patch.object(worker.handler.two_stage_filter, 'analyze_message', side_effect=verdict):
+            worker_task = asyncio.create_task(worker.run())
+            message = MockMessage(TEXT)
+            message.from_user.id = 111
+            await frontend.handle_fact_check(bot, message)
+            worker.stop()
+            await worker_task
+
+        assert len([m for m in bot.messages if "edited" not in m]) == 1
+        assert "95%" in bot.messages[-1]["text"] and bot.messages[-1]["message_id"] == 1
+        assert await frontend.jobs.unfinished() == []
+        await frontend.remote.close()
+        await worker.broker.close()
+    logger.info("✅ Ответ воркера доставлен")
+
+
+async def test_lost_worker_job_is_redelivered():
+    """Задача замолчавшего воркера отдается другому воркеру"""
+    logger.info("💀 Тестируем потерю воркера...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frontend = make_frontend(tmp, lease=0.3)
+        dead = SQLiteBroker(os.path.join(tmp, "broker.sqlite3"), poll_interval=0.01)
+        worker = make_worker(tmp)
+        bot = MockBot()
+
+        async def die_after_accepting():
+            # Воркер взял задачу и упал, не ответив
+            job = await dead.get_job(timeout=5)
+            await dead.put_update(job["id"], ACCEPTED)
+            # Живой воркер появляется только после этого
+            return asyncio.create_task(worker.run())
+
+        with patch.object(worker.handler.two_stage_filter, 'analyze_message', side_effect=verdict):
+            dying = asyncio.create_task(die_after_accepting())
+            message = MockMessage(TEXT)
+            message.from_user.id = 111
+            await frontend.handle_fact_check(bot, message)
+            worker.stop()
+            await (await dying)
+
+        assert "95%" in bot.messages[-1]["text"]
+        attempts = frontend.jobs._conn.execute("SELECT attempts FROM jobs").fetchone()[0]
+        assert attempts == 2, attempts
+        await frontend.remote.close()
+        for broker in (dead, worker.broker):
+            await broker.close()
+    logger.info("✅ Задача отдана другому воркеру")
+
+
+async def test_no_workers_reports_error():
+    """Если задачу никто не взял, пользователь получает ошибку, а не вечное ожидание"""
+    logger.info("🚫 Тестируем отсутствие воркеров...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frontend = make_frontend(tmp, queue_timeout=0.2)
+        bot = MockBot()
+        message = MockMessage(TEXT)
+        message.from_user.id = 111
+        await frontend.handle_fact_check(bot, message)
+
+        assert "нет свободных воркеров" in bot.messages[-1]["text"]
+        assert await frontend.jobs.unfinished() == []
+
+        # Поздний воркер не тратит запросы на задачу, по которой бот уже ответил
+        worker = make_worker(tmp)
+        with patch('check_worker.Config.WORKER_QUEUE_TIMEOUT', 0.1), \
+                patch.object(worker.handler, 'run_check') as mock_check:
+            job = await worker.broker.get_job(timeout=1)
+            await worker._process(job)
+            assert mock_check.call_count == 0
+        await frontend.remote.close()
+        await worker.broker.close()
+    logger.info("✅ Пользователь узнал, что воркеров нет")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты режима frontend...")
+
+    tests = [
+        test_sqlite_broker_hands_out_each_job_once,
+        test_worker_answers_through_frontend,
+        test_lost_worker_job_is_redelivered,
+        test_no_workers_reports_error
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты режима frontend прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
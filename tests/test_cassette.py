@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Тест кассеты OpenAI: запись обменов на фейковом API и воспроизведение без сети
+"""
+
+import asyncio
+import logging
+import sys
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+# Добавляем src и benchmarks в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+
+from cassette import CassetteMiss, CassetteOpenAI, request_key
+from fake_openai import FakeOpenAIConfig, FakeOpenAIServer, Latency
+from two_stage_filter import TwoStageFilter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CLAIM = "Центробанк повысил ключевую ставку до 21% на заседании в пятницу"
+
+
+def make_filter(base_url: str, mode: str, path: str, streaming: bool = True, time_scale: float = 0) -> TwoStageFilter:
+    with patch('two_stage_filter.Config.OPENAI_BASE_URL', base_url), \
+            patch('two_stage_filter.Config.OPENAI_API_KEY', '' if mode == 'replay' else 'sk-fake'), \
+            patch('cassette.Config.OPENAI_CASSETTE_MODE', mode), \
+            patch('two_stage_filter.Config.OPENAI_CASSETTE_MODE', mode), \
+            patch('cassette.Config.OPENAI_CASSETTE_PATH', path), \
+            patch('cassette.Config.OPENAI_CASSETTE_TIME_SCALE', time_scale):
+        filter_system = TwoStageFilter()
+    filter_system.streaming_available = streaming
+    return filter_system
+
+
+def cassette_of(filter_system: TwoStageFilter):
+    client = filter_system.client._client
+    assert isinstance(client, CassetteOpenAI)
+    return client.cassette
+
+
+async def record_check(path: str, streaming: bool, hedge: str = "off", latency: float = 0.05):
+    server = FakeOpenAIServer(FakeOpenAIConfig(
+        chat_latency=Latency(latency, 0), responses_latency=Latency(latency * 4, 0), seed=3
+    ))
+    await server.start()
+    try:
+        filter_system = make_filter(server.base_url, "record", path, streaming)
+        with patch('two_stage_filter.Config.PIPELINE_MODE', 'two_stage'), \
+                patch('two_stage_filter.Config.STAGE2_HEDGE_MODE', hedge):
+            result = await filter_system.analyze_message(CLAIM, "Test")
+    finally:
+        await server.stop()
+    return result, server, cassette_of(filter_system)
+
+
+async def replay_check(path: str, streaming: bool, hedge: str = "off", time_scale: float = 0):
+    # Адрес, на котором никто не слушает: любой вызов мимо кассеты упадет
+    filter_system = make_filter("http://127.0.0.1:9/v1", "replay", path, streaming, time_scale)
+    with patch('two_stage_filter.Config.PIPELINE_MODE', 'two_stage'), \
+            patch('two_stage_filter.Config.STAGE2_HEDGE_MODE', hedge):
+        started = time.monotonic()
+        result = await filter_system.analyze_message(CLAIM, "Test")
+    return result, time.monotonic() - started, cassette_of(filter_system)
+
+
+async def test_record_and_replay_stream():
+    """Поток этапа 2, этап 1 и перевод записываются и воспроизводятся без сети"""
+    logger.info("📼 Тестируем запись и воспроизведение потока...")
+
+    path = os.path.join(tempfile.mkdtemp(), "openai.jsonl")
+    (category, comment, debug), server, recorded = await record_check(path, streaming=True)
+    assert category == "news" and not debug.fallback_used
+    assert recorded.recorded == sum(server.stats()["requests"].values())
+
+    (replayed_category, replayed_comment, replayed), _, cassette = await replay_check(path, streaming=True)
+    assert (replayed_category, replayed_comment) == (category, comment)
+    assert replayed.verification_status == debug.verification_status == "confirmed"
+    assert replayed.confidence_score == debug.confidence_score and not replayed.fallback_used
+    assert replayed.token_usage == debug.token_usage, "usage восстанавливается из записи"
+    assert cassette.misses == 0 and cassette.hits == recorded.recorded
+    logger.info("✅ Поток воспроизводится из кассеты")
+
+
+async def test_background_poll_replay():
+    """Фоновый ответ: опрос retrieve воспроизводится по порядку записей"""
+    logger.info("⏳ Тестируем воспроизведение опроса...")
+
+    path = os.path.join(tempfile.mkdtemp(), "openai.jsonl")
+    (category, _, debug), server, _ = await record_check(path, streaming=False, hedge="hedged", latency=0.1)
+    assert server.stats()["requests"].get("responses.retrieve", 0) >= 1
+
+    (replayed_category, _, replayed), _, cassette = await replay_check(path, streaming=False, hedge="hedged")
+    assert replayed_category == category and replayed.verification_status == "confirmed"
+    assert cassette.misses == 0
+    logger.info("✅ Опрос воспроизводится")
+
+
+async def test_timing_scale():
+    """time_scale=1 сохраняет записанные задержки, 0 — воспроизводит мгновенно"""
+    logger.info("⏱️ Тестируем масштаб задержек...")
+
+    path = os.path.join(tempfile.mkdtemp(), "openai.jsonl")
+    await record_check(path, streaming=True, latency=0.1)
+
+    _, instant, _ = await replay_check(path, streaming=True, time_scale=0)
+    _, realistic, _ = await replay_check(path, streaming=True, time_scale=1)
+    # Записано: этап 1 (0.1с), этап 2 (0.4с), перевод (0.1с)
+    assert realistic >= 0.55, f"задержки сохранены: {realistic:.2f}с"
+    assert instant < realistic / 2
+    logger.info(f"✅ Воспроизведение {instant:.2f}с мгновенно и {realistic:.2f}с с задержками")
+
+
+async def test_modes_and_keys():
+    """Ключ зависит от содержимого запроса; replay без записи — ошибка, passthrough — в API"""
+    logger.info("🔑 Тестируем ключи и режимы...")
+
+    assert request_key("chat.completions.create", (), {"model": "gpt-4o", "timeout": 5}) == \
+        request_key("chat.completions.create", (), {"model": "gpt-4o", "timeout": 15})
+    assert request_key("chat.completions.create", (), {"model": "gpt-4o"}) != \
+        request_key("chat.completions.create", (), {"model": "gpt-4o-mini"})
+
+    path = os.path.join(tempfile.mkdtemp(), "empty.jsonl")
+    filter_system = make_filter("http://127.0.0.1:9/v1", "replay", path)
+    try:
+        await filter_system.client.chat.completions.create(
+            model="gpt-4o", messages=[{"role": "user", "content": "нет в кассете"}]
+        )
+        raise AssertionError("ожидалась CassetteMiss")
+    except CassetteMiss:
+        pass
+
+    server = FakeOpenAIServer(FakeOpenAIConfig(chat_latency=Latency(0, 0)))
+    await server.start()
+    try:
+        filter_system = make_filter(server.base_url, "passthrough", path)
+        response = await filter_system.client.chat.completions.create(
+            model="gpt-4o", messages=[{"role": "user", "content": "Это спам/реклама/мусор? Ответь одним словом"}]
+        )
+    finally:
+        await server.stop()
+    assert response.choices[0].message.content == "нет"
+    assert cassette_of(filter_system).recorded == 0 and not os.path.exists(path)
+    logger.info("✅ Режимы кассеты работают")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты кассеты OpenAI...")
+
+    tests = [
+        test_record_and_replay_stream,
+        test_background_poll_replay,
+        test_timing_scale,
+        test_modes_and_keys
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты кассеты OpenAI прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Тест проверки длинных сообщений по отдельным утверждениям
+"""
+
+import asyncio
+import logging
+import sys
+import os
+import tempfile
+import time
+from unittest.mock import AsyncMock, patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+
+from claims import aggregate_claims, parse_claims
+from pipeline_events import ClaimVerified, ClaimsExtracted
+from two_stage_filter import TwoStageFilter
+from verdict_cache import VerdictCache
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GIBSON_TEXT = """«Отец Киберпанка» Уилльям Гибсон признался, что именно Виктор Цой оказал самое сильное влияние на его творчество.
+
+Гибсон, автор культового «Нейроманта», отметил, что музыка Цоя стала для него главным источником вдохновения.
+
+Об этом он написал у себя в твиттере (X) в верифтцированном аккаунте"""
+
+STAGE1_SOURCES = [{"domain": d, "url": f"https://{d}"} for d in ("x.com", "wikipedia.org", "theguardian.com", "meduza.io")]
+STAGE1_ANALYSIS = {"classification": "entertainment", "requires_fact_check": True, "reasoning": "Цитата знаменитости"}
+
+CLAIMS = [
+    {"claim": "Уильям Гибсон — автор романа «Нейромант»", "domains": ["wikipedia.org"], "search_query": "Gibson Neuromancer"},
+    {"claim": "Уильям Гибсон назвал Виктора Цоя главным влиянием на свое творчество", "domains": ["x.com", "meduza.io"], "search_query": ""},
+    {"claim": "Гибсон написал об этом в своем аккаунте X", "domains": ["x.com"], "search_query": "Gibson Tsoi tweet"},
+]
+
+VERDICTS = {
+    CLAIMS[0]["claim"]: {"verification_status": "confirmed", "confidence_score": 98, "category": "entertainment",
+                         "detailed_findings": "Neuromancer (1984) is Gibson's debut novel"},
+    CLAIMS[1]["claim"]: {"verification_status": "contradictory", "confidence_score": 85, "category": "entertainment",
+                         "contradictions": "No such statement; Gibson has not mentioned Tsoi"},
+    CLAIMS[2]["claim"]: {"verification_status": "unconfirmed", "confidence_score": 10, "category": "entertainment",
+                         "missing_evidence": "No tweet found"},
+}
+
+
+def claim_patches():
+    return (
+        patch('two_stage_filter.Config.CLAIM_DECOMPOSITION_ENABLED', True),
+        patch('two_stage_filter.Config.DEBUG_MODE', True),
+        patch('two_stage_filter.Config.TRANSLATE_TO_RUSSIAN', False),
+    )
+
+
+async def test_aggregate_claims():
+    """Итог не лучше худшего утверждения, непроверенные утверждения не учитываются"""
+    logger.info("🧮 Тестируем сведение вердиктов...")
+
+    confirmed = {"verification_status": "confirmed", "confidence_score": 95, "category": "news", "detailed_findings": "A"}
+    weaker = {"verification_status": "confirmed", "confidence_score": 90, "category": "news", "detailed_findings": "B"}
+    unconfirmed = {"verification_status": "unconfirmed", "confidence_score": 20, "category": "news", "missing_evidence": "C"}
+    contradictory = {"verification_status": "contradictory", "confidence_score": 15, "category": "news", "contradictions": "D"}
+    failed = {"verification_status": "failed", "error": "таймаут"}
+
+    result = aggregate_claims([confirmed, weaker])
+    assert (result["verification_status"], result["confidence_score"]) == ("confirmed", 90)
+    assert result["detailed_findings"] == "(1) A (2) B"
+
+    result = aggregate_claims([confirmed, failed, unconfirmed])
+    assert (result["verification_status"], result["confidence_score"]) == ("partially_confirmed", 58)
+    assert result["missing_evidence"] == "(3) C"
+
+    result = aggregate_claims([confirmed, contradictory, unconfirmed])
+    assert (result["verification_status"], result["confidence_score"]) == ("contradictory", 15)
+    assert aggregate_claims([failed]) is None
+    logger.info("✅ Вердикты сводятся корректно")
+
+
+async def test_parse_claims():
+    """Ответ декомпозитора чистится: повторы, чужие домены и лишние утверждения отбрасываются"""
+    logger.info("🧹 Тестируем разбор ответа декомпозитора...")
+
+    payload = {"claims": [
+        {"claim": "Курс доллара вырос", "domains": ["cbr.ru", "evil.example"]},
+        {"claim": "курс  доллара вырос", "domains": ["cbr.ru"]},
+        {"claim": "", "domains": []},
+        "не объект",
+        {"claim": "Нефть подешевела", "domains": "cbr.ru", "search_query": " brent "},
+        {"claim": "Золото подорожало"},
+    ]}
+    claims = parse_claims(payload, ["cbr.ru", "rbc.ru"], max_claims=2)
+    assert [c["claim"] for c in claims] == ["Курс доллара вырос", "Нефть подешевела"]
+    assert claims[0]["domains"] == ["cbr.ru"] and claims[1]["domains"] == []
+    assert claims[1]["search_query"] == "brent"
+    assert parse_claims({"claims": "нет"}, [], 5) == []
+    logger.info("✅ Ответ декомпозитора разбирается корректно")
+
+
+async def test_claims_verified_in_parallel_and_cached():
+    """Утверждения проверяются параллельно по своим доменам, повторное утверждение берется из кэша"""
+    logger.info("🧩 Тестируем проверку по утверждениям...")
+
+    async def fake_verdict(claim, sources, timeout, analysis, debug):
+        await asyncio.sleep(0.2)
+        return {**VERDICTS[claim], "sources_checked": [src["domain"] for src in sources]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filter_system = TwoStageFilter()
+        filter_system.verdict_cache = VerdictCache(db_path=os.path.join(tmp, "cache.sqlite3"))
+        enabled, debug_mode, translate = claim_patches()
+        with enabled, debug_mode, translate, \
+                patch.object(filter_system, '_stage1_select_sources', new_callable=AsyncMock) as mock_stage1, \
+                patch.object(filter_system, '_decompose_claims', new_callable=AsyncMock) as mock_decompose, \
+                patch.object(filter_system, '_request_stage2_verdict', side_effect=fake_verdict) as mock_verdict:
+            mock_stage1.return_value = (STAGE1_SOURCES, STAGE1_ANALYSIS)
+            mock_decompose.return_value = CLAIMS
+
+            started = time.perf_counter()
+            events = [event async for event in filter_system.analyze_message_events(GIBSON_TEXT, "Test")]
+            elapsed = time.perf_counter() - started
+
+            category, comment, debug = events[-1].category, events[-1].comment, events[-1].debug
+            assert elapsed < 0.5, elapsed
+            assert mock_verdict.call_count == 3
+            domains_by_claim = {call.args[0]: [src["domain"] for src in call.args[1]] for call in mock_verdict.call_args_list}
+            assert domains_by_claim[CLAIMS[1]["claim"]] == ["x.com", "meduza.io"]
+
+            assert category == "entertainment" and comment.startswith("Противоречит источникам")
+            assert debug.pipeline_mode == "claims" and debug.confidence_score == 15
+            assert [r["verification_status"] for r in debug.claim_results] == ["confirmed", "contradictory", "unconfirmed"]
+            assert any(isinstance(event, ClaimsExtracted) for event in events)
+            assert sum(isinstance(event, ClaimVerified) for event in events) == 3
+
+            # Другой пост с уже проверенными утверждениями: новых запросов этапа 2 нет
+            mock_decompose.return_value = [CLAIMS[0], {"claim": "Гибсон написал об этом в своем аккаунте X", "domains": [], "search_query": ""}]
+            other_post = (
+                "Сегодня исполняется сорок лет роману «Нейромант». Уильям Гибсон написал его на пишущей машинке, "
+                "а в соцсетях писатель вспомнил, как работал над книгой, и поблагодарил читателей по всему миру. "
+                "Издательство готовит юбилейное переиздание с новыми иллюстрациями и предисловием автора."
+            )
+            _, _, debug = await filter_system.analyze_message(other_post, "Test")
+            assert mock_verdict.call_count == 3
+            assert not debug.cache_hit
+            assert [r["cached"] for r in debug.claim_results] == [True, True]
+    logger.info("✅ Утверждения проверяются параллельно и кэшируются")
+
+
+async def test_failed_claims_fall_back_to_whole_message():
+    """Если ни одно утверждение не проверено, сообщение проверяется целиком"""
+    logger.info("🔁 Тестируем откат к проверке целиком...")
+
+    filter_system = TwoStageFilter()
+    enabled, debug_mode, translate = claim_patches()
+    with enabled, debug_mode, translate, \
+            patch.object(filter_system, '_stage1_select_sources', new_callable=AsyncMock) as mock_stage1, \
+            patch.object(filter_system, '_decompose_claims', new_callable=AsyncMock) as mock_decompose, \
+            patch.object(filter_system, '_request_stage2_verdict', new_callable=AsyncMock) as mock_verdict, \
+            patch.object(filter_system, '_stage2_fact_check', new_callable=AsyncMock) as mock_stage2:
+        mock_stage1.return_value = (STAGE1_SOURCES, STAGE1_ANALYSIS)
+        mock_decompose.return_value = CLAIMS[:2]
+        mock_verdict.side_effect = asyncio.TimeoutError()
+        mock_stage2.return_value = ("другое", "Проверено целиком")
+        category, comment, debug = await filter_system.analyze_message(GIBSON_TEXT, "Test")
+
+    assert (category, comment) == ("другое", "Проверено целиком")
+    assert mock_stage2.await_count == 1
+    assert [r["verification_status"] for r in debug.claim_results] == ["failed", "failed"]
+    assert debug.pipeline_mode == "two_stage"
+    logger.info("✅ Откат к проверке целиком работает")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты проверки по утверждениям...")
+
+    tests = [
+        test_aggregate_claims,
+        test_parse_claims,
+        test_claims_verified_in_parallel_and_cached,
+        test_failed_claims_fall_back_to_whole_message
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты проверки по утверждениям прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
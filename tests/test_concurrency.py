@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Тест конкурентной обработки одинаковых проверок
+"""
+
+import asyncio
+import logging
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+
+from single_flight import SingleFlight
+from hedging import LatencyTracker, run_hedged
+from two_stage_filter import TwoStageFilter, DebugInfo
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def test_single_flight_shares_result():
+    """Одновременные вызовы с одним ключом выполняют фабрику один раз"""
+    logger.info("🤝 Тестируем single-flight...")
+
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "результат"
+
+    results = await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+
+    assert calls == 1
+    assert [value for value, _ in results] == ["результат"] * 5
+    assert sum(1 for _, shared in results if shared) == 4
+    assert flight.in_flight() == 0
+
+    # После завершения ключ освобождается и следующий вызов запускает работу заново
+    await flight.do("key", work)
+    assert calls == 2
+    logger.info("✅ Результат общий для всех ожидающих")
+
+
+async def test_single_flight_survives_waiter_cancel():
+    """Отмена первого ожидающего не отменяет общую задачу"""
+    logger.info("🛑 Тестируем отмену ожидающего...")
+
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 42
+
+    leader = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    value, shared = await follower
+    assert value == 42 and shared
+    logger.info("✅ Общая задача не отменяется")
+
+
+async def test_analyze_message_coalesces_burst():
+    """Всплеск одинаковых сообщений запускает пайплайн один раз"""
+    logger.info("🔥 Тестируем всплеск одинаковых проверок...")
+
+    filter_system = TwoStageFilter()
+
+    async def slow_pipeline(text, channel_name):
+        await asyncio.sleep(0.05)
+        return "новости", "Достоверно", DebugInfo(confidence_score=95)
+
+    with patch.object(filter_system, '_analyze_uncached', side_effect=slow_pipeline) as mock_analyze:
+        texts = ["Биткоин упал на 20% после заявления ФРС"] * 3 + ["биткоин  упал на 20% после заявления ФРС"] * 3
+        results = await asyncio.gather(*[
+            filter_system.analyze_message(text, f"Пользователь {i}") for i, text in enumerate(texts)
+        ])
+
+        assert mock_analyze.call_count == 1
+        assert all(result[:2] == ("новости", "Достоверно") for result in results)
+        assert sum(1 for result in results if result[2].coalesced) == 5
+    logger.info("✅ Один прогон на всплеск")
+
+
+async def test_run_hedged_first_valid_wins():
+    """Медленная попытка обгоняется хеджем, проигравшая отменяется"""
+    logger.info("🪁 Тестируем хеджирование...")
+
+    cancelled = []
+    launches = []
+
+    def make(name, delay, fail=False):
+        async def attempt():
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+            if fail:
+                raise asyncio.TimeoutError()
+            return name
+        return attempt
+
+    result = await run_hedged(
+        [make("slow", 1.0), make("fast", 0.01)], hedge_delay=0.05,
+        on_launch=lambda idx, hedge: launches.append((idx, hedge))
+    )
+    await asyncio.sleep(0)
+    assert result == "fast"
+    assert cancelled == ["slow"]
+    assert launches == [(1, False), (2, True)]
+
+    # Упавшая попытка сразу заменяется следующей, без ожидания задержки хеджа
+    launches.clear()
+    started = asyncio.get_running_loop().time()
+    result = await run_hedged(
+        [make("broken", 0.0, fail=True), make("ok", 0.0)], hedge_delay=5,
+        on_launch=lambda idx, hedge: launches.append((idx, hedge))
+    )
+    assert result == "ok" and asyncio.get_running_loop().time() - started < 1
+    assert launches == [(1, False), (2, False)]
+
+    # Все попытки упали — пробрасывается последняя ошибка
+    try:
+        await run_hedged([make("a", 0.0, fail=True), make("b", 0.0, fail=True)], hedge_delay=0.01)
+        assert False, "ожидалась ошибка"
+    except asyncio.TimeoutError:
+        pass
+
+    tracker = LatencyTracker(min_samples=3)
+    assert tracker.percentile(0.75) is None
+    for value in [1, 2, 3, 4, 100]:
+        tracker.record(value)
+    assert tracker.percentile(0.75) == 4
+    logger.info("✅ Хеджирование работает")
+
+
+async def test_run_hedged_replaces_failure_while_hedge_runs():
+    """Попытка упала, пока хедж еще идет: замена стартует сразу, а не через hedge_delay"""
+    logger.info("🔁 Тестируем замену упавшей попытки при живом хедже...")
+
+    launches = []
+
+    async def failing():
+        await asyncio.sleep(0.6)
+        raise asyncio.TimeoutError()
+
+    async def hanging():
+        await asyncio.sleep(10)
+
+    async def quick():
+        return "ok"
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    result = await run_hedged(
+        [failing, hanging, quick], hedge_delay=0.5, max_parallel=2,
+        on_launch=lambda idx, hedge: launches.append((idx, hedge, round(loop.time() - started, 1)))
+    )
+    elapsed = loop.time() - started
+    assert result == "ok"
+    # Хедж стартовал через 0.5с, замена — сразу после ошибки на 0.6с (раньше ждала до 1.1с)
+    assert [launch[:2] for launch in launches] == [(1, False), (2, True), (3, False)]
+    assert elapsed < 0.9, f"замена ждала задержку хеджа: {elapsed:.2f}с"
+    logger.info("✅ Упавшая попытка заменяется сразу")
+
+
+async def test_hedged_stage2_cancels_server_side():
+    """Проигравший фоновый запрос Responses отменяется на сервере"""
+    logger.info("🛑 Тестируем серверную отмену проигравшей попытки...")
+
+    original_mode = Config.STAGE2_HEDGE_MODE
+    Config.STAGE2_HEDGE_MODE = "hedged"
+
+    try:
+        filter_system = TwoStageFilter()
+        cancelled_ids = []
+        created = []
+
+        class FakeResponses:
+            async def create(self, **kwargs):
+                assert kwargs.get("background") is True
+                response_id = f"resp_{len(created) + 1}"
+                created.append(response_id)
+                return SimpleNamespace(id=response_id, status="queued")
+
+            async def retrieve(self, response_id):
+                # Первая попытка "зависает", вторая отвечает сразу
+                if response_id == "resp_1":
+                    await asyncio.sleep(10)
+                return SimpleNamespace(
+                    id=response_id, status="completed",
+                    output_text='{"verification_status": "confirmed", "confidence_score": 95, '
+                                '"category": "news", "detailed_findings": "Подтверждено"}'
+                )
+
+            async def cancel(self, response_id):
+                cancelled_ids.append(response_id)
+
+        filter_system.client = SimpleNamespace(responses=FakeResponses())
+        filter_system.stage2_latency = LatencyTracker(min_samples=1)
+        filter_system.stage2_latency.record(0.1)
+
+        sources = [{"domain": f"site{i}.com", "url": f"https://site{i}.com"} for i in range(10)]
+        debug = DebugInfo()
+        with patch.object(filter_system, '_translate_comment_fields'):
+            category, comment = await filter_system._stage2_fact_check("Discord объявил функцию", sources, {}, debug)
+        await asyncio.sleep(0.05)
+
+        assert category == "news" and comment.startswith("Достоверно")
+        assert debug.stage2_hedges >= 1 and debug.web_search_used
+        assert "resp_1" in cancelled_ids
+    finally:
+        Config.STAGE2_HEDGE_MODE = original_mode
+    logger.info("✅ Проигравшая попытка отменена на сервере")
+
+
+async def test_web_search_flag_set_by_winner():
+    """Попытки, не давшие вердикта, не отмечают веб-поиск: его ставит только примененный результат"""
+    logger.info("🔎 Тестируем флаг веб-поиска...")
+
+    original_mode = Config.STAGE2_HEDGE_MODE
+    try:
+        for mode in ("off", "hedged"):
+            Config.STAGE2_HEDGE_MODE = mode
+            filter_system = TwoStageFilter()
+
+            class FakeResponses:
+                async def create(self, **kwargs):
+                    # Поиск выполнен, но ответ не разбирается как вердикт
+                    return SimpleNamespace(id="resp", status="completed", output_text="Ничего не найдено")
+
+                async def retrieve(self, response_id):
+                    return await self.create()
+
+                async def cancel(self, response_id):
+                    pass
+
+            filter_system.client = SimpleNamespace(responses=FakeResponses())
+            sources = [{"domain": f"site{i}.com", "url": f"https://site{i}.com"} for i in range(10)]
+            debug = DebugInfo()
+            with patch.object(filter_system, '_fallback_check', return_value=("другое", "")):
+                await filter_system._stage2_fact_check("Discord объявил функцию", sources, {}, debug)
+
+            assert debug.fallback_used and debug.stage2_attempts >= 2
+            assert not debug.web_search_used, mode
+    finally:
+        Config.STAGE2_HEDGE_MODE = original_mode
+    logger.info("✅ Веб-поиск отмечается только для примененного вердикта")
+
+
+async def test_speculative_stage2_policy():
+    """Спекулятивный этап 2 сохраняется, заменяется или отменяется по ответу этапа 1"""
+    logger.info("🔮 Тестируем спекулятивный этап 2...")
+
+    original_mode = Config.STAGE2_SPECULATIVE_MODE
+    Config.STAGE2_SPECULATIVE_MODE = "on"
+
+    def domains(*names):
+        return [{"name": name, "url": f"https://{name}", "domain": name} for name in names]
+
+    verdict = {"verification_status": "confirmed", "confidence_score": 95, "category": "news",
+               "detailed_findings": "Подтверждено"}
+
+    async def run(stage1_sources, needs_fact_check=True):
+        filter_system = TwoStageFilter()
+        stage2_calls = []
+
+        async def fake_stage1(text, debug):
+            await asyncio.sleep(0.02)
+            return stage1_sources, {"requires_fact_check": needs_fact_check, "classification": "news"}
+
+        async def fake_request(text, sources, timeout, analysis, debug):
+            stage2_calls.append([src["domain"] for src in sources])
+            await asyncio.sleep(0.05)
+            return dict(verdict)
+
+        with patch.object(filter_system, '_stage1_select_sources', side_effect=fake_stage1), \
+             patch.object(filter_system, '_build_backup_sources', return_value=domains("reuters.com", "discord.com")), \
+             patch.object(filter_system, '_request_stage2_verdict', side_effect=fake_request), \
+             patch.object(filter_system, '_translate_comment_fields'):
+            category, comment, debug = await filter_system._analyze_uncached("Discord объявил функцию", "Test")
+        return filter_system, stage2_calls, category, debug
+
+    try:
+        # Источники совпадают — второй запрос к модели не нужен
+        filter_system, calls, category, debug = await run(domains("discord.com", "reuters.com"))
+        assert debug.speculative_outcome == "kept" and category == "news"
+        assert calls == [["reuters.com", "discord.com"]]
+        assert filter_system.speculation_stats["kept"] == 1
+
+        # Этап 1 выбрал совсем другие источники — спекуляция заменяется обычным этапом 2
+        filter_system, calls, category, debug = await run(domains("bloomberg.com", "wsj.com"))
+        assert debug.speculative_outcome == "replaced"
+        assert calls[-1] == ["bloomberg.com", "wsj.com"]
+
+        # Фактчекинг не нужен — спекуляция отменяется
+        filter_system, calls, category, debug = await run([], needs_fact_check=False)
+        assert debug.speculative_outcome == "cancelled"
+        assert filter_system.speculation_stats["cancelled"] == 1
+    finally:
+        Config.STAGE2_SPECULATIVE_MODE = original_mode
+    logger.info("✅ Политика спекуляции соблюдается")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты конкурентной обработки...")
+
+    tests = [
+        test_single_flight_shares_result,
+        test_single_flight_survives_waiter_cancel,
+        test_analyze_message_coalesces_burst,
+        test_run_hedged_first_valid_wins,
+        test_run_hedged_replaces_failure_while_hedge_runs,
+        test_hedged_stage2_cancels_server_side,
+        test_web_search_flag_set_by_winner,
+        test_speculative_stage2_policy
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты конкурентной обработки прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
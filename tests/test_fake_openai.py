@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Тест локальной замены OpenAI API: настоящий клиент и пайплайн через OPENAI_BASE_URL,
+поток событий, фоновый режим с опросом, 429 и бенчмарк пропускной способности
+"""
+
+import asyncio
+import logging
+import sys
+import os
+from unittest.mock import patch
+
+# Добавляем src и benchmarks в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+
+from fake_openai import FakeOpenAIConfig, FakeOpenAIServer, Latency
+from throughput import make_messages, run_level
+from two_stage_filter import TwoStageFilter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CLAIM = "Центробанк повысил ключевую ставку до 21% на заседании в пятницу"
+
+
+def fast_config(**overrides) -> FakeOpenAIConfig:
+    config = FakeOpenAIConfig(chat_latency=Latency(0.01, 0), responses_latency=Latency(0.05, 0), seed=7)
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+
+async def started(config: FakeOpenAIConfig) -> FakeOpenAIServer:
+    server = FakeOpenAIServer(config)
+    await server.start()
+    return server
+
+
+def make_filter(server: FakeOpenAIServer, streaming: bool) -> TwoStageFilter:
+    with patch('two_stage_filter.Config.OPENAI_BASE_URL', server.base_url), \
+            patch('two_stage_filter.Config.OPENAI_API_KEY', 'sk-fake'):
+        filter_system = TwoStageFilter()
+    filter_system.streaming_available = streaming
+    return filter_system
+
+
+async def test_stream_pipeline():
+    """Двухэтапный пайплайн проходит целиком через поток событий Responses API"""
+    logger.info("📶 Тестируем пайплайн на фейковом API с потоком...")
+
+    server = await started(fast_config())
+    try:
+        filter_system = make_filter(server, streaming=True)
+        with patch('two_stage_filter.Config.PIPELINE_MODE', 'two_stage'):
+            category, comment, debug = await filter_system.analyze_message(CLAIM, "Test")
+    finally:
+        await server.stop()
+
+    assert category == "news" and not debug.fallback_used
+    assert debug.verification_status == "confirmed" and debug.confidence_score == 92
+    assert debug.sources_count == 6, "этап 1 вернул источники"
+    requests = server.stats()["requests"]
+    assert requests["responses.create"] == 1 and requests["chat.completions.create"] >= 1
+    logger.info("✅ Поток событий разбирается клиентом")
+
+
+async def test_background_polling():
+    """Фоновый ответ проходит queued/in_progress и забирается опросом responses.retrieve"""
+    logger.info("⏳ Тестируем фоновый режим с опросом...")
+
+    server = await started(fast_config(responses_latency=Latency(0.3, 0)))
+    try:
+        filter_system = make_filter(server, streaming=False)
+        with patch('two_stage_filter.Config.PIPELINE_MODE', 'two_stage'), \
+                patch('two_stage_filter.Config.STAGE2_HEDGE_MODE', 'hedged'):
+            category, _, debug = await filter_system.analyze_message(CLAIM, "Test")
+    finally:
+        await server.stop()
+
+    assert category == "news" and debug.verification_status == "confirmed"
+    requests = server.stats()["requests"]
+    assert requests["responses.retrieve"] >= 1, "ответ забран опросом"
+    logger.info("✅ Фоновый режим и опрос работают")
+
+
+async def test_rate_limit_recovery():
+    """429 с Retry-After: клиент повторяет запрос, проверка завершается без fallback"""
+    logger.info("🚦 Тестируем восстановление после 429...")
+
+    server = await started(fast_config(retry_after=0.05))
+    server.inject(429, 2)
+    try:
+        filter_system = make_filter(server, streaming=True)
+        with patch('two_stage_filter.Config.PIPELINE_MODE', 'two_stage'):
+            category, _, debug = await filter_system.analyze_message(CLAIM, "Test")
+    finally:
+        await server.stop()
+
+    assert category == "news" and not debug.fallback_used
+    assert server.stats()["statuses"][429] == 2
+    logger.info("✅ После 429 проверка доходит до вердикта")
+
+
+async def test_throughput_smoke():
+    """Бенчмарк считает пропускную способность, перцентили и вызовы OpenAI на сообщение"""
+    logger.info("🏎️ Тестируем бенчмарк пропускной способности...")
+
+    server = FakeOpenAIServer(fast_config())
+    server.start_in_thread()
+    try:
+        with patch('two_stage_filter.Config.OPENAI_BASE_URL', server.base_url), \
+                patch('two_stage_filter.Config.OPENAI_API_KEY', 'sk-fake'), \
+                patch('two_stage_filter.Config.PIPELINE_MODE', 'two_stage'):
+            messages = make_messages(8)
+            assert len(set(messages)) == 8
+            row = await run_level(messages, 4, server)
+    finally:
+        server.stop_thread()
+
+    assert row["messages"] == 8 and row["errors"] == 0 and row["fallbacks"] == 0
+    assert row["throughput"] > 0 and row["p50_ms"] <= row["p95_ms"] <= row["p99_ms"]
+    assert row["openai_calls_per_message"] >= 2, "этап 1 и этап 2 на каждое сообщение"
+    logger.info("✅ Бенчмарк работает")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты фейкового OpenAI API...")
+
+    tests = [
+        test_stream_pipeline,
+        test_background_polling,
+        test_rate_limit_recovery,
+        test_throughput_smoke
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты фейкового OpenAI API прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Тест журнала проверок: переживает перезапуск, не дублирует ответы
+"""
+
+import asyncio
+import logging
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+os.environ.setdefault('JOB_QUEUE_ENABLED', 'false')
+# Без пауз исходящей очереди Telegram между вызовами MockBot
+os.environ.setdefault('TELEGRAM_CHAT_INTERVAL', '0')
+
+from admission import AdmissionController, AdmissionRejected
+from command_handler import CommandHandler, RESUMED_STEP
+from job_queue import DONE, RUNNING, JobQueue
+from two_stage_filter import DebugInfo
+from test_translation_formatting import MockBot, MockMessage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEXT = "Discord объявил новую функцию модерации"
+
+
+def make_handler(db_path: str) -> CommandHandler:
+    handler = CommandHandler()
+    handler.jobs = JobQueue(db_path=db_path, max_attempts=3)
+    return handler
+
+
+def make_message(text: str = TEXT) -> MockMessage:
+    message = MockMessage(text)
+    message.from_user.id = 111
+    return message
+
+
+async def verdict(text, channel_name, usage=None):
+    return "новости", "Достоверно", DebugInfo(confidence_score=95)
+
+
+async def test_job_lifecycle():
+    """Повторное сообщение не создает задачу, вердикт сохраняется один раз"""
+    logger.info("🗂️ Тестируем жизненный цикл задачи...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = JobQueue(db_path=os.path.join(tmp, "jobs.sqlite3"))
+        job = await jobs.enqueue(1, 10, 111, "Пользователь test", TEXT)
+        assert job is not None
+        assert await jobs.enqueue(1, 10, 111, "Пользователь test", TEXT) is None
+
+        await jobs.set_progress_message(job.id, 20)
+        await jobs.start(job.id)
+        [stored] = await jobs.unfinished()
+        assert (stored.status, stored.attempts, stored.progress_message_id, stored.user_id) == (RUNNING, 1, 20, 111)
+
+        assert await jobs.complete(job.id, "первый вердикт") == "первый вердикт"
+        # Вторая попытка той же задачи получает уже сохраненный вердикт
+        assert await jobs.complete(job.id, "второй вердикт") == "первый вердикт"
+        await jobs.fail(job.id, "ошибка доставки")
+        [stored] = await jobs.unfinished()
+        assert (stored.status, stored.result) == (DONE, "первый вердикт")
+
+        await jobs.mark_delivered(job.id)
+        assert await jobs.unfinished() == []
+        assert await jobs.purge(older_than=3600) == 0
+        assert await jobs.purge(older_than=0) == 1
+    logger.info("✅ Задача проходит все статусы")
+
+
+async def test_resume_after_restart():
+    """Проверка, прерванная перезапуском, доводится до конца в том же сообщении"""
+    logger.info("♻️ Тестируем возобновление после перезапуска...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "jobs.sqlite3")
+        bot = MockBot()
+
+        # Первый процесс принял сообщение и «упал» посреди проверки
+        handler = make_handler(db_path)
+        hang = asyncio.Event()
+
+        async def stuck(text, channel_name, usage=None):
+            await hang.wait()
+
+        with patch.object(handler.two_stage_filter, 'analyze_message', side_effect=stuck):
+            task = asyncio.create_task(handler.handle_fact_check(bot, make_message()))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert len(bot.messages) == 1
+        progress_id = 1
+
+        # Новый процесс: тот же файл журнала
+        restarted = make_handler(db_path)
+        [job] = await restarted.jobs.unfinished()
+        assert job.status == RUNNING and job.progress_message_id == progress_id and job.text == TEXT
+
+        # Пользователь уже исчерпал лимит частоты, но принятая задача все равно допускается
+        admission = AdmissionController(max_queue=1, max_in_flight=1, user_concurrency=1, user_rate=1, user_rate_window=60)
+        admission.submit(job.user_id).release()
+        try:
+            admission.submit(job.user_id)
+            assert False, "ожидался отказ по частоте"
+        except AdmissionRejected:
+            pass
+        ticket = admission.submit(job.user_id, force=True)
+
+        with patch.object(restarted.two_stage_filter, 'analyze_message', side_effect=verdict):
+            await restarted.resume_job(bot, job, ticket)
+
+        sends = [m for m in bot.messages if "edited" not in m]
+        edits = [m for m in bot.messages if m.get("edited")]
+        assert len(sends) == 1
+        assert all(m["message_id"] == progress_id for m in edits)
+        assert RESUMED_STEP in edits[0]["text"]
+        assert "95%" in edits[-1]["text"]
+        assert await restarted.jobs.unfinished() == []
+
+        # Telegram повторно доставил то же сообщение — второй проверки нет
+        with patch.object(restarted.two_stage_filter, 'analyze_message', side_effect=verdict) as mock_analyze:
+            await restarted.handle_fact_check(bot, make_message())
+            assert mock_analyze.call_count == 0
+        assert len([m for m in bot.messages if "edited" not in m]) == 1
+    logger.info("✅ Проверка возобновляется в исходном сообщении")
+
+
+async def test_resume_delivers_saved_verdict():
+    """Если вердикт сохранен, но не показан, он доставляется без новой проверки"""
+    logger.info("📬 Тестируем доставку сохраненного вердикта...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = make_handler(os.path.join(tmp, "jobs.sqlite3"))
+        bot = MockBot()
+        job = await handler.jobs.enqueue(12345, 5, 111, "Пользователь test", TEXT)
+        await handler.jobs.set_progress_message(job.id, 6)
+        await handler.jobs.start(job.id)
+        await handler.jobs.complete(job.id, "✅ Готовый вердикт")
+
+        [job] = await handler.jobs.unfinished()
+        with patch.object(handler.two_stage_filter, 'analyze_message', side_effect=verdict) as mock_analyze:
+            await handler.resume_job(bot, job)
+            assert mock_analyze.call_count == 0
+        assert bot.messages == [{"chat_id": 12345, "message_id": 6, "text": "✅ Готовый вердикт", "edited": True}]
+        assert await handler.jobs.unfinished() == []
+    logger.info("✅ Сохраненный вердикт доставлен")
+
+
+async def test_poison_job_is_dropped():
+    """Задача, которая прерывалась слишком часто, отменяется с сообщением об ошибке"""
+    logger.info("☠️ Тестируем отмену зацикленной задачи...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "jobs.sqlite3")
+        handler = make_handler(db_path)
+        bot = MockBot()
+        job = await handler.jobs.enqueue(12345, 5, 111, "Пользователь test", TEXT)
+        await handler.jobs.set_progress_message(job.id, 6)
+        for _ in range(3):
+            await handler.jobs.start(job.id)
+
+        [job] = await handler.jobs.unfinished()
+        await handler.resume_job(bot, job)
+        assert "Ошибка анализа" in bot.messages[-1]["text"]
+        assert await handler.jobs.unfinished() == []
+    logger.info("✅ Зацикленная задача отменена")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты журнала проверок...")
+
+    tests = [
+        test_job_lifecycle,
+        test_resume_after_restart,
+        test_resume_delivers_saved_verdict,
+        test_poison_job_is_dropped
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты журнала проверок прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Тест метрик Prometheus и эндпоинтов /metrics, /healthz
+"""
+
+import asyncio
+import logging
+import sys
+import os
+from unittest.mock import AsyncMock, patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+
+from metrics import (
+    CHECK_DURATION, CHECKS, FALLBACKS, STAGE2_ATTEMPTS, STAGE2_FAILURES, STAGE2_HEDGES, STAGE_DURATION,
+    WEB_SEARCHES, MetricsRegistry, MetricsServer, record_check
+)
+from two_stage_filter import DebugInfo, TwoStageFilter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def http_get(port: int, path: str):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = (await reader.read()).decode("utf-8")
+    writer.close()
+    head, body = response.split("\r\n\r\n", 1)
+    return int(head.split()[1]), body
+
+
+async def test_text_format():
+    """Счетчики, gauge и гистограммы в текстовом формате Prometheus"""
+    logger.info("📝 Тестируем формат метрик...")
+
+    registry = MetricsRegistry()
+    checks = registry.counter("demo_checks_total", "Проверки", ("status",))
+    depth = registry.gauge("demo_queue_depth", "Очередь")
+    latency = registry.histogram("demo_seconds", "Время", ("stage",), buckets=(1, 5))
+
+    checks.inc(status="confirmed")
+    checks.inc(2, status='say "hi"\n')
+    depth.set_function(lambda: 7)
+    for value in (0.5, 3, 10):
+        latency.observe(value, stage="stage1")
+
+    text = registry.render()
+    assert "# TYPE demo_checks_total counter" in text
+    assert 'demo_checks_total{status="confirmed"} 1' in text
+    assert 'demo_checks_total{status="say \\"hi\\"\\n"} 2' in text
+    assert "demo_queue_depth 7" in text
+    assert 'demo_seconds_bucket{stage="stage1",le="1"} 1' in text
+    assert 'demo_seconds_bucket{stage="stage1",le="5"} 2' in text
+    assert 'demo_seconds_bucket{stage="stage1",le="+Inf"} 3' in text
+    assert 'demo_seconds_sum{stage="stage1"} 13.5' in text
+    assert 'demo_seconds_count{stage="stage1"} 3' in text
+
+    try:
+        checks.inc(stage="stage1")
+        assert False, "ожидалась ошибка меток"
+    except ValueError:
+        pass
+    logger.info("✅ Формат соответствует Prometheus")
+
+
+async def test_pipeline_records_stages():
+    """Проверка учитывает этапы, попытки, таймауты и перевод"""
+    logger.info("⏱️ Тестируем метрики пайплайна...")
+
+    filter_system = TwoStageFilter()
+    debug = DebugInfo(
+        stage1_time=1.5, stage2_time=12, stage2_attempts=2, fallback_used=True,
+        pipeline_mode="two_stage", verification_status="confirmed", detailed_findings="Confirmed by sources"
+    )
+    checks_before = CHECKS.value(pipeline_mode="two_stage", status="confirmed")
+    stage1_before = STAGE_DURATION.count(stage="stage1")
+    stage2_before = STAGE_DURATION.count(stage="stage2")
+    translation_before = STAGE_DURATION.count(stage="translation")
+    attempts_before = STAGE2_ATTEMPTS.value()
+    fallbacks_before = FALLBACKS.value()
+    timeouts_before = STAGE2_FAILURES.value(reason="timeout")
+
+    with patch.object(filter_system, '_analyze_uncached', new_callable=AsyncMock) as mock_pipeline:
+        mock_pipeline.return_value = ("новости", "Достоверно", debug)
+        await filter_system.analyze_message("Discord объявил новую функцию модерации", "Test")
+
+    filter_system._note_stage2_failure(1, [], asyncio.TimeoutError(), None)
+    with patch('two_stage_filter.Config.TRANSLATE_TO_RUSSIAN', True), \
+            patch.object(filter_system, '_translate_fields_batch', new_callable=AsyncMock) as mock_batch:
+        mock_batch.return_value = {"detailed_findings": "Подтверждено источниками"}
+        await filter_system._translate_comment_fields(debug)
+
+    assert CHECKS.value(pipeline_mode="two_stage", status="confirmed") == checks_before + 1
+    assert STAGE_DURATION.count(stage="stage1") == stage1_before + 1
+    assert STAGE_DURATION.count(stage="stage2") == stage2_before + 1
+    assert STAGE_DURATION.count(stage="translation") == translation_before + 1
+    assert STAGE2_ATTEMPTS.value() == attempts_before + 2
+    assert FALLBACKS.value() == fallbacks_before + 1
+    assert STAGE2_FAILURES.value(reason="timeout") == timeouts_before + 1
+    logger.info("✅ Метрики пайплайна записываются")
+
+
+async def test_coalesced_not_double_counted():
+    """Присоединенная к single-flight проверка учитывается как проверка, но не повторяет этапы"""
+    logger.info("🔗 Тестируем учет склеенных проверок...")
+
+    debug = DebugInfo(
+        stage1_time=1.5, stage2_time=12, stage2_attempts=2, stage2_hedges=1, fallback_used=True,
+        web_search_used=True, coalesced=True, pipeline_mode="two_stage", verification_status="confirmed"
+    )
+    checks_before = CHECKS.value(pipeline_mode="coalesced", status="confirmed")
+    duration_before = CHECK_DURATION.count(pipeline_mode="coalesced")
+    stage1_before = STAGE_DURATION.count(stage="stage1")
+    stage2_before = STAGE_DURATION.count(stage="stage2")
+    counters = [STAGE2_ATTEMPTS, STAGE2_HEDGES, FALLBACKS, WEB_SEARCHES]
+    values_before = [counter.value() for counter in counters]
+
+    record_check(debug, 0.2)
+
+    assert CHECKS.value(pipeline_mode="coalesced", status="confirmed") == checks_before + 1
+    assert CHECK_DURATION.count(pipeline_mode="coalesced") == duration_before + 1
+    assert STAGE_DURATION.count(stage="stage1") == stage1_before
+    assert STAGE_DURATION.count(stage="stage2") == stage2_before
+    assert [counter.value() for counter in counters] == values_before
+    logger.info("✅ Склеенные проверки не раздувают метрики этапов")
+
+
+async def test_http_endpoints():
+    """/metrics отдает метрики, /healthz — готовность, остальное — 404"""
+    logger.info("🌐 Тестируем HTTP-эндпоинты...")
+
+    ready = {"value": True}
+    server = MetricsServer(ready=lambda: ready["value"], host="127.0.0.1", port=0)
+    with patch('metrics.Config.METRICS_LOOP_LAG_INTERVAL', 0.01):
+        await server.start()
+    try:
+        await asyncio.sleep(0.05)
+        status, body = await http_get(server.port, "/metrics")
+        assert status == 200
+        assert "# TYPE factcheck_checks_total counter" in body
+        assert "factcheck_event_loop_lag_seconds_count" in body
+
+        assert await http_get(server.port, "/healthz") == (200, "ok\n")
+        ready["value"] = False
+        assert (await http_get(server.port, "/healthz"))[0] == 503
+        assert (await http_get(server.port, "/other"))[0] == 404
+    finally:
+        await server.stop()
+    logger.info("✅ Эндпоинты работают")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты метрик...")
+
+    tests = [
+        test_text_format,
+        test_pipeline_records_stages,
+        test_coalesced_not_double_counted,
+        test_http_endpoints
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты метрик прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
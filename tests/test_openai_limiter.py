@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Тест общего лимитера запросов к OpenAI
+"""
+
+import asyncio
+import logging
+import sys
+import os
+import time
+from types import SimpleNamespace
+
+from openai import RateLimitError
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+
+from openai_limiter import RateLimitedOpenAI, estimate_tokens, retry_after_seconds
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rate_limit_error(headers):
+    response = SimpleNamespace(status_code=429, headers=headers, request=None)
+    return RateLimitError("Rate limit reached", response=response, body=None)
+
+
+class FakeCompletions:
+    def __init__(self, failures=0, headers=None, total_tokens=None):
+        self.failures = failures
+        self.headers = headers or {}
+        self.total_tokens = total_tokens
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(time.monotonic())
+        if self.failures:
+            self.failures -= 1
+            raise rate_limit_error(self.headers)
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=self.total_tokens) if self.total_tokens else None)
+
+
+def make_client(completions):
+    return SimpleNamespace(
+        chat=SimpleNamespace(completions=completions),
+        responses=SimpleNamespace(create=completions.create, retrieve=None),
+        models="passthrough"
+    )
+
+
+async def test_requests_per_period():
+    """Сверх RPM вызовы ждут своей очереди, а не падают"""
+    logger.info("🪣 Тестируем лимит запросов...")
+
+    completions = FakeCompletions()
+    # 4 запроса за 0.4с: первые 4 сразу, следующие 2 — по мере пополнения
+    limiter = RateLimitedOpenAI(make_client(completions), rpm=4, tpm=0, model_rpm={}, model_tpm={}, period=0.4)
+
+    started = time.monotonic()
+    await asyncio.gather(*[
+        limiter.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "привет"}])
+        for _ in range(6)
+    ])
+    elapsed = time.monotonic() - started
+
+    assert len(completions.calls) == 6
+    assert elapsed >= 0.18, elapsed
+    assert limiter.utilisation()["gpt-4o"]["rpm"] > 0.5
+    assert limiter.models == "passthrough"
+    logger.info("✅ Запросы распределены во времени (%.2fс)", elapsed)
+
+
+async def test_retry_after_pauses_model():
+    """429 ставит модель на паузу по Retry-After для всех вызовов, затем запрос повторяется"""
+    logger.info("🚦 Тестируем Retry-After...")
+
+    assert retry_after_seconds(rate_limit_error({"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(rate_limit_error({"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(rate_limit_error({})) is None
+
+    completions = FakeCompletions(failures=1, headers={"retry-after-ms": "200"})
+    limiter = RateLimitedOpenAI(make_client(completions), rpm=100, tpm=0, model_rpm={}, model_tpm={}, max_retries=2)
+
+    first = asyncio.create_task(limiter.chat.completions.create(model="gpt-4o", messages=[]))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(limiter.responses.create(model="gpt-4o", input="проверка"))
+    await asyncio.gather(first, second)
+
+    # Повтор первого и второй вызов пришли не раньше конца паузы
+    assert len(completions.calls) == 3
+    assert completions.calls[1] - completions.calls[0] >= 0.19
+    assert completions.calls[2] - completions.calls[0] >= 0.19
+    assert limiter.utilisation()["gpt-4o"]["rate_limited"] == 1
+
+    # Исчерпав повторы, лимитер пробрасывает ошибку
+    completions = FakeCompletions(failures=5, headers={"retry-after-ms": "10"})
+    limiter = RateLimitedOpenAI(make_client(completions), rpm=100, tpm=0, model_rpm={}, model_tpm={}, max_retries=1)
+    try:
+        await limiter.chat.completions.create(model="gpt-4o", messages=[])
+        assert False, "ожидалась ошибка 429"
+    except RateLimitError:
+        pass
+    assert len(completions.calls) == 2
+    logger.info("✅ Пауза общая для всех вызовов модели")
+
+
+async def test_token_budget():
+    """TPM списывается по оценке и выравнивается по фактическому usage"""
+    logger.info("🧮 Тестируем лимит токенов...")
+
+    kwargs = {"model": "gpt-4o", "messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 100}
+    assert estimate_tokens(kwargs) == 200
+
+    completions = FakeCompletions(total_tokens=50)
+    limiter = RateLimitedOpenAI(make_client(completions), rpm=0, tpm=1000, model_rpm={}, model_tpm={"gpt-4o": 400})
+    await limiter.chat.completions.create(**kwargs)
+
+    # Оценка 200 из 400, фактически 50 — занято 50/400
+    assert abs(limiter.utilisation()["gpt-4o"]["tpm"] - 0.125) < 0.01
+    logger.info("✅ Токены учитываются по факту")
+
+
+async def test_sdk_retries_disabled():
+    """Повторяет только лимитер: клиент SDK пайплайна создается без своих повторов"""
+    logger.info("🔁 Тестируем отключение повторов SDK...")
+
+    from two_stage_filter import TwoStageFilter
+
+    filter_system = TwoStageFilter()
+    assert isinstance(filter_system.client, RateLimitedOpenAI)
+    assert filter_system.client._client.max_retries == 0
+    logger.info("✅ Повторы SDK отключены")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты лимитера OpenAI...")
+
+    tests = [
+        test_requests_per_period,
+        test_retry_after_pauses_model,
+        test_token_budget,
+        test_sdk_retries_disabled
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты лимитера прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Тест режимов пайплайна: один проход для простых утверждений и два этапа
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import os
+from unittest.mock import AsyncMock, patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+
+from pipeline_events import SinglePassStarted
+from two_stage_filter import TwoStageFilter, estimate_complexity
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHORT_CLAIM = "Apple выпустила iPhone 17 в сентябре"
+LONG_CLAIM = (
+    "Apple выпустила iPhone 17 в сентябре. Продажи в первый день превысили рекорд прошлого года. "
+    "Аналитики ожидают роста выручки компании. Подробности: https://example.com/news"
+)
+
+CONFIRMED = json.dumps({
+    "needs_fact_check": True,
+    "classification": "news",
+    "reasoning": "Проверяемое утверждение о продукте",
+    "verification_status": "confirmed",
+    "confidence_score": 93,
+    "category": "news",
+    "detailed_findings": "Apple newsroom confirms the release",
+})
+
+
+def pipeline_patches(mode: str = "auto"):
+    return (
+        patch('two_stage_filter.Config.PIPELINE_MODE', mode),
+        patch('two_stage_filter.Config.DEBUG_MODE', True),
+        patch('two_stage_filter.Config.TRANSLATE_TO_RUSSIAN', False),
+    )
+
+
+async def test_complexity_estimate():
+    """Одно короткое предложение проще нескольких предложений со ссылкой"""
+    logger.info("📏 Тестируем оценку сложности...")
+
+    assert estimate_complexity(SHORT_CLAIM) == 6
+    assert estimate_complexity("Курс доллара вырос. Нефть подешевела!") == 5 + 10
+    assert estimate_complexity(LONG_CLAIM) > 25
+    logger.info("✅ Сложность оценивается предсказуемо")
+
+
+async def test_single_pass_for_short_claim():
+    """Короткое утверждение проверяется одним запросом, без этапа 1"""
+    logger.info("⚡ Тестируем один проход...")
+
+    filter_system = TwoStageFilter()
+    mode, debug_mode, translate = pipeline_patches()
+    with mode, debug_mode, translate, \
+            patch.object(filter_system, '_web_search_request', new_callable=AsyncMock) as mock_search, \
+            patch.object(filter_system, '_stage1_select_sources', new_callable=AsyncMock) as mock_stage1:
+        mock_search.return_value = CONFIRMED
+        events = [event async for event in filter_system.analyze_message_events(SHORT_CLAIM, "Test")]
+
+    category, comment, debug = events[-1].category, events[-1].comment, events[-1].debug
+    assert mock_stage1.await_count == 0
+    assert mock_search.await_count == 1
+    prompt, domains = mock_search.await_args.args[:2]
+    assert SHORT_CLAIM in prompt
+    assert "apple.com" in domains
+    assert any(isinstance(event, SinglePassStarted) for event in events)
+
+    assert category == "news" and comment.startswith("Достоверно")
+    assert debug.pipeline_mode == "single_pass"
+    assert debug.classification == "news" and debug.confidence_score == 93
+    assert debug.stage1_time == 0 and debug.sources_found == domains
+    logger.info("✅ Короткое утверждение проверено одним запросом")
+
+
+async def test_single_pass_skips_spam():
+    """Если модель решила, что проверка не нужна, ответ строится как после этапа 1"""
+    logger.info("🚫 Тестируем спам в одном проходе...")
+
+    filter_system = TwoStageFilter()
+    mode, debug_mode, translate = pipeline_patches()
+    with mode, debug_mode, translate, \
+            patch.object(filter_system, '_web_search_request', new_callable=AsyncMock) as mock_search:
+        mock_search.return_value = json.dumps({
+            "needs_fact_check": False, "classification": "spam", "skip_reason": "Реклама со ссылкой"
+        })
+        category, comment, debug = await filter_system.analyze_message("Жми ссылку и забери подарок", "Test")
+
+    assert (category, comment) == ("скрыто", "Реклама со ссылкой")
+    assert debug.pipeline_mode == "single_pass" and debug.classification == "spam"
+    logger.info("✅ Спам закрыт без второго запроса")
+
+
+async def test_single_pass_falls_back_to_two_stage():
+    """Ошибка одного прохода не теряет проверку: работает обычный двухэтапный путь"""
+    logger.info("🔁 Тестируем откат к двум этапам...")
+
+    filter_system = TwoStageFilter()
+    analysis = {"classification": "news", "requires_fact_check": True, "reasoning": "Новость"}
+    mode, debug_mode, translate = pipeline_patches()
+    with mode, debug_mode, translate, \
+            patch.object(filter_system, '_web_search_request', new_callable=AsyncMock) as mock_search, \
+            patch.object(filter_system, '_stage1_select_sources', new_callable=AsyncMock) as mock_stage1, \
+            patch.object(filter_system, '_stage2_fact_check', new_callable=AsyncMock) as mock_stage2:
+        mock_search.side_effect = asyncio.TimeoutError()
+        mock_stage1.return_value = ([{"domain": "apple.com"}], analysis)
+        mock_stage2.return_value = ("новости", "Подтверждено")
+        category, comment, debug = await filter_system.analyze_message(SHORT_CLAIM, "Test")
+
+    assert (category, comment) == ("новости", "Подтверждено")
+    assert mock_stage1.await_count == 1
+    assert debug.pipeline_mode == "single_pass_fallback"
+    assert debug.classification == "news"
+    logger.info("✅ Откат к двум этапам работает")
+
+
+async def test_complex_claim_uses_two_stages():
+    """Сложные тексты и режим two_stage идут через этап 1"""
+    logger.info("🧩 Тестируем выбор двухэтапного режима...")
+
+    analysis = {"classification": "news", "requires_fact_check": False, "skip_reason": "Без проверки"}
+    for mode_name, text in (("auto", LONG_CLAIM), ("two_stage", SHORT_CLAIM)):
+        filter_system = TwoStageFilter()
+        mode, debug_mode, translate = pipeline_patches(mode_name)
+        with mode, debug_mode, translate, \
+                patch.object(filter_system, '_web_search_request', new_callable=AsyncMock) as mock_search, \
+                patch.object(filter_system, '_stage1_select_sources', new_callable=AsyncMock) as mock_stage1:
+            mock_stage1.return_value = ([], analysis)
+            _, _, debug = await filter_system.analyze_message(text, "Test")
+
+        assert mock_search.await_count == 0
+        assert mock_stage1.await_count == 1
+        assert debug.pipeline_mode == "two_stage"
+    logger.info("✅ Сложные утверждения проверяются в два этапа")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты режимов пайплайна...")
+
+    tests = [
+        test_complexity_estimate,
+        test_single_pass_for_short_claim,
+        test_single_pass_skips_spam,
+        test_single_pass_falls_back_to_two_stage,
+        test_complex_claim_uses_two_stages
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты режимов пайплайна прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
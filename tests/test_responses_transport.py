@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Тест транспорта Responses API: поток событий и запасной опрос статуса
+"""
+
+import asyncio
+import logging
+import sys
+import os
+from types import SimpleNamespace
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+
+from two_stage_filter import TwoStageFilter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VERDICT_TEXT = '{"verification_status": "confirmed", "confidence_score": 95}'
+
+
+class FakeStream:
+    """Поток событий, как его отдает AsyncOpenAI при stream=True"""
+
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for event in self.events:
+            await asyncio.sleep(0)
+            yield event
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeResponses:
+    def __init__(self, stream_events=None):
+        self.stream_events = stream_events
+        self.requests = []
+        self.retrieved = []
+        self.stream = None
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        if kwargs.get("stream") and self.stream_events is not None:
+            self.stream = FakeStream(self.stream_events)
+            return self.stream
+        return SimpleNamespace(id="resp_1", status="queued")
+
+    async def retrieve(self, response_id):
+        self.retrieved.append(response_id)
+        return SimpleNamespace(id=response_id, status="completed", output_text=VERDICT_TEXT)
+
+
+def event(event_type, status):
+    return SimpleNamespace(
+        type=event_type,
+        response=SimpleNamespace(id="resp_1", status=status, output_text=VERDICT_TEXT if status == "completed" else "")
+    )
+
+
+async def test_stream_returns_on_completed_event():
+    """Ответ берется из события response.completed без единого опроса"""
+    logger.info("📶 Тестируем потоковый транспорт...")
+
+    filter_system = TwoStageFilter()
+    responses = FakeResponses([
+        event("response.created", "in_progress"),
+        SimpleNamespace(type="response.output_text.delta", delta="{"),
+        event("response.completed", "completed"),
+        event("response.output_text.done", "completed"),
+    ])
+
+    response = await filter_system._execute_responses_request(responses, {"model": "gpt-4o"}, timeout=5)
+
+    assert response.status == "completed" and response.output_text == VERDICT_TEXT
+    assert responses.requests[0]["stream"] is True
+    assert responses.retrieved == []
+    assert responses.stream.closed
+    logger.info("✅ Опросов нет, поток закрыт")
+
+
+async def test_polling_fallback():
+    """Без потока и при обрыве потока ответ дочитывается опросом"""
+    logger.info("🔁 Тестируем запасной опрос...")
+
+    # Сервер проигнорировал stream=True и вернул обычный ответ
+    filter_system = TwoStageFilter()
+    responses = FakeResponses()
+    response = await filter_system._execute_responses_request(responses, {"model": "gpt-4o"}, timeout=5)
+    assert response.status == "completed" and responses.retrieved == ["resp_1"]
+
+    # Поток оборвался до response.completed — дочитываем по id
+    responses = FakeResponses([event("response.created", "in_progress")])
+    response = await filter_system._execute_responses_request(responses, {"model": "gpt-4o"}, timeout=5)
+    assert response.output_text == VERDICT_TEXT and responses.retrieved == ["resp_1"]
+
+    # Потоковый режим выключен — запрос без stream
+    filter_system.streaming_available = False
+    responses = FakeResponses()
+    await filter_system._execute_responses_request(responses, {"model": "gpt-4o"}, timeout=5)
+    assert "stream" not in responses.requests[0]
+    logger.info("✅ Опрос работает как запасной вариант")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты транспорта Responses API...")
+
+    tests = [
+        test_stream_returns_on_completed_event,
+        test_polling_fallback
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты транспорта прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Тест выбора источников по ключевым словам
+"""
+
+import asyncio
+import logging
+import sys
+import os
+import json
+import tempfile
+import time
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from keyword_automaton import KeywordAutomaton
+from sources_config import SourcesConfig, sources_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def test_automaton_matches_substrings():
+    """Автомат находит все вхождения, включая перекрывающиеся и вложенные"""
+    logger.info("🔤 Тестируем автомат ключевых слов...")
+
+    automaton = KeywordAutomaton([("he", "he"), ("she", "she"), ("hers", "hers"), ("his", "his"), ("@", "at")])
+    assert automaton.find_labels("uSHErs") == {"he", "she", "hers"}
+    assert automaton.find_labels("this") == {"his"}
+    assert automaton.find_labels("mail@host") == {"at"}
+    assert automaton.find_labels("nothing") == frozenset()
+    logger.info("✅ Совпадения как у `word in text`")
+
+
+async def test_sources_for_topic():
+    """Категории и компании определяются за один проход"""
+    logger.info("🌐 Тестируем выбор источников...")
+
+    general = set(sources_config.get_category_domains("general_news"))
+
+    plain = sources_config.get_sources_for_topic("Сегодня хорошая погода в городе")
+    assert set(plain) == general
+
+    tech = sources_config.get_sources_for_topic("Discord объявил новую функцию")
+    assert "support.discord.com" in tech and "techcrunch.com" in tech
+    # Официальные сайты компании идут первыми
+    assert tech[0] in {"blog.discord.com", "discord.com", "support.discord.com"}
+
+    # Упоминание в стиле соцсетей больше не падает на отсутствующей категории
+    social = sources_config.get_sources_for_topic("@elonmusk написал пост про курс биткоина")
+    assert "snopes.com" in social and "bloomberg.com" in social
+
+    entertainment = sources_config.get_sources_for_topic("Обычный текст без ключевых слов", "развлечения")
+    assert "imdb.com" in entertainment
+
+    # Результат — новый список: изменения вызывающим кодом не портят кэш
+    tech.clear()
+    assert sources_config.get_sources_for_topic("Discord объявил новую функцию")
+    logger.info("✅ Источники выбираются корректно")
+
+
+async def test_scales_with_keywords():
+    """Время поиска не растет линейно с числом ключевых слов"""
+    logger.info("📈 Тестируем масштабирование...")
+
+    text = "Компания объявила о росте выручки на 20% и новых инвестициях в исследования " * 20
+
+    def measure(count):
+        automaton = KeywordAutomaton((f"компания{i:05d}", i) for i in range(count))
+        started = time.perf_counter()
+        for _ in range(50):
+            automaton.find_labels(text)
+        return (time.perf_counter() - started) / 50
+
+    small, large = measure(50), measure(20000)
+    logger.info("⏱️ 50 слов: %.2f мс, 20000 слов: %.2f мс", small * 1000, large * 1000)
+    assert large < small * 3
+    logger.info("✅ Стоимость поиска не зависит от размера словаря")
+
+
+async def test_hot_reload_and_atomic_writes():
+    """Изменения файла подхватываются без перезапуска, записи атомарны"""
+    logger.info("🔄 Тестируем перезагрузку sources.json...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "sources.json")
+        config = SourcesConfig(path)
+        # Файла не было — записаны значения по умолчанию
+        assert os.path.exists(path) and "snopes.com" in config.get_category_domains("social_media_verification")
+        assert not await config.reload_if_changed()
+
+        old_index = config._index
+        data = json.load(open(path, encoding='utf-8'))
+        data["finance"]["keywords"].append("блокчейн")
+        data["finance"]["domains"].append("coindesk.com")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10_000_000))
+
+        assert await config.reload_if_changed()
+        assert config._index is not old_index
+        assert "coindesk.com" in config.get_sources_for_topic("Новый блокчейн от банка")
+
+        # Битый файл не ломает работу: остается прежний снимок
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("{ не json")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 20_000_000))
+        assert not await config.reload_if_changed()
+        assert "coindesk.com" in config.get_sources_for_topic("Новый блокчейн от банка")
+
+        # Запись идет через временный файл и замену целиком
+        assert await config.add_custom_source("finance", "theblock.co")
+        assert not await config.add_custom_source("finance", "theblock.co")
+        saved = json.load(open(path, encoding='utf-8'))
+        assert "theblock.co" in saved["finance"]["domains"]
+        assert "theblock.co" in config.get_sources_for_topic("курс биткоина")
+        assert [name for name in os.listdir(tmp_dir) if name.startswith(".sources-")] == []
+        # Собственная запись не вызывает лишнюю перезагрузку
+        assert not await config.reload_if_changed()
+
+        assert await config.remove_source("finance", "theblock.co")
+        assert "theblock.co" not in config.get_sources_for_topic("курс биткоина")
+
+        # Фоновое слежение подхватывает изменения само
+        data = json.load(open(path, encoding='utf-8'))
+        data["science"]["domains"].append("thelancet.com")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 30_000_000))
+        task = config.start_watching(interval=0.02)
+        try:
+            for _ in range(100):
+                if "thelancet.com" in config.get_sources_for_topic("новая вакцина"):
+                    break
+                await asyncio.sleep(0.02)
+            assert "thelancet.com" in config.get_sources_for_topic("новая вакцина")
+        finally:
+            config.stop_watching()
+        await asyncio.gather(task, return_exceptions=True)
+    logger.info("✅ Конфигурация перезагружается без перезапуска")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты выбора источников...")
+
+    tests = [
+        test_automaton_matches_substrings,
+        test_sources_for_topic,
+        test_scales_with_keywords,
+        test_hot_reload_and_atomic_writes
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты выбора источников прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Тест локального спам-фильтра
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import os
+import random
+import tempfile
+import time
+from unittest.mock import AsyncMock, patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+
+from spam_filter import ClassificationLog, SpamFilter, evaluate, read_classification_log
+from two_stage_filter import TwoStageFilter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SPAM_TEMPLATES = [
+    "СУПЕР СКИДКА! {item} за {price} рублей! Жми ссылку!",
+    "Только сегодня!!! {item} бесплатно, переходи по ссылке bit.ly/{code}",
+    "Заработок от {price} в день без вложений! Пиши в личку @{code}",
+    "🔥🔥 Распродажа {item} -90%! Успей купить, осталось {price} штук!",
+    "Выиграй {item}! Подпишись на канал и жми репост, розыгрыш {price} призов",
+]
+HAM_TEMPLATES = [
+    "Центробанк сохранил ключевую ставку на уровне {price} процентов, сообщает агентство",
+    "Ученые опубликовали исследование о влиянии {item} на климат в журнале Nature",
+    "В Москве открылась выставка, посвященная истории {item}, вход по билетам",
+    "Компания представила отчет за квартал: выручка выросла на {price} процентов",
+    "Министерство заявило, что поставки {item} возобновятся в следующем месяце",
+]
+ITEMS = ["iPhone", "ноутбук", "кроссовки", "Samsung", "PlayStation", "часы", "нефть", "зерно"]
+
+
+def make_samples(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    samples = []
+    for i in range(count):
+        is_spam = i % 2 == 0
+        template = rng.choice(SPAM_TEMPLATES if is_spam else HAM_TEMPLATES)
+        text = template.format(item=rng.choice(ITEMS), price=rng.randint(1, 5000), code=rng.randint(100, 999))
+        samples.append((text, is_spam))
+    return samples
+
+
+async def test_train_and_predict():
+    """Обученная модель уверенно отделяет явный спам от новостей"""
+    logger.info("🧠 Тестируем обучение спам-фильтра...")
+
+    model = SpamFilter.train(make_samples(400))
+    spam = model.predict_proba("СУПЕР СКИДКА! iPhone за 1000 рублей! Жми ссылку!")
+    news = model.predict_proba("Центробанк сохранил ключевую ставку на уровне 16 процентов, сообщает агентство")
+    assert spam > 0.97, spam
+    assert news < 0.1, news
+
+    report = evaluate(model, make_samples(200, seed=2), thresholds=(0.97,))
+    row = report["thresholds"][0.97]
+    assert row["precision"] == 1.0 and row["recall"] > 0.8, row
+    logger.info("✅ Спам отделяется от новостей")
+
+
+async def test_save_and_load():
+    """Модель переживает сохранение и загрузку без изменения оценок"""
+    logger.info("💾 Тестируем сохранение модели...")
+
+    model = SpamFilter.train(make_samples(200))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model", "spam_model.json")
+        assert SpamFilter.load(path) is None
+        model.save(path)
+        loaded = SpamFilter.load(path)
+        text = "Выиграй часы! Подпишись на канал и жми репост"
+        assert abs(loaded.predict_proba(text) - model.predict_proba(text)) < 1e-3
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": 999}, f)
+        assert SpamFilter.load(path) is None
+    logger.info("✅ Модель сохраняется и загружается")
+
+
+async def test_prediction_latency():
+    """Оценка сообщения укладывается в миллисекунду, даже для длинного текста"""
+    logger.info("⚡ Тестируем скорость оценки...")
+
+    model = SpamFilter.train(make_samples(200))
+    texts = [text for text, _ in make_samples(200, seed=3)] + ["Очень длинный текст новости. " * 500]
+    started = time.perf_counter()
+    for text in texts:
+        model.predict_proba(text)
+    average = (time.perf_counter() - started) / len(texts)
+    assert average < 0.001, average
+    logger.info(f"✅ В среднем {average * 1000:.3f} мс на сообщение")
+
+
+async def test_classification_log():
+    """Журнал этапа 1 читается как обучающая выборка, повторы схлопываются"""
+    logger.info("📒 Тестируем журнал классификаций...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data", "stage1.jsonl")
+        log = ClassificationLog(path)
+        log.append("Жми ссылку, скидка 90%!", "spam", False)
+        log.append("Курс доллара вырос", "news", True)
+        log.append("жми  ссылку, скидка 90%!", "spam", False)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("{битая строка\n")
+
+        samples = sorted(read_classification_log(path), key=lambda sample: sample[1])
+        assert [is_spam for _, is_spam in samples] == [False, True]
+    logger.info("✅ Журнал читается корректно")
+
+
+async def test_analyze_message_skips_openai():
+    """Уверенный спам отсекается до кэша и этапов с OpenAI"""
+    logger.info("🚫 Тестируем спам-фильтр в analyze_message...")
+
+    filter_system = TwoStageFilter()
+    filter_system.spam_filter = SpamFilter.train(make_samples(400))
+
+    with patch.object(filter_system, '_analyze_uncached', new_callable=AsyncMock) as mock_analyze, \
+            patch('two_stage_filter.Config.DEBUG_MODE', True):
+        mock_analyze.return_value = ("новости", "Достоверно", None)
+
+        category, comment, debug = await filter_system.analyze_message(
+            "СУПЕР СКИДКА! Samsung за 990 рублей! Жми ссылку!", "Test"
+        )
+        assert (category, comment) == ("скрыто", "Определено как спам")
+        assert debug.classification == "spam" and debug.spam_filter_score >= 0.97
+        assert mock_analyze.await_count == 0
+
+        category, _, _ = await filter_system.analyze_message(
+            "Министерство заявило, что поставки зерна возобновятся в следующем месяце", "Test"
+        )
+        assert category == "новости"
+        assert mock_analyze.await_count == 1
+    logger.info("✅ Спам не доходит до OpenAI")
+
+
+async def test_stage1_logging():
+    """Классификации этапа 1 пишутся в журнал, резервный ответ — нет"""
+    logger.info("📝 Тестируем запись журнала этапа 1...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stage1.jsonl")
+        filter_system = TwoStageFilter()
+        filter_system.stage1_log = ClassificationLog(path)
+
+        analyses = [
+            {"classification": "spam", "requires_fact_check": False, "skip_reason": "Реклама"},
+            {"classification": "other", "requires_fact_check": True, "fallback": True},
+        ]
+        with patch.object(filter_system, '_stage1_select_sources', new_callable=AsyncMock) as mock_stage1, \
+                patch.object(filter_system, '_stage2_fact_check', new_callable=AsyncMock) as mock_stage2:
+            mock_stage1.side_effect = [([], analysis) for analysis in analyses]
+            mock_stage2.return_value = ("другое", "")
+            await filter_system.analyze_message("Купи слона со скидкой прямо сейчас", "Test")
+            await filter_system.analyze_message("Сообщение, на которое модель не ответила", "Test")
+            await asyncio.gather(*filter_system._background_tasks)
+
+        samples = read_classification_log(path)
+        assert samples == [("Купи слона со скидкой прямо сейчас", True)]
+    logger.info("✅ Журнал этапа 1 пополняется")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты спам-фильтра...")
+
+    tests = [
+        test_train_and_predict,
+        test_save_and_load,
+        test_prediction_latency,
+        test_classification_log,
+        test_analyze_message_skips_openai,
+        test_stage1_logging
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты спам-фильтра прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
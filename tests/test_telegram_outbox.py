@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Тест исходящей очереди Telegram
+"""
+
+import asyncio
+import logging
+import sys
+import os
+import time
+
+from pyrogram.errors import FloodWait
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from telegram_outbox import TelegramOutbox
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class RecordingBot:
+    """Бот, записывающий вызовы и при необходимости отвечающий FloodWait"""
+
+    def __init__(self, flood_waits=0, edit_delay=0.0):
+        self.calls = []
+        self.flood_waits = flood_waits
+        self.edit_delay = edit_delay
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.flood_waits:
+            self.flood_waits -= 1
+            raise FloodWait(value=1)
+        self.calls.append(("send", chat_id, text, time.monotonic()))
+        return len(self.calls)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await asyncio.sleep(self.edit_delay)
+        self.calls.append(("edit", chat_id, text, time.monotonic()))
+        return message_id
+
+
+async def test_chat_pacing():
+    """Вызовы в один чат разнесены во времени, разные чаты не ждут друг друга"""
+    logger.info("🐢 Тестируем темп отправки...")
+
+    outbox = TelegramOutbox(global_rate=1000, chat_interval=0.1, flood_wait_max=5, max_retries=2)
+    bot = RecordingBot()
+
+    await asyncio.gather(*[outbox.send_message(bot, chat_id=1, text=f"сообщение {i}") for i in range(3)],
+                         outbox.send_message(bot, chat_id=2, text="другой чат"))
+
+    chat1 = [call[3] for call in bot.calls if call[1] == 1]
+    assert [call[2] for call in bot.calls if call[1] == 1] == ["сообщение 0", "сообщение 1", "сообщение 2"]
+    assert chat1[2] - chat1[0] >= 0.19
+    other = next(call[3] for call in bot.calls if call[1] == 2)
+    assert other - chat1[0] < 0.05
+    logger.info("✅ Темп соблюдается по чатам")
+
+
+async def test_flood_wait_retry():
+    """FloodWait пережидается и вызов повторяется, а не превращается в ошибку"""
+    logger.info("🌊 Тестируем FloodWait...")
+
+    outbox = TelegramOutbox(global_rate=1000, chat_interval=0, flood_wait_max=5, max_retries=2)
+    bot = RecordingBot(flood_waits=1)
+    started = time.monotonic()
+    await outbox.send_message(bot, chat_id=1, text="после паузы")
+    assert bot.calls[0][2] == "после паузы"
+    assert time.monotonic() - started >= 0.95
+    assert outbox.flood_waits == 1
+
+    # Слишком долгий FloodWait пробрасывается сразу
+    outbox = TelegramOutbox(global_rate=1000, chat_interval=0, flood_wait_max=0.5, max_retries=2)
+    try:
+        await outbox.send_message(RecordingBot(flood_waits=1), chat_id=1, text="x")
+        assert False, "ожидался FloodWait"
+    except FloodWait:
+        pass
+    logger.info("✅ FloodWait обрабатывается")
+
+
+async def test_edits_coalesce():
+    """Правки, ждущие отправки, схлопываются в последнюю"""
+    logger.info("🧩 Тестируем схлопывание правок...")
+
+    outbox = TelegramOutbox(global_rate=1000, chat_interval=0.05, flood_wait_max=5, max_retries=2)
+    bot = RecordingBot(edit_delay=0.05)
+
+    first = asyncio.create_task(outbox.edit_message_text(bot, chat_id=1, message_id=7, text="шаг 1"))
+    await asyncio.sleep(0.01)  # "шаг 1" уже отправляется
+    rest = [asyncio.create_task(outbox.edit_message_text(bot, chat_id=1, message_id=7, text=f"шаг {i}"))
+            for i in range(2, 5)]
+    results = await asyncio.gather(first, *rest)
+
+    assert [call[2] for call in bot.calls] == ["шаг 1", "шаг 4"]
+    assert results == [7, 7, 7, 7]
+    assert outbox.coalesced == 2
+    logger.info("✅ Промежуточные правки не отправляются")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты исходящей очереди Telegram...")
+
+    tests = [
+        test_chat_pacing,
+        test_flood_wait_retry,
+        test_edits_coalesce
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты исходящей очереди прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Тест трассировки: вложенность спанов, один trace id на сообщение, экспорт и отчет
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+os.environ.setdefault('JOB_QUEUE_ENABLED', 'false')
+# Без пауз исходящей очереди Telegram между вызовами MockBot
+os.environ.setdefault('TELEGRAM_CHAT_INTERVAL', '0')
+
+import tracing
+from command_handler import CommandHandler
+from openai_limiter import RateLimitedOpenAI
+from tracing import JsonlExporter, OtlpHttpExporter, folded_stacks, read_spans, span, summarize_spans
+from two_stage_filter import DebugInfo
+from test_translation_formatting import MockBot, MockMessage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MemoryExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+def collect(run):
+    """Выполняет корутину с трассировкой в память и возвращает завершенные спаны"""
+    async def wrapper():
+        exporter = MemoryExporter()
+        tracing.configure(exporter, flush_interval=0.01)
+        try:
+            await run()
+        finally:
+            tracing.configure(None)
+        return {item.name: item for item in exporter.spans}, exporter.spans
+    return wrapper()
+
+
+async def test_nesting_and_status():
+    """Дочерние спаны — в той же трассе, в том числе из create_task; ошибки и отмены помечаются"""
+    logger.info("🧵 Тестируем вложенность спанов...")
+
+    async def run():
+        with span("root", chat_id=1) as root:
+            root.set_attribute("extra", True)
+
+            async def child():
+                with span("child"):
+                    await asyncio.sleep(0.01)
+            await asyncio.create_task(child())
+
+            try:
+                with span("failing"):
+                    raise ValueError("boom")
+            except ValueError:
+                pass
+
+            async def slow():
+                with span("cancelled"):
+                    await asyncio.sleep(10)
+            task = asyncio.create_task(slow())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    by_name, spans = await collect(run)
+    root = by_name["root"]
+    assert root.parent_id is None and root.attributes == {"chat_id": 1, "extra": True}
+    assert {item.trace_id for item in spans} == {root.trace_id}
+    assert by_name["child"].parent_id == root.span_id
+    assert by_name["child"].duration >= 0.01
+    assert by_name["failing"].status == "error" and "boom" in by_name["failing"].error
+    assert by_name["cancelled"].status == "cancelled"
+
+    # Вне спана контекста нет, выключенная трассировка ничего не пишет
+    assert tracing.current_trace_context() is None
+    with span("disabled") as disabled:
+        disabled.set_attribute("ignored", 1)
+    assert disabled is tracing.NOOP_SPAN
+    logger.info("✅ Спаны вложены в одну трассу")
+
+
+async def test_message_trace():
+    """Сообщение — одна трасса: Telegram, допуск, пайплайн и OpenAI под корневым спаном"""
+    logger.info("📨 Тестируем трассу сообщения...")
+
+    class FakeCompletions:
+        async def create(self, **kwargs):
+            return SimpleNamespace(usage=SimpleNamespace(total_tokens=42))
+
+    client = RateLimitedOpenAI(
+        SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()), responses=SimpleNamespace(create=None)),
+        rpm=100, tpm=0, model_rpm={}, model_tpm={}
+    )
+    handler = CommandHandler()
+    bot = MockBot()
+
+    async def pipeline(text, channel_name):
+        await client.chat.completions.create(model="gpt-test", messages=[{"role": "user", "content": text}])
+        return "новости", "Достоверно", DebugInfo(confidence_score=95, verification_status="confirmed")
+
+    async def run():
+        with patch.object(handler.two_stage_filter, '_analyze_uncached', side_effect=pipeline):
+            await handler.handle_fact_check(bot, MockMessage("Discord объявил новую функцию модерации"))
+
+    by_name, spans = await collect(run)
+    root = by_name["telegram.message"]
+    assert root.parent_id is None and root.attributes["chat_id"] == 12345
+    assert {item.trace_id for item in spans} == {root.trace_id}, "все спаны сообщения в одной трассе"
+    assert by_name["analyze_message"].attributes["verification_status"] == "confirmed"
+    assert by_name["openai.chat.completions"].attributes["model"] == "gpt-test"
+    assert by_name["openai.chat.completions"].attributes["total_tokens"] == 42
+    assert "telegram.send_message" in by_name and "telegram.edit_message_text" in by_name
+    assert "95%" in bot.messages[-1]["text"]
+    logger.info("✅ Сообщение трассируется целиком")
+
+
+async def test_jsonl_report():
+    """Спаны в JSONL, свернутые стеки учитывают собственное время и параллельных детей один раз"""
+    logger.info("🔥 Тестируем экспорт и флейм-граф...")
+
+    path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    tracing.configure(JsonlExporter(path), flush_interval=0.01)
+    try:
+        with span("root"):
+            async def attempt():
+                with span("attempt"):
+                    await asyncio.sleep(0.05)
+            await asyncio.gather(attempt(), attempt())
+    finally:
+        tracing.configure(None)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("not json\n")
+
+    spans = read_spans(path)
+    assert len(spans) == 3
+    stacks = folded_stacks(spans)
+    root_ms = next(item for item in spans if item["name"] == "root")["duration_ms"]
+    # Две параллельные попытки по 50 мс перекрываются: собственное время корня почти нулевое
+    assert stacks.get("root", 0) < root_ms * 1000 * 0.5
+    assert stacks["root;attempt"] >= 2 * 45000
+
+    rows = {row["name"]: row for row in summarize_spans(spans)}
+    assert rows["attempt"]["count"] == 2 and rows["root"]["count"] == 1
+    logger.info("✅ Отчет по трассам строится")
+
+
+async def test_otlp_exporter():
+    """Экспорт в OTLP/HTTP коллектор в JSON-кодировании"""
+    logger.info("📡 Тестируем OTLP-экспорт...")
+
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        exporter = OtlpHttpExporter(f"http://127.0.0.1:{server.server_port}/v1/traces", "test-service")
+        tracing.configure(exporter, flush_interval=0.01)
+        with span("parent", attempt=2, ratio=0.5, cached=False):
+            try:
+                with span("child"):
+                    raise RuntimeError("timeout")
+            except RuntimeError:
+                pass
+        tracing.configure(None)
+    finally:
+        server.shutdown()
+
+    resource = received[0]["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0] == {"key": "service.name", "value": {"stringValue": "test-service"}}
+    spans = {item["name"]: item for batch in received for item in batch["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    parent, child = spans["parent"], spans["child"]
+    assert child["parentSpanId"] == parent["spanId"] and len(parent["traceId"]) == 32
+    assert {"key": "attempt", "value": {"intValue": "2"}} in parent["attributes"]
+    assert {"key": "cached", "value": {"boolValue": False}} in parent["attributes"]
+    assert child["status"]["code"] == 2 and "timeout" in child["status"]["message"]
+    logger.info("✅ OTLP-экспорт работает")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты трассировки...")
+
+    tests = [
+        test_nesting_and_status,
+        test_message_trace,
+        test_jsonl_report,
+        test_otlp_exporter
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты трассировки прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -7,13 +7,30 @@ import asyncio
 import logging
 import sys
 import os
+import json
+import tempfile
 from unittest.mock import AsyncMock, MagicMock, patch
 
 # Добавляем src в path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from two_stage_filter import TwoStageFilter, DebugInfo
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+os.environ.setdefault('JOB_QUEUE_ENABLED', 'false')
+# Без пауз исходящей очереди Telegram между вызовами MockBot
+os.environ.setdefault('TELEGRAM_CHAT_INTERVAL', '0')
+
+from two_stage_filter import TRANSLATION_BATCH_SEGMENTS, TwoStageFilter, DebugInfo
+from translation_memory import TranslationMemory, split_segments
 from command_handler import CommandHandler
+from pipeline_events import (
+    FinalVerdict, PartialVerdict, SourcesChosen, Stage1Completed, Stage2AttemptFailed,
+    Stage2AttemptStarted, emit
+)
 from config import Config
 
 logging.basicConfig(level=logging.INFO)
@@ -35,7 +52,7 @@ class MockBot:
         self.messages.append({"chat_id": chat_id, "message_id": message_id, "text": text, "edited": True})
     
     async def delete_messages(self, chat_id, message_ids):
-        pass
+        self.messages.append({"chat_id": chat_id, "deleted": message_ids})
 
 class MockMessage:
     """Mock объект сообщения для тестирования"""
@@ -66,8 +83,10 @@ async def test_translation_functionality():
         debug_info.contradictions = "No contradictions found in multiple sources"
         debug_info.missing_evidence = "No additional evidence needed for this confirmed information"
         
-        # Мокаем перевод, чтобы не делать реальные API вызовы
-        with patch.object(filter_system, '_translate_text') as mock_translate:
+        # Мокаем перевод, чтобы не делать реальные API вызовы.
+        # Пакетный ответ не разобран — срабатывает перевод по полям
+        with patch.object(filter_system, '_translate_fields_batch', return_value={}), \
+             patch.object(filter_system, '_translate_text') as mock_translate:
             mock_translate.side_effect = [
                 "Объявление подтверждено официальным блогом Discord от 15 марта 2024 года",
                 "Противоречий в нескольких источниках не найдено", 
@@ -92,6 +111,181 @@ async def test_translation_functionality():
         # Восстанавливаем оригинальные настройки
         Config.TRANSLATE_TO_RUSSIAN = original_translate
 
+def _mock_completion(content):
+    """Собирает ответ chat.completions с заданным текстом"""
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    return response
+
+async def test_batch_translation():
+    """Тест пакетного перевода всех полей одним запросом"""
+    logger.info("📦 Тестируем пакетный перевод...")
+    
+    original_translate = Config.TRANSLATE_TO_RUSSIAN
+    Config.TRANSLATE_TO_RUSSIAN = True
+    
+    try:
+        filter_system = TwoStageFilter()
+        
+        debug_info = DebugInfo()
+        debug_info.detailed_findings = "The announcement was confirmed by official Discord blog post"
+        debug_info.contradictions = "No contradictions found"
+        debug_info.missing_evidence = "Exact launch date is not specified"
+        
+        batch_answer = _mock_completion(
+            '{"detailed_findings": "Объявление подтверждено официальным блогом Discord", '
+            '"contradictions": "Противоречий не найдено", '
+            '"missing_evidence": "Точная дата запуска не указана"}'
+        )
+        create = AsyncMock(return_value=batch_answer)
+        
+        with patch.object(filter_system.client.chat.completions, 'create', create), \
+             patch.object(filter_system, '_translate_text') as mock_translate:
+            await filter_system._translate_comment_fields(debug_info)
+            
+            assert create.call_count == 1
+            assert create.call_args.kwargs["response_format"] == {"type": "json_object"}
+            assert mock_translate.call_count == 0
+            assert debug_info.detailed_findings == "Объявление подтверждено официальным блогом Discord"
+            assert debug_info.contradictions == "Противоречий не найдено"
+            assert debug_info.missing_evidence == "Точная дата запуска не указана"
+        
+        # Поле, пропущенное в пакетном ответе, переводится отдельно
+        debug_info = DebugInfo()
+        debug_info.detailed_findings = "Confirmed by official sources"
+        debug_info.special_notes = "Fresh content, search index may lag"
+        create = AsyncMock(return_value=_mock_completion('{"detailed_findings": "Подтверждено официальными источниками"}'))
+        
+        with patch.object(filter_system.client.chat.completions, 'create', create), \
+             patch.object(filter_system, '_translate_text', return_value="Свежий контент") as mock_translate:
+            await filter_system._translate_comment_fields(debug_info)
+            
+            assert mock_translate.call_count == 1
+            assert debug_info.detailed_findings == "Подтверждено официальными источниками"
+            assert debug_info.special_notes == "Свежий контент"
+        
+        logger.info("✅ Пакетный перевод работает корректно")
+    
+    finally:
+        Config.TRANSLATE_TO_RUSSIAN = original_translate
+
+async def test_translation_memory():
+    """Тест памяти переводов: повторяющиеся предложения не переводятся заново"""
+    logger.info("🧠 Тестируем память переводов...")
+    
+    original_translate = Config.TRANSLATE_TO_RUSSIAN
+    Config.TRANSLATE_TO_RUSSIAN = True
+    
+    async def fake_batch(**kwargs):
+        # Модель "переводит" каждое значение, добавляя префикс
+        prompt = kwargs["messages"][0]["content"]
+        payload = json.loads(prompt[prompt.index("{"):prompt.rindex("}") + 1])
+        return _mock_completion(json.dumps({key: f"RU: {value}" for key, value in payload.items()}))
+    
+    try:
+        assert split_segments("No official statement was found. The claim is viral!  Check X.com later.") == [
+            "No official statement was found.", "The claim is viral!", "Check X.com later."
+        ]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            filter_system = TwoStageFilter()
+            filter_system.translation_memory = TranslationMemory(db_path=os.path.join(tmp, "tm.sqlite3"))
+            create = AsyncMock(side_effect=fake_batch)
+            repeated = "No official statement was found on the specified domains."
+            
+            with patch.object(filter_system.client.chat.completions, 'create', create):
+                first = DebugInfo(detailed_findings=f"{repeated} Discord blog is silent.",
+                                  missing_evidence=repeated)
+                await filter_system._translate_comment_fields(first)
+                assert create.call_count == 1
+                assert first.detailed_findings == f"RU: {repeated} RU: Discord blog is silent."
+                assert first.missing_evidence == f"RU: {repeated}"
+                
+                # Те же поля — ни одного запроса к модели
+                second = DebugInfo(detailed_findings=f"{repeated} Discord blog is silent.",
+                                   missing_evidence=repeated)
+                await filter_system._translate_comment_fields(second)
+                assert create.call_count == 1
+                assert second.detailed_findings == first.detailed_findings
+                
+                # Новое предложение — в запрос уходит только оно
+                third = DebugInfo(detailed_findings=f"{repeated} Reuters reported a delay.")
+                await filter_system._translate_comment_fields(third)
+                assert create.call_count == 2
+                prompt = create.call_args.kwargs["messages"][0]["content"]
+                assert "Reuters reported a delay." in prompt and repeated not in prompt
+                assert third.detailed_findings == f"RU: {repeated} RU: Reuters reported a delay."
+            
+            stats = filter_system.translation_memory.stats()
+            logger.info(f"📊 Статистика памяти переводов: {stats}")
+            assert stats["requests_saved"] == 1
+            assert stats["hits"] == 3 and stats["misses"] == 3
+        
+        # Размер ограничен, вытесняются давно не использованные сегменты
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = TranslationMemory(db_path=os.path.join(tmp, "tm.sqlite3"), max_entries=2)
+            await memory.store({"First.": "Первое."})
+            await memory.store({"Second.": "Второе."})
+            await memory.lookup(["First."])
+            await memory.store({"Third.": "Третье."})
+            assert await memory.lookup(["First.", "Second.", "Third."]) == {"First.": "Первое.", "Third.": "Третье."}
+        
+        logger.info("✅ Память переводов работает корректно")
+    
+    finally:
+        Config.TRANSLATE_TO_RUSSIAN = original_translate
+
+async def test_translation_memory_layout():
+    """Память переводов сохраняет переносы строк, нумерацию и сокращения; длинные отчеты — несколькими пакетами"""
+    logger.info("📐 Тестируем разбиение на сегменты...")
+    
+    original_translate = Config.TRANSLATE_TO_RUSSIAN
+    Config.TRANSLATE_TO_RUSSIAN = True
+    
+    async def fake_batch(**kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        payload = json.loads(prompt[prompt.index("{"):prompt.rindex("}") + 1])
+        return _mock_completion(json.dumps({key: f"RU: {value}" for key, value in payload.items()}))
+    
+    try:
+        assert split_segments("Dr. Smith confirmed it. U.S. officials agreed.") == [
+            "Dr. Smith confirmed it.", "U.S. officials agreed."
+        ]
+        assert split_segments("Sources: 1. Reuters 2. AP") == ["Sources: 1. Reuters 2. AP"]
+        
+        findings = "Findings:\n1. Reuters confirmed the launch.\n2. AP cited Dr. Smith.\n\nNo contradictions found."
+        assert split_segments(findings) == [
+            "Findings:", "1. Reuters confirmed the launch.", "2. AP cited Dr. Smith.", "No contradictions found."
+        ]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            filter_system = TwoStageFilter()
+            filter_system.translation_memory = TranslationMemory(db_path=os.path.join(tmp, "tm.sqlite3"))
+            create = AsyncMock(side_effect=fake_batch)
+            
+            with patch.object(filter_system.client.chat.completions, 'create', create):
+                debug = DebugInfo(detailed_findings=findings)
+                await filter_system._translate_comment_fields(debug)
+                assert debug.detailed_findings == (
+                    "RU: Findings:\nRU: 1. Reuters confirmed the launch.\nRU: 2. AP cited Dr. Smith.\n\n"
+                    "RU: No contradictions found."
+                )
+                
+                # Сегментов больше, чем помещается в один ответ модели
+                count = TRANSLATION_BATCH_SEGMENTS + 5
+                create.reset_mock()
+                long_report = DebugInfo(detailed_findings=" ".join(f"Source number {i} agrees." for i in range(count)))
+                await filter_system._translate_comment_fields(long_report)
+                assert create.call_count == 2
+                assert all(call.kwargs["max_completion_tokens"] <= 16384 for call in create.call_args_list)
+                assert long_report.detailed_findings.count("RU: ") == count
+        
+        logger.info("✅ Разбиение на сегменты сохраняет разметку")
+    
+    finally:
+        Config.TRANSLATE_TO_RUSSIAN = original_translate
+
 async def test_formatting_with_all_fields():
     """Тест форматирования с отображением всех полей отдельно"""
     logger.info("📝 Тестируем форматирование с раздельными полями...")
@@ -181,14 +375,16 @@ async def test_integration_mock_fact_check():
             # Выполняем fact check
             await handler.handle_fact_check(bot, message)
             
-            # Проверяем что сообщения были отправлены
-            assert len(bot.messages) >= 2  # processing + result или delete
+            # Одно сообщение-ответ, которое правится на месте, без отправки и удаления
+            sent_messages = [msg for msg in bot.messages if "reply_to" in msg]
+            assert len(sent_messages) == 1 and sent_messages[0]["reply_to"] == message.id
+            assert not any("deleted" in msg for msg in bot.messages)
             
-            # Находим итоговое сообщение результата (последнее send_message)
-            result_messages = [msg for msg in bot.messages if msg.get("reply_to") is not None]
+            # Итоговый результат — последняя правка сообщения
+            result_messages = [msg for msg in bot.messages if msg.get("edited")]
             assert len(result_messages) > 0
             
-            result_text = result_messages[0]["text"]
+            result_text = result_messages[-1]["text"]
             logger.info("📨 Итоговое сообщение:")
             logger.info(result_text)
             
@@ -204,6 +400,54 @@ async def test_integration_mock_fact_check():
     finally:
         Config.TRANSLATE_TO_RUSSIAN = original_translate
 
+async def test_progress_events():
+    """События пайплайна доходят до обработчика и превращаются в правки сообщения"""
+    logger.info("📡 Тестируем прогресс проверки...")
+
+    handler = CommandHandler()
+    filter_system = handler.two_stage_filter
+    debug_info = DebugInfo(confidence_score=92, verification_status="confirmed", sources_found=["discord.com"])
+
+    async def pipeline(text, channel_name):
+        emit(Stage1Completed(classification="news", requires_fact_check=True, elapsed=2.0))
+        emit(SourcesChosen(["discord.com", "theverge.com"]))
+        emit(Stage2AttemptStarted(attempt=1, total=2, domains=["discord.com"]))
+        emit(Stage2AttemptFailed(attempt=1, timed_out=True))
+        emit(Stage2AttemptStarted(attempt=2, total=2, domains=["theverge.com"]))
+        emit(PartialVerdict(verification_status="confirmed", confidence_score=92, category="news"))
+        return "новости", "Достоверно", debug_info
+
+    with patch.object(filter_system, '_analyze_uncached', side_effect=pipeline):
+        events = [event async for event in filter_system.analyze_message_events("Discord объявил функцию", "Test")]
+    assert [type(event) for event in events] == [
+        Stage1Completed, SourcesChosen, Stage2AttemptStarted, Stage2AttemptFailed,
+        Stage2AttemptStarted, PartialVerdict, FinalVerdict
+    ]
+    assert events[-1].category == "новости" and events[-1].debug.confidence_score == 92
+
+    # Без ограничения частоты каждое событие дает правку, итог — последняя правка
+    original_interval = Config.PROGRESS_EDIT_INTERVAL
+    try:
+        Config.PROGRESS_EDIT_INTERVAL = 0
+        bot = MockBot()
+        with patch.object(filter_system, '_analyze_uncached', side_effect=pipeline):
+            await handler.handle_fact_check(bot, MockMessage("Discord объявил новую функцию модерации"))
+        edits = [msg["text"] for msg in bot.messages if msg.get("edited")]
+        assert len(edits) == 7
+        assert "попытка 2 из 2" in edits[4] and "не ответили вовремя" in edits[4]
+        assert "92%" in edits[-1] and "Проверяю факты" not in edits[-1]
+
+        # С ограничением частоты промежуточных правок нет, только итоговая
+        Config.PROGRESS_EDIT_INTERVAL = 60
+        bot = MockBot()
+        with patch.object(filter_system, '_analyze_uncached', side_effect=pipeline):
+            await handler.handle_fact_check(bot, MockMessage("Discord объявил новую функцию модерации!"))
+        edits = [msg["text"] for msg in bot.messages if msg.get("edited")]
+        assert len(edits) == 1 and "92%" in edits[0]
+    finally:
+        Config.PROGRESS_EDIT_INTERVAL = original_interval
+    logger.info("✅ Прогресс отображается правками одного сообщения")
+
 async def test_comment_full_translation():
     """Тест полного перевода комментария без английских фраз"""
     logger.info("🌐 Тестируем полный перевод комментария...")
@@ -290,9 +534,13 @@ async def run_all_tests():
     
     tests = [
         test_translation_functionality,
+        test_batch_translation,
+        test_translation_memory,
+        test_translation_memory_layout,
         test_formatting_with_all_fields,
         test_formatting_with_missing_fields,
         test_integration_mock_fact_check,
+        test_progress_events,
         test_comment_full_translation
     ]
     
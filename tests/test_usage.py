@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Тест учета токенов и стоимости: расход по этапам, дневной журнал и бюджеты пользователей
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Тесты всегда прогоняют пайплайн целиком, без кэшей на диске
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+os.environ.setdefault('USAGE_LEDGER_ENABLED', 'false')
+os.environ.setdefault('JOB_QUEUE_ENABLED', 'false')
+
+from command_handler import ECONOMY_NOTE, CommandHandler
+from openai_limiter import RateLimitedOpenAI
+from two_stage_filter import TwoStageFilter
+from usage import CheckUsage, UsageLedger, estimate_cost, extract_usage, price_for
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHORT_CLAIM = "Apple выпустила iPhone 17 в сентябре"
+CONFIRMED = json.dumps({
+    "needs_fact_check": True,
+    "classification": "news",
+    "reasoning": "Проверяемое утверждение о продукте",
+    "verification_status": "confirmed",
+    "confidence_score": 93,
+    "category": "news",
+    "detailed_findings": "Apple newsroom confirms the release",
+})
+
+
+class FakeOpenAI:
+    """Ответы Responses API (один проход) и Chat Completions (перевод) с usage"""
+
+    def __init__(self):
+        self.requests = []
+        self.completions = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_completion))
+        self.responses = SimpleNamespace(create=self.create_response, retrieve=self.retrieve_response)
+
+    async def create_response(self, **kwargs):
+        self.requests.append(kwargs)
+        return SimpleNamespace(
+            id=f"resp_{len(self.requests)}", status="completed", output_text=CONFIRMED,
+            output=[{"type": "web_search_call"}, {"type": "message"}],
+            usage=SimpleNamespace(input_tokens=1000, output_tokens=200)
+        )
+
+    async def retrieve_response(self, response_id):
+        raise AssertionError("завершенный ответ не опрашивается")
+
+    async def create_completion(self, **kwargs):
+        self.completions += 1
+        content = json.dumps({"detailed_findings": "Подтверждено пресс-службой Apple"}, ensure_ascii=False)
+        return SimpleNamespace(
+            id=f"chatcmpl_{self.completions}",
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=300, completion_tokens=100)
+        )
+
+
+def make_filter(fake: FakeOpenAI) -> TwoStageFilter:
+    filter_system = TwoStageFilter()
+    filter_system.client = RateLimitedOpenAI(fake, rpm=100, tpm=0, model_rpm={}, model_tpm={})
+    filter_system.streaming_available = False
+    return filter_system
+
+
+def pipeline_patches():
+    return (
+        patch('two_stage_filter.Config.PIPELINE_MODE', 'auto'),
+        patch('two_stage_filter.Config.TRANSLATE_TO_RUSSIAN', True),
+    )
+
+
+async def test_usage_extraction_and_prices():
+    """Usage из Chat Completions и Responses API, цена снапшотов по префиксу, один ответ — один раз"""
+    logger.info("🧮 Тестируем разбор usage...")
+
+    chat = SimpleNamespace(id="chatcmpl_1", usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+    responses = SimpleNamespace(
+        id="resp_1", usage=SimpleNamespace(input_tokens=100, output_tokens=20),
+        output=[SimpleNamespace(type="web_search_call"), {"type": "web_search_call"}, {"type": "message"}]
+    )
+    assert extract_usage(chat) == (10, 5, 0)
+    assert extract_usage(responses) == (100, 20, 2)
+    assert extract_usage(SimpleNamespace(id="resp_2", status="queued", usage=None)) is None
+
+    assert price_for("gpt-4o-2024-08-06") == (2.5, 10.0)
+    assert price_for("gpt-4o-mini-2024-07-18") == (0.15, 0.6)
+    assert price_for("unknown-model") is None
+    assert abs(estimate_cost("gpt-4o", 1_000_000, 100_000, 1) - (2.5 + 1.0 + 0.01)) < 1e-9
+
+    usage = CheckUsage()
+    assert usage.add_response("stage2", "gpt-4o", responses)
+    assert not usage.add_response("stage2", "gpt-4o", responses), "повторный ответ не учитывается"
+    assert usage.total_tokens == 120
+    logger.info("✅ Usage разбирается, цены считаются")
+
+
+async def test_pipeline_usage_by_stage():
+    """Каждый вызов OpenAI попадает в DebugInfo по своему этапу, веб-поиск учитывается"""
+    logger.info("📊 Тестируем расход по этапам...")
+
+    fake = FakeOpenAI()
+    filter_system = make_filter(fake)
+    usage = CheckUsage()
+    mode, translate = pipeline_patches()
+    with mode, translate:
+        category, comment, debug = await filter_system.analyze_message(SHORT_CLAIM, "Test", usage=usage)
+
+    assert debug.pipeline_mode == "single_pass" and category == "news"
+    assert debug.detailed_findings == "Подтверждено пресс-службой Apple"
+    single_pass = debug.token_usage["single_pass"]
+    translation = debug.token_usage["translation"]
+    assert (single_pass["calls"], single_pass["prompt_tokens"], single_pass["completion_tokens"]) == (1, 1000, 200)
+    assert single_pass["web_search_calls"] == 1
+    assert (translation["prompt_tokens"], translation["completion_tokens"]) == (300, 100)
+    expected = estimate_cost("gpt-4o", 1000, 200, 1) + estimate_cost("gpt-4o", 300, 100)
+    assert abs(debug.cost_usd - expected) < 1e-6 and abs(usage.cost_usd - expected) < 1e-9
+    assert usage.total_tokens == 1600
+    logger.info("✅ Расход разложен по этапам")
+
+
+async def test_ledger_and_budget():
+    """Журнал суммирует расход по пользователю, модели и этапу; сверх бюджета — экономный режим"""
+    logger.info("💸 Тестируем дневной бюджет...")
+
+    ledger = UsageLedger(os.path.join(tempfile.mkdtemp(), "usage.sqlite3"))
+    fake = FakeOpenAI()
+    handler = CommandHandler()
+    handler.two_stage_filter = make_filter(fake)
+    handler.usage_ledger = ledger
+    steps = []
+
+    async def on_step(step):
+        steps.append(step)
+
+    mode, translate = pipeline_patches()
+    with mode, translate, patch('usage.Config.USER_DAILY_BUDGET_USD', 0.01), \
+            patch('two_stage_filter.Config.BUDGET_DOMAIN_LIMIT', 1):
+        first = await handler.run_check(SHORT_CLAIM, "Пользователь A", on_step, user_id=1)
+        other_user = await handler.run_check(SHORT_CLAIM, "Пользователь B", on_step, user_id=2)
+        second = await handler.run_check(SHORT_CLAIM, "Пользователь A", on_step, user_id=1)
+
+    assert ECONOMY_NOTE not in first and ECONOMY_NOTE not in other_user
+    assert ECONOMY_NOTE in second
+    # Экономная проверка: без перевода, один домен
+    assert fake.completions == 2
+    assert len(fake.requests[-1]["tools"][0]["filters"]["allowed_domains"]) == 1
+    assert len(fake.requests[0]["tools"][0]["filters"]["allowed_domains"]) > 1
+
+    tokens, cost = await ledger.spent(1)
+    assert tokens == 1600 + 1200 and cost > 0.01
+    by_user = {row["user_id"]: row for row in ledger.report(group_by="user_id")}
+    assert by_user["1"]["checks"] == 2 and by_user["2"]["checks"] == 1
+    by_stage = {row["stage"]: row for row in ledger.report(group_by="stage")}
+    assert by_stage["single_pass"]["web_search_calls"] == 3 and by_stage["translation"]["calls"] == 2
+    assert [row["model"] for row in ledger.report(group_by="model")] == ["gpt-4o"]
+    ledger.close()
+    logger.info("✅ Бюджет переключает на экономный режим")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты учета расхода...")
+
+    tests = [
+        test_usage_extraction_and_prices,
+        test_pipeline_usage_by_stage,
+        test_ledger_and_budget
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты учета расхода прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
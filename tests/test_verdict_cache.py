@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Тест кэша вердиктов
+"""
+
+import asyncio
+import logging
+import sys
+import os
+import random
+import tempfile
+import time
+from unittest.mock import patch
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Хранилища по умолчанию не создаем — тесты работают с временными базами
+os.environ.setdefault('VERDICT_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRANSLATION_MEMORY_ENABLED', 'false')
+os.environ.setdefault('SPAM_FILTER_ENABLED', 'false')
+os.environ.setdefault('STAGE1_LOG_ENABLED', 'false')
+
+from verdict_cache import VerdictCache, normalize_text, text_key
+from near_duplicate import NearDuplicateIndex, simhash, guard_signature
+from two_stage_filter import TwoStageFilter, DebugInfo
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def test_normalized_key():
+    """Ключ не зависит от регистра, пробелов и ё/е"""
+    logger.info("🔑 Тестируем нормализацию ключа...")
+
+    assert normalize_text("  Биткоин   упал\nна 20%  ") == "биткоин упал на 20%"
+    assert text_key("Ёлка   выросла") == text_key("елка выросла")
+    assert text_key("Discord") != text_key("Discord!")
+    logger.info("✅ Нормализация работает корректно")
+
+
+async def test_memory_and_disk_tiers():
+    """Запись попадает в оба уровня, диск переживает перезапуск"""
+    logger.info("💾 Тестируем уровни кэша...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        cache = VerdictCache(db_path=db_path, memory_size=2)
+        payload = {"category": "новости", "comment": "Достоверно", "debug": {}}
+
+        assert await cache.get("Discord объявил новую функцию") is None
+        await cache.put("Discord объявил новую функцию", payload, "news")
+        assert await cache.get("discord  объявил новую функцию") == payload
+        assert cache.stats()["hits_memory"] == 1
+
+        # Новый экземпляр: память пуста, ответ приходит из SQLite
+        restarted = VerdictCache(db_path=db_path, memory_size=2)
+        assert await restarted.get("Discord объявил новую функцию") == payload
+        stats = restarted.stats()
+        assert stats["hits_disk"] == 1 and stats["misses"] == 0
+
+        # LRU вытесняет самые старые записи из памяти
+        for i in range(3):
+            await restarted.put(f"Сообщение номер {i}", payload, "other")
+        assert restarted.stats()["memory_entries"] == 2
+    logger.info("✅ Оба уровня кэша работают")
+
+
+async def test_ttl_by_classification():
+    """TTL зависит от классификации этапа 1"""
+    logger.info("⏱️ Тестируем TTL...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = VerdictCache(
+            db_path=os.path.join(tmp, "cache.sqlite3"),
+            ttls={"news": 60, "science": 3600, "other": 120}
+        )
+        assert cache.ttl_for("news") < cache.ttl_for("science")
+        assert cache.ttl_for("unknown") == 120
+
+        await cache.put("Срочная новость про курс доллара", {"category": "новости"}, "news")
+        with patch("verdict_cache.time.time", return_value=time.time() + 61):
+            assert await cache.get("Срочная новость про курс доллара") is None
+    logger.info("✅ TTL соблюдается")
+
+
+async def test_analyze_message_uses_cache():
+    """Повторный вызов analyze_message не запускает пайплайн"""
+    logger.info("🔁 Тестируем кэш в analyze_message...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filter_system = TwoStageFilter()
+        filter_system.verdict_cache = VerdictCache(db_path=os.path.join(tmp, "cache.sqlite3"))
+
+        debug_info = DebugInfo(confidence_score=92, verification_status="confirmed", classification="news")
+        with patch.object(filter_system, '_analyze_uncached') as mock_analyze:
+            mock_analyze.return_value = ("новости", "Достоверно", debug_info)
+
+            first = await filter_system.analyze_message("Discord объявил новую функцию", "Test")
+            second = await filter_system.analyze_message("discord объявил  новую функцию", "Test")
+
+            assert mock_analyze.call_count == 1
+            assert first[:2] == second[:2]
+            assert second[2].confidence_score == 92
+            assert second[2].cache_hit is True
+    logger.info("✅ Повторная проверка отдается из кэша")
+
+
+GIBSON_TEXT = """«Отец Киберпанка» Уилльям Гибсон признался, что именно Виктор Цой оказал самое сильное влияние на его творчество.
+
+Гибсон, автор культового «Нейроманта», отметил, что музыка Цоя стала для него главным источником вдохновения.
+
+Об этом он написал у себя в твиттере (X) в верифтцированном аккаунте"""
+
+
+async def test_near_duplicate_reuse():
+    """Пересланные копии с эмодзи, подписью и опечатками получают тот же вердикт"""
+    logger.info("🧬 Тестируем почти-дубликаты...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = VerdictCache(db_path=os.path.join(tmp, "cache.sqlite3"), near_duplicates=True)
+        payload = {"category": "новости", "comment": "Не подтверждено", "debug": {}}
+        await cache.put(GIBSON_TEXT, payload, "news")
+
+        variants = [
+            "🔥🔥 " + GIBSON_TEXT + " 😱",
+            GIBSON_TEXT + "\n\nПодписывайтесь: @coolchannel https://t.me/coolchannel",
+            GIBSON_TEXT.replace("верифтцированном", "верифицированном"),
+        ]
+        for variant in variants:
+            assert await cache.get(variant) == payload, variant[-60:]
+        assert cache.stats()["hits_near"] == len(variants)
+
+        # Другие числа — другое утверждение, даже если SimHash почти совпадает
+        changed = GIBSON_TEXT.replace("(X)", "(X) в 2019 году")
+        assert guard_signature(changed) != guard_signature(GIBSON_TEXT)
+        assert await cache.get(changed) is None
+
+        # Отпечатки переживают перезапуск
+        restarted = VerdictCache(db_path=os.path.join(tmp, "cache.sqlite3"), near_duplicates=True)
+        assert await restarted.get(variants[0]) == payload
+    logger.info("✅ Почти-дубликаты находятся")
+
+
+async def test_expired_fingerprints_removed():
+    """Отпечатки истекших вердиктов удаляются из SQLite и из полос индекса"""
+    logger.info("🧹 Тестируем очистку отпечатков...")
+
+    other_text = "Центробанк повысил ключевую ставку до 21% годовых на заседании совета директоров в пятницу"
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        payload = {"category": "новости", "comment": "Не подтверждено", "debug": {}}
+        now = time.time()
+
+        # Истекший вердикт находится как почти-дубликат — отпечаток удаляется при чтении
+        cache = VerdictCache(db_path=db_path, ttls={"news": 60, "other": 60}, near_duplicates=True)
+        await cache.put(GIBSON_TEXT, payload, "news")
+        with patch('verdict_cache.time.time', return_value=now + 120):
+            assert await cache.get("🔥 " + GIBSON_TEXT) is None
+        assert len(cache.near_duplicates) == 0
+        assert len(NearDuplicateIndex(db_path=db_path)) == 0
+
+        # Истекшие вердикты удаляются при записи нового — вместе с отпечатками
+        await cache.put(GIBSON_TEXT, payload, "news")
+        with patch('verdict_cache.time.time', return_value=now + 120):
+            await cache.put(other_text, payload, "other")
+        assert len(cache.near_duplicates) == 1
+        assert cache.near_duplicates.find(GIBSON_TEXT) is None
+        assert len(NearDuplicateIndex(db_path=db_path)) == 1
+    logger.info("✅ Отпечатки истекших вердиктов удаляются")
+
+
+async def test_near_duplicate_lookup_speed():
+    """Поиск среди сотен тысяч отпечатков укладывается в миллисекунду"""
+    logger.info("⚡ Тестируем скорость поиска почти-дубликатов...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = NearDuplicateIndex(db_path=os.path.join(tmp, "index.sqlite3"), max_distance=4)
+        rng = random.Random(42)
+        for i in range(200_000):
+            index._insert(f"key{i}", rng.getrandbits(64), "|0")
+
+        target = simhash(GIBSON_TEXT)
+        index._insert("gibson", target, "|0")
+
+        probes = [target ^ (1 << rng.randrange(64)) for _ in range(200)]
+        start = time.perf_counter()
+        for probe in probes:
+            assert index.find_fingerprint(probe, "|0")[0] == "gibson"
+        per_lookup_ms = (time.perf_counter() - start) / len(probes) * 1000
+        logger.info(f"  ⏱️ {per_lookup_ms:.3f} мс на поиск среди {len(index)} отпечатков")
+        assert per_lookup_ms < 1.0
+    logger.info("✅ Поиск почти-дубликатов быстрый")
+
+
+async def run_all_tests():
+    """Запуск всех тестов"""
+    logger.info("🚀 Запускаем тесты кэша вердиктов...")
+
+    tests = [
+        test_normalized_key,
+        test_memory_and_disk_tiers,
+        test_ttl_by_classification,
+        test_analyze_message_uses_cache,
+        test_near_duplicate_reuse,
+        test_expired_fingerprints_removed,
+        test_near_duplicate_lookup_speed
+    ]
+
+    for test_func in tests:
+        try:
+            await test_func()
+            logger.info(f"✅ {test_func.__name__} прошел успешно")
+        except Exception as e:
+            logger.error(f"❌ {test_func.__name__} провалился: {e}")
+            raise
+
+    logger.info("\n🎉 Все тесты кэша вердиктов прошли успешно!")
+
+if __name__ == "__main__":
+    asyncio.run(run_all_tests())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Разбор трасс из TRACING_EXPORTER=jsonl
+
+    python trace_report.py summary             # время по видам спанов (p50/p95/max)
+    python trace_report.py slowest -n 5        # самые долгие сообщения деревом спанов
+    python trace_report.py folded > out.folded # свернутые стеки для flamegraph.pl / speedscope
+"""
+
+import argparse
+import json
+import sys
+import os
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from config import Config
+from tracing import folded_stacks, read_spans, summarize_spans
+
+
+def print_summary(spans, args) -> int:
+    rows = summarize_spans(spans)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    print(f"{'спан':<40} {'число':>6} {'ошибки':>7} {'p50, мс':>9} {'p95, мс':>9} {'max, мс':>9} {'всего, с':>9}")
+    for row in rows:
+        print(f"{row['name'][:40]:<40} {row['count']:>6} {row['errors']:>7} {row['p50_ms']:>9} "
+              f"{row['p95_ms']:>9} {row['max_ms']:>9} {row['total_ms'] / 1000:>9.1f}")
+    return 0
+
+
+def print_slowest(spans, args) -> int:
+    children = {}
+    for record in spans:
+        children.setdefault(record.get("parent_id"), []).append(record)
+    roots = sorted(children.get(None, []), key=lambda record: record["duration_ms"], reverse=True)
+
+    def print_tree(record, depth: int) -> None:
+        status = "" if record.get("status") == "ok" else f"  ❌ {record.get('error') or record.get('status')}"
+        attributes = " ".join(f"{key}={value}" for key, value in record.get("attributes", {}).items())
+        print(f"{'  ' * depth}{record['duration_ms'] / 1000:7.2f}с  {record['name']}  {attributes}{status}")
+        for child in sorted(children.get(record["span_id"], []), key=lambda item: item["start"]):
+            print_tree(child, depth + 1)
+
+    for root in roots[:args.n]:
+        print(f"\n🧵 trace {root['trace_id']}")
+        print_tree(root, 0)
+    return 0
+
+
+def print_folded(spans, args) -> int:
+    for stack, micros in sorted(folded_stacks(spans).items()):
+        print(f"{stack} {micros}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Анализ трасс фактчекинга")
+    parser.add_argument("--traces", default=Config.TRACING_JSONL_PATH, help="файл спанов (JSONL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    summary = commands.add_parser("summary", help="время по видам спанов")
+    summary.add_argument("--json", action="store_true", help="вывести отчет в JSON")
+    summary.set_defaults(handler=print_summary)
+
+    slowest = commands.add_parser("slowest", help="самые долгие трассы деревом")
+    slowest.add_argument("-n", type=int, default=5, help="сколько трасс показать")
+    slowest.set_defaults(handler=print_slowest)
+
+    folded = commands.add_parser("folded", help="свернутые стеки для флейм-графа (микросекунды)")
+    folded.set_defaults(handler=print_folded)
+
+    args = parser.parse_args()
+    if not os.path.exists(args.traces):
+        print(f"❌ Файл трасс не найден: {args.traces}", file=sys.stderr)
+        return 1
+    return args.handler(read_spans(args.traces), args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
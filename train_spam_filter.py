@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Обучение и оценка локального спам-фильтра по журналу классификаций этапа 1
+
+    python train_spam_filter.py train       # обучить, показать качество на отложенной выборке, сохранить
+    python train_spam_filter.py evaluate    # оценить сохраненную модель на журнале
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+import os
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from config import Config
+from spam_filter import SpamFilter, evaluate, read_classification_log
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+# Меньше примеров какого-то класса — модель не обучаем
+MIN_SAMPLES_PER_CLASS = 20
+
+
+def print_report(title: str, report: dict) -> None:
+    print(f"\n📊 {title}: {report['samples']} примеров, спама {report['spam']}, "
+          f"{report['avg_latency_ms']} мс на сообщение")
+    print(f"{'порог':>7} {'точность':>9} {'полнота':>8} {'ложные':>7} {'без LLM':>8}")
+    for threshold, row in report["thresholds"].items():
+        print(f"{threshold:>7} {row['precision']:>9} {row['recall']:>8} "
+              f"{row['false_positives']:>7} {row['skipped_share']:>8}")
+
+
+def train(args) -> int:
+    samples = read_classification_log(args.log)
+    spam = sum(1 for _, is_spam in samples if is_spam)
+    logger.info(f"📚 Примеров в журнале: {len(samples)}, из них спам: {spam}")
+    if min(spam, len(samples) - spam) < MIN_SAMPLES_PER_CLASS:
+        logger.error(f"❌ Нужно хотя бы {MIN_SAMPLES_PER_CLASS} примеров каждого класса")
+        return 1
+
+    random.Random(args.seed).shuffle(samples)
+    holdout_size = int(len(samples) * args.holdout)
+    if holdout_size:
+        holdout, training = samples[:holdout_size], samples[holdout_size:]
+        model = SpamFilter.train(training, epochs=args.epochs, seed=args.seed)
+        print_report("Отложенная выборка", evaluate(model, holdout))
+
+    # Итоговая модель обучается на всех примерах
+    model = SpamFilter.train(samples, epochs=args.epochs, seed=args.seed)
+    model.save(args.model)
+    logger.info(f"💾 Модель сохранена в {args.model} ({len(model.weights)} весов)")
+    return 0
+
+
+def evaluate_model(args) -> int:
+    model = SpamFilter.load(args.model)
+    if model is None:
+        return 1
+    report = evaluate(model, read_classification_log(args.log))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report("Журнал", report)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Локальный спам-фильтр этапа 0")
+    parser.add_argument("--log", default=Config.STAGE1_LOG_PATH, help="журнал классификаций этапа 1 (JSONL)")
+    parser.add_argument("--model", default=Config.SPAM_FILTER_MODEL_PATH, help="файл модели")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="обучить модель")
+    train_parser.add_argument("--holdout", type=float, default=0.2, help="доля отложенной выборки для оценки")
+    train_parser.add_argument("--epochs", type=int, default=8)
+    train_parser.add_argument("--seed", type=int, default=0)
+    train_parser.set_defaults(handler=train)
+
+    evaluate_parser = commands.add_parser("evaluate", help="оценить сохраненную модель")
+    evaluate_parser.add_argument("--json", action="store_true", help="вывести отчет в JSON")
+    evaluate_parser.set_defaults(handler=evaluate_model)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Отчет по расходу OpenAI из журнала USAGE_DB_PATH
+
+    python usage_report.py                     # сегодня по пользователям
+    python usage_report.py --by model          # сегодня по моделям (model, stage, user_id, day)
+    python usage_report.py --day all --by day  # за все время по дням
+"""
+
+import argparse
+import json
+import sys
+import os
+
+# Добавляем src в path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from config import Config
+from usage import UsageLedger, today
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Расход токенов и стоимость проверок")
+    parser.add_argument("--db", default=Config.USAGE_DB_PATH, help="файл журнала расхода")
+    parser.add_argument("--day", default=today(), help="сутки YYYY-MM-DD (UTC) или all")
+    parser.add_argument("--by", default="user_id", choices=("user_id", "model", "stage", "day"), help="группировка")
+    parser.add_argument("--json", action="store_true", help="вывести отчет в JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ Журнал расхода не найден: {args.db}", file=sys.stderr)
+        return 1
+    ledger = UsageLedger(args.db)
+    rows = ledger.report(None if args.day == "all" else args.day, group_by=args.by)
+    ledger.close()
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    print(f"📅 {args.day}, группировка: {args.by}")
+    print(f"{args.by:<24} {'проверки':>9} {'вызовы':>7} {'вход':>10} {'выход':>10} {'поиск':>6} {'$':>10}")
+    for row in rows:
+        checks = "" if row["checks"] is None else row["checks"]
+        print(f"{str(row[args.by])[:24]:<24} {checks:>9} {row['calls']:>7} {row['prompt_tokens']:>10} "
+              f"{row['completion_tokens']:>10} {row['web_search_calls']:>6} {row['cost_usd']:>10.4f}")
+    total = sum(row["cost_usd"] for row in rows)
+    print(f"\n💰 Всего: ${total:.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Воркер фактчекинга для режима BOT_MODE=frontend: запускается отдельно от бота,
+на том же хосте (брокер SQLite) или на других узлах (брокер Redis)
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+
+# Импорты из src
+sys.path.append('src')
+from config import Config
+from broker import create_broker
+from check_worker import FactCheckWorker
+from metrics import IN_FLIGHT, MetricsServer
+from command_handler import CommandHandler
+from sources_config import sources_config
+import tracing
+
+# Настройка логирования
+os.makedirs('logs', exist_ok=True)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('logs/worker.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+async def main():
+    if not Config.OPENAI_API_KEY:
+        logger.error("❌ OPENAI_API_KEY не установлен")
+        sys.exit(1)
+
+    broker = create_broker()
+    worker = FactCheckWorker(broker, CommandHandler(worker=True))
+
+    # Остановка по сигналу: новые задачи не берутся, начатые доводятся до конца
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stop)
+
+    # У каждого воркера свои метрики: на одном хосте задайте воркерам разные METRICS_PORT
+    metrics_server = MetricsServer(ready=lambda: worker.running) if Config.METRICS_ENABLED else None
+    IN_FLIGHT.set_function(lambda: worker.in_progress)
+    if metrics_server:
+        await metrics_server.start()
+
+    sources_config.start_watching()
+    try:
+        await worker.run()
+    finally:
+        sources_config.stop_watching()
+        if metrics_server:
+            await metrics_server.stop()
+        await broker.close()
+        tracing.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())